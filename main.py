@@ -4,10 +4,13 @@ Sistema de detección avanzado con actualización automática de etiquetas
 """
 
 import argparse
+import json
 import sys
 import os
+import time
 import yaml
 import logging
+from contextlib import nullcontext
 from pathlib import Path
 
 # Agregar src al path
@@ -16,9 +19,17 @@ sys.path.append(str(Path(__file__).parent / "src"))
 from data.dataset_manager import DatasetManager
 from models.detector import NopalPersonDetector
 from models.multi_class_detector import MultiClassDetector
+from models.backends import IMAGE_EXTENSIONS, export_onnx
+from models.quantization import quantize_model, compare_models
+from models.registry import load_model_from_config
+from models.parallel_video import process_video_parallel
 from utils.visualization import ResultVisualizer
 from utils.config import load_config_with_env, setup_environment
 from utils.camera_detector import CameraDetector
+from utils.detection_cache import DetectionCache, build_detection_cache, load_ground_truths, sweep
+from utils.detection_log import DetectionLog
+from utils.manifest import BatchManifest, weights_fingerprint
+from utils.sharding import manifest_filename, merge_shards, select_shard
 from utils.validators import InputValidator
 from utils.error_handler import ResourceManager, log_execution_time
 from update_labels import LabelUpdater
@@ -60,6 +71,35 @@ def check_for_label_updates(config, quiet=False):
     
     return False
 
+def open_detection_log(args, config):
+    """Registro de detecciones de --log-detections (contexto vacío si no se pidió)"""
+    if not args.log_detections:
+        return nullcontext()
+    logger.info(f"🧾 Registrando detecciones en: {args.log_detections}")
+    return DetectionLog.from_config(args.log_detections, config)
+
+
+def log_multiclass_results(detection_log, results):
+    """Registra las detecciones de un resultado de MultiClassDetector"""
+    detections = results.get('detections') if results else None
+    if detection_log is not None and hasattr(detections, 'to_array'):
+        detection_log.write(results.get('image_path', ''), detections.to_array(), detections.names)
+
+
+def build_fused_dataset(config, data_yaml_path, dataset_manager=None):
+    """Construir el dataset nopal+persona a partir de un dataset preparado"""
+    logger.info("🔀 Modo fusionado: agregando la clase 'person' al dataset")
+    
+    if dataset_manager is None:
+        dataset_manager = DatasetManager(config)
+        dataset_manager.dataset_location = os.path.dirname(os.path.abspath(data_yaml_path))
+    
+    paths = dataset_manager.prepare_dataset()
+    fused_yaml_path = dataset_manager.build_fused_dataset(paths)
+    
+    logger.info("💡 Tras entrenar, usa los pesos con fused.enabled o --fused")
+    return fused_yaml_path
+
 @log_execution_time
 def main():
     parser = argparse.ArgumentParser(description='Nopal Detector - Sistema Multi-Clase Inteligente')
@@ -70,7 +110,8 @@ def main():
     
     # Modo de operación
     parser.add_argument('--mode', 
-                       choices=['train', 'predict', 'video', 'camera', 'list-cameras', 'batch', 'update-labels'], 
+                       choices=['train', 'predict', 'video', 'camera', 'list-cameras', 'batch', 'update-labels',
+                                'export', 'quantize', 'merge', 'render', 'cache', 'sweep'], 
                        required=True, 
                        help='Modo de operación')
     
@@ -95,11 +136,67 @@ def main():
     # Configuración de detección
     parser.add_argument('--confidence', '-c', type=float, default=0.5,
                        help='Umbral de confianza (default: 0.5)')
+    parser.add_argument('--batch-size', type=int,
+                       help='Frames/imágenes por lote de inferencia en modos video y batch (default: config)')
+    parser.add_argument('--workers', type=int,
+                       help='Hilos de decodificación y escritura en modo batch (default: batch.workers)')
+    parser.add_argument('--motion-gate', action='store_true',
+                       help='Reutilizar detecciones en frames sin cambios (video y cámara)')
+    parser.add_argument('--motion-threshold', type=float,
+                       help='Fracción de píxeles cambiados para volver a inferir (default: config)')
+    parser.add_argument('--boxes-only', action='store_true',
+                       help='Dibujar solo las cajas, sin etiquetas (máximos FPS)')
+    parser.add_argument('--track', action='store_true',
+                       help='Seguir objetos entre fotogramas clave (IDs estables, conteo de únicos)')
+    parser.add_argument('--detect-interval', type=int,
+                       help='Con --track, ejecutar los modelos cada N frames (default: config)')
+    parser.add_argument('--frame-stride', type=int,
+                       help='Video: inferir uno de cada N frames; los saltados no se decodifican (default: video.frame_stride)')
+    parser.add_argument('--target-fps', type=float,
+                       help='Video: FPS a inferir, alternativa a --frame-stride (default: video.target_fps)')
+    parser.add_argument('--stride-output', choices=['sampled', 'carry'],
+                       help='Con --frame-stride/--target-fps: video solo con los frames muestreados o con todos '
+                            'arrastrando las últimas detecciones (default: video.stride_output)')
+    parser.add_argument('--video-workers', type=int,
+                       help='Procesos que se reparten el video por tramos (default: video.workers)')
+    parser.add_argument('--sidecar', metavar='PATH',
+                       help='Video: guardar las detecciones en un sidecar .dets sin codificar el video; '
+                            'render: sidecar a dibujar (default: <video>.dets)')
+    parser.add_argument('--start', type=float,
+                       help='Render: segundo inicial del tramo')
+    parser.add_argument('--end', type=float,
+                       help='Render: segundo final del tramo')
+    parser.add_argument('--min-confidence', type=float, default=0.0,
+                       help='Render: confianza mínima de las cajas dibujadas')
+    
+    # Barrido de umbrales sobre una caché de detecciones
+    parser.add_argument('--conf-grid', type=str,
+                       help='Sweep: umbrales de confianza separados por comas (default: sweep.confidences)')
+    parser.add_argument('--iou-grid', type=str,
+                       help='Sweep: umbrales de IoU separados por comas (default: sweep.ious)')
+    parser.add_argument('--labels', type=str,
+                       help='Sweep: directorio de etiquetas YOLO para calcular mAP50 (default: ../labels de las imágenes)')
     
     # Argumentos para procesamiento batch
     parser.add_argument('--batch-dir',
                        type=str,
                        help='Directorio con imágenes para procesar en batch')
+    parser.add_argument('--no-resume', action='store_true',
+                       help='Reprocesar todas las imágenes ignorando el manifiesto del batch')
+    parser.add_argument('--shard-index', type=int, default=0,
+                       help='Índice del shard de esta máquina en modo batch (0..shard-count-1)')
+    parser.add_argument('--shard-count', type=int, default=1,
+                       help='Número de máquinas que se reparten el directorio de --batch-dir')
+    
+    # Inferencia por tiles (imágenes de dron / alta resolución)
+    parser.add_argument('--sliced', action='store_true',
+                       help='Procesar imágenes grandes por tiles solapados (modos predict y batch)')
+    parser.add_argument('--tile-size', type=int,
+                       help='Lado del tile en píxeles (default: slicing.tile_size)')
+    parser.add_argument('--tile-overlap', type=float,
+                       help='Fracción de solape entre tiles (default: slicing.overlap)')
+    parser.add_argument('--tile-workers', type=int,
+                       help='Hilos de decodificación de imágenes (default: slicing.workers)')
     
     # Nuevas funcionalidades v3.0
     parser.add_argument('--multi-class', action='store_true',
@@ -110,6 +207,14 @@ def main():
                        help='Saltar verificación de actualizaciones')
     parser.add_argument('--data', type=str,
                        help='Ruta al archivo data.yaml para entrenamiento')
+    parser.add_argument('--backend', choices=['pytorch', 'onnx'],
+                       help='Backend de inferencia (default: model.backend de la config)')
+    parser.add_argument('--io-backend', choices=['opencv', 'ffmpeg'],
+                       help='Lectura/escritura de video: OpenCV (mp4v) o ffmpeg por tubería (default: video.io_backend)')
+    parser.add_argument('--fused', action='store_true',
+                       help='Entrenar/usar un único modelo nopal+persona (una pasada por frame)')
+    parser.add_argument('--log-detections', metavar='PATH',
+                       help='Registrar cada detección en PATH (.jsonl, .csv o .parquet) en modos predict, batch y video')
     
     args = parser.parse_args()
     
@@ -118,6 +223,28 @@ def main():
     
     # Cargar configuración con variables de entorno
     config = load_config_with_env(args.config)
+    if args.fused:
+        config.setdefault('fused', {})['enabled'] = True
+    if args.backend:
+        config['model']['backend'] = args.backend
+    if args.io_backend:
+        config.setdefault('video', {})['io_backend'] = args.io_backend
+    if args.motion_gate:
+        config.setdefault('motion', {})['enabled'] = True
+    if args.motion_threshold is not None:
+        config.setdefault('motion', {})['threshold'] = args.motion_threshold
+    if args.boxes_only:
+        config.setdefault('annotation', {})['boxes_only'] = True
+    if args.track:
+        config.setdefault('tracking', {})['enabled'] = True
+    if args.detect_interval:
+        config.setdefault('tracking', {})['detect_interval'] = args.detect_interval
+    if args.frame_stride:
+        config.setdefault('video', {})['frame_stride'] = args.frame_stride
+    if args.target_fps:
+        config.setdefault('video', {})['target_fps'] = args.target_fps
+    if args.stride_output:
+        config.setdefault('video', {})['stride_output'] = args.stride_output
     
     # Banner de bienvenida
     logger.info("🌵 =======================================")
@@ -128,7 +255,7 @@ def main():
     
     # Verificar actualizaciones de etiquetas
     labels_updated = False
-    if not args.skip_update_check and args.mode not in ['update-labels', 'list-cameras']:
+    if not args.skip_update_check and args.mode not in ['update-labels', 'list-cameras', 'render']:
         if args.auto_update:
             labels_updated = check_for_label_updates(config)
         elif args.mode == 'train':
@@ -170,6 +297,9 @@ def main():
                     logger.error(f"❌ No se encontró: {args.data}")
                     return
                 
+                if args.fused:
+                    args.data = build_fused_dataset(config, args.data)
+                
                 # Entrenar con detector multi-clase
                 detector = MultiClassDetector(config)
                 results = detector.train_custom_model(args.data)
@@ -187,6 +317,9 @@ def main():
                 dataset_manager.prepare_dataset()
                 data_yaml_path = dataset_manager.get_data_yaml_path()
                 
+                if args.fused:
+                    data_yaml_path = build_fused_dataset(config, data_yaml_path, dataset_manager)
+                
                 # Entrenar modelo
                 detector = NopalPersonDetector(config)
                 results = detector.train_nopal_model(data_yaml_path)
@@ -204,27 +337,49 @@ def main():
             
             logger.info("🔍 Realizando predicciones...")
             
-            if args.multi_class:
+            if args.sliced and not args.multi_class:
+                logger.info("🧩 --sliced usa el detector multi-clase")
+            
+            if args.multi_class or args.sliced:
                 detector = MultiClassDetector(config)
                 detector.load_models(args.weights)
                 
-                results = detector.predict_image(
-                    args.input, 
-                    conf_threshold=args.confidence,
-                    save_result=True
-                )
+                if args.sliced:
+                    detector.configure_slicing(args.tile_size, args.tile_overlap, args.tile_workers)
                 
-                if results:
-                    logger.info("✅ Predicción completada!")
-                    detector.print_detection_summary(results.get('detections', []))
+                if args.sliced and os.path.isdir(args.input):
+                    image_paths = sorted(
+                        str(p) for p in Path(args.input).iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS
+                    )
+                    detections = []
+                    with open_detection_log(args, config) as detection_log:
+                        for results in detector.predict_images_sliced(image_paths, conf_threshold=args.confidence):
+                            log_multiclass_results(detection_log, results)
+                            detections.extend(results.get('detections', []))
+                    logger.info(f"✅ {len(image_paths)} imágenes procesadas por tiles")
+                    detector.print_detection_summary(detections)
                 else:
-                    logger.error("❌ Error en la predicción")
+                    results = detector.predict_image(
+                        args.input, 
+                        conf_threshold=args.confidence,
+                        save_result=True
+                    )
+                    with open_detection_log(args, config) as detection_log:
+                        log_multiclass_results(detection_log, results)
+                    
+                    if results:
+                        logger.info("✅ Predicción completada!")
+                        detector.print_detection_summary(results.get('detections', []))
+                    else:
+                        logger.error("❌ Error en la predicción")
             else:
                 detector = NopalPersonDetector(config)
                 detector.load_models(args.weights)
                 
-                predictions_dir = detector.predict_images(args.input)
-                stats = detector.get_detection_stats(args.input)
+                with open_detection_log(args, config) as detection_log:
+                    predictions_dir = detector.predict_images(args.input, detection_log=detection_log)
+                # Estadísticas acumuladas en la misma pasada de inferencia
+                stats = detector.last_stats
                 
                 logger.info(f"📊 Estadísticas: {stats}")
                 logger.info(f"✅ Guardado en: {predictions_dir}")
@@ -244,13 +399,103 @@ def main():
                 logger.warning("⚠️ Video multi-clase en desarrollo")
                 logger.info("💡 Usa: --mode video (sin --multi-class)")
             else:
-                detector = NopalPersonDetector(config)
-                detector.load_models(args.weights)
-                
                 output_filename = args.output or "output_video.mp4"
-                output_path = detector.process_video(args.input, output_filename)
+                video_workers = args.video_workers or config.get('video', {}).get('workers', 1)
+                if video_workers > 1 and args.sidecar:
+                    logger.info("💡 --sidecar cubre el video completo: se procesa en un solo proceso")
+                    video_workers = 1
+                if video_workers > 1:
+                    # Un proceso por tramo, cada uno con sus modelos; los tramos se unen en orden
+                    report = process_video_parallel(
+                        config, args.weights, args.input, output_filename, workers=video_workers,
+                        batch_size=args.batch_size, log_path=args.log_detections,
+                    )
+                    output_path = report['output_path']
+                else:
+                    detector = NopalPersonDetector(config)
+                    detector.load_models(args.weights)
+                    
+                    with open_detection_log(args, config) as detection_log:
+                        output_path = detector.process_video(
+                            args.input, output_filename, batch_size=args.batch_size,
+                            detection_log=detection_log, sidecar_path=args.sidecar,
+                        )
                 
-                logger.info(f"✅ Video guardado: {output_path}")
+                if args.sidecar:
+                    logger.info(f"✅ Sidecar guardado: {output_path}")
+                    logger.info(f"💡 Para anotar un tramo: python main.py --mode render --input {args.input} "
+                                f"--sidecar {output_path} --start 0 --end 10")
+                else:
+                    logger.info(f"✅ Video guardado: {output_path}")
+        
+        elif args.mode == 'render':
+            # Validar entrada
+            is_valid, msg = InputValidator.validate_video_path(args.input)
+            if not is_valid:
+                logger.error(msg)
+                logger.info("💡 Ejemplo: python main.py --mode render --input video.mp4 --sidecar video.dets")
+                return
+            
+            # Sin modelos: las detecciones salen del sidecar
+            detector = NopalPersonDetector(config)
+            output_path = detector.render_video(
+                args.input, args.sidecar, args.output or "rendered_video.mp4",
+                start=args.start, end=args.end, min_confidence=args.min_confidence,
+            )
+            logger.info(f"✅ Video guardado: {output_path}")
+        
+        elif args.mode == 'export':
+            if not args.weights:
+                logger.error("❌ Faltan --weights")
+                logger.info("💡 Ejemplo: python main.py --mode export --weights runs/detect/train4/weights/best.pt")
+                return
+            
+            is_valid, msg = InputValidator.validate_weights_path(args.weights)
+            if not is_valid:
+                logger.error(msg)
+                return
+            
+            image_size = config['model']['training']['image_size']
+            onnx_path = export_onnx(args.weights, imgsz=image_size)
+            logger.info(f"✅ Modelo ONNX: {onnx_path}")
+            logger.info("💡 Úsalo con --backend onnx o --weights %s", onnx_path)
+        
+        elif args.mode == 'quantize':
+            if not args.weights:
+                logger.error("❌ Faltan --weights")
+                logger.info("💡 Ejemplo: python main.py --mode quantize --weights runs/detect/train4/weights/best.pt --data nopal-detector-3/data.yaml")
+                return
+            
+            is_valid, msg = InputValidator.validate_weights_path(args.weights)
+            if not is_valid:
+                logger.error(msg)
+                return
+            
+            if not args.data:
+                import glob
+                dataset_dirs = sorted(glob.glob("nopal-detector-*/data.yaml"), reverse=True)
+                if not dataset_dirs:
+                    logger.error("❌ No se encontró ningún dataset (usa --data)")
+                    return
+                args.data = dataset_dirs[0]
+                logger.info("🔍 Dataset detectado: %s", args.data)
+            
+            # Las imágenes se toman de la estructura de prepare_dataset (train/, valid/)
+            dataset_dir = os.path.dirname(os.path.abspath(args.data))
+            quant_config = config.get('quantization', {})
+            
+            logger.info("🧮 Cuantizando a INT8...")
+            paths = quantize_model(
+                args.weights,
+                dataset_dir,
+                num_calibration=quant_config.get('calibration_images', 200),
+                imgsz=config['model']['training']['image_size'],
+                per_channel=quant_config.get('per_channel', True),
+                keep_head_fp32=quant_config.get('keep_head_fp32', True),
+            )
+            compare_models(paths['fp32'], paths['int8'], dataset_dir,
+                           max_images=quant_config.get('eval_images'))
+            logger.info(f"✅ Modelo INT8: {paths['int8']}")
         
         elif args.mode == 'list-cameras':
             logger.info("🎥 Cámaras disponibles:")
@@ -290,12 +535,18 @@ def main():
                 
                 # Inicializar detector multi-clase
                 camera_detector = CameraDetector(args.weights)
+                if args.backend:
+                    camera_detector.model_config['backend'] = args.backend
+                camera_detector.config['motion'] = config.get('motion', {})
+                camera_detector.config['tracking'] = config.get('tracking', {})
+                camera_detector.config['annotation'] = config.get('annotation', {})
+                camera_detector.config['filters'] = config.get('filters', {})
+                camera_detector.config['suppression'] = config.get('suppression', {})
                 
                 if camera_detector.setup_camera(args.camera, resolution):
                     if args.auto_focus:
                         logger.info("🎯 Configuración avanzada activada")
                         camera_detector.enable_advanced_settings()
-                        import time
                         time.sleep(3)
                     
                     logger.info("📹 Controles: [Q]uit [S]ave [Space]Pause [C/V]Conf [X/Z]IoU [F]iltros")
@@ -317,11 +568,17 @@ def main():
                     return
             
             camera_detector = CameraDetector(args.weights)
+            if args.backend:
+                camera_detector.model_config['backend'] = args.backend
+            camera_detector.config['motion'] = config.get('motion', {})
+            camera_detector.config['tracking'] = config.get('tracking', {})
+            camera_detector.config['annotation'] = config.get('annotation', {})
+            camera_detector.config['filters'] = config.get('filters', {})
+            camera_detector.config['suppression'] = config.get('suppression', {})
             
             if camera_detector.setup_camera(args.camera, resolution):
                 if args.auto_focus:
                     camera_detector.enable_advanced_settings()
-                    import time
                     time.sleep(3)
                 
                 logger.info("📹 Controles: [Q]uit [R]ecord [Space]Capture")
@@ -341,10 +598,12 @@ def main():
                 print(f"❌ Error: No se encontró el directorio {args.batch_dir}")
                 return
             
-            if args.multi_class:
+            if args.multi_class or args.sliced:
                 print("🎯 Procesamiento batch con detector multi-clase")
                 detector = MultiClassDetector(config)
                 detector.load_models(args.weights)
+                if args.sliced:
+                    detector.configure_slicing(args.tile_size, args.tile_overlap, args.tile_workers)
                 
                 # Buscar todas las imágenes
                 image_extensions = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff']
@@ -354,42 +613,192 @@ def main():
                     images.extend(Path(args.batch_dir).glob(f"*{ext}"))
                     images.extend(Path(args.batch_dir).glob(f"*{ext.upper()}"))
                 
+                images = sorted(set(images))
+                if args.shard_count > 1:
+                    # Reparto estable por ruta relativa: cada máquina procesa su parte sin coordinación
+                    total_found = len(images)
+                    images = select_shard(images, args.batch_dir, args.shard_index, args.shard_count)
+                    print(f"🧩 Shard {args.shard_index}/{args.shard_count}: "
+                          f"{len(images)} de {total_found} imágenes")
+                
                 print(f"📊 Encontradas {len(images)} imágenes para procesar")
                 
+                # Manifiesto: las imágenes ya procesadas con el mismo modelo y parámetros se omiten
+                params = {'confidence': args.confidence, 'sliced': bool(args.sliced),
+                          'backend': config['model'].get('backend', 'pytorch')}
+                if args.sliced:
+                    slicer = detector.slicer
+                    params.update({'tile_size': slicer.tile_size, 'overlap': slicer.overlap,
+                                   'merge': slicer.merge, 'merge_threshold': slicer.merge_threshold})
+                manifest = BatchManifest(
+                    os.path.join(config['output']['predictions_dir'], 'sliced' if args.sliced else 'batch',
+                                 manifest_filename(args.shard_index, args.shard_count)),
+                    weights_fingerprint(detector.weights_path), params, root=args.batch_dir,
+                )
+                all_images = images
+                if not args.no_resume:
+                    images = [Path(p) for p in manifest.pending(str(p) for p in all_images)]
+                    if len(images) < len(all_images):
+                        print(f"⏭️ {len(all_images) - len(images)} imágenes ya procesadas "
+                              f"(manifiesto: {manifest.path}); quedan {len(images)}")
+                
                 successful = 0
                 total_detections_by_class = {}
                 
-                for i, image_path in enumerate(images, 1):
-                    print(f"🔄 Procesando {i}/{len(images)}: {image_path.name}")
-                    
-                    results = detector.predict_image(
-                        str(image_path),
+                batch_config = config.get('batch', {})
+                start_time = time.perf_counter()
+                if args.sliced:
+                    # Las imágenes siguientes se decodifican mientras se infiere la actual
+                    predictions = detector.predict_images_sliced(
+                        [str(p) for p in images], conf_threshold=args.confidence,
+                        on_complete=manifest.record,
+                    )
+                else:
+                    # Decodificación anticipada, inferencia por lotes y escritura asíncrona
+                    predictions = detector.predict_batch(
+                        [str(p) for p in images],
                         conf_threshold=args.confidence,
-                        save_result=True
+                        batch_size=args.batch_size or batch_config.get('batch_size', 16),
+                        workers=args.workers or batch_config.get('workers', 4),
+                        on_complete=manifest.record,
                     )
-                    
-                    if results:
-                        successful += 1
-                        detections = results.get('detections', [])
+                
+                # Cada imagen se registra en el manifiesto cuando su salida ya está escrita
+                with manifest, open_detection_log(args, config) as detection_log:
+                    # predictions primero: al agotarse se cierran los pools del motor
+                    for i, (results, image_path) in enumerate(zip(predictions, images), 1):
+                        print(f"🔄 Procesando {i}/{len(images)}: {image_path.name}")
                         
-                        stats = detector.get_class_statistics(detections)
-                        for class_name, count in stats.items():
-                            total_detections_by_class[class_name] = total_detections_by_class.get(class_name, 0) + count
-                        print(f"   ✅ {len(detections)} detecciones: {stats}")
-                    else:
-                        print(f"   ❌ Error procesando imagen")
+                        if results:
+                            successful += 1
+                            log_multiclass_results(detection_log, results)
+                            detections = results.get('detections', [])
+                            
+                            stats = detector.get_class_statistics(detections)
+                            for class_name, count in stats.items():
+                                total_detections_by_class[class_name] = total_detections_by_class.get(class_name, 0) + count
+                            print(f"   ✅ {len(detections)} detecciones: {stats}")
+                        else:
+                            print(f"   ❌ Error procesando imagen")
                 
-                print(f"🎯 Procesamiento completado: {successful}/{len(images)} exitosas")
+                # Sumar los conteos de las imágenes omitidas para que el resumen cubra todo el directorio
+                pending_set = set(images)
+                skipped = [str(p) for p in all_images if p not in pending_set]
+                for class_name, count in manifest.class_counts(skipped).items():
+                    total_detections_by_class[class_name] = total_detections_by_class.get(class_name, 0) + count
+                successful += len(skipped)
+                
+                elapsed = time.perf_counter() - start_time
+                print(f"🎯 Procesamiento completado: {successful}/{len(all_images)} exitosas")
+                if elapsed > 0:
+                    print(f"⚡ {len(images)} imágenes en {elapsed:.1f}s ({len(images) / elapsed:.1f} img/s)")
+                if detector.last_batch_stats:
+                    batch_stats = detector.last_batch_stats
+                    print(f"   Inferencia: {batch_stats['infer_time']:.1f}s | "
+                          f"Espera de decodificación: {batch_stats['wait_time']:.1f}s")
                 
                 if total_detections_by_class:
                     print("\n📊 RESUMEN TOTAL POR CLASE:")
                     for class_name, total in total_detections_by_class.items():
                         print(f"   {class_name}: {total} detecciones")
+                if args.shard_count > 1:
+                    print(f"💡 Al terminar todos los shards: python main.py --mode merge "
+                          f"--input {os.path.dirname(manifest.path)}")
             else:
                 print("🌵 Procesamiento batch con detector clásico")
                 print("⚠️ Funcionalidad batch clásica en desarrollo")
                 print("💡 Usa el modo multi-clase: --batch-dir ./imagenes/ --multi-class")
         
+        elif args.mode == 'merge':
+            # Combinar los manifiestos de los shards de un batch repartido entre máquinas
+            merge_dir = args.input or os.path.join(config['output']['predictions_dir'], 'batch')
+            report = merge_shards(merge_dir)
+            report_path = args.output or os.path.join(merge_dir, 'merged_report.json')
+            with open(report_path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+            
+            print(f"🔗 {len(report['manifests'])} manifiestos combinados: "
+                  f"{report['successful']}/{report['images']} imágenes exitosas")
+            if report['errors']:
+                print(f"   ❌ {len(report['errors'])} imágenes con error")
+            if report['total_detections_by_class']:
+                print("\n📊 RESUMEN TOTAL POR CLASE:")
+                for class_name, total in report['total_detections_by_class'].items():
+                    print(f"   {class_name}: {total} detecciones")
+            print(f"💾 Informe guardado en: {report_path}")
+        
+        elif args.mode == 'cache':
+            # Inferencia única a confianza mínima; los umbrales se barren después con --mode sweep
+            if not args.weights or not args.input or not os.path.exists(args.input):
+                print("❌ Error: Se requieren --weights y --input (directorio de imágenes o video)")
+                print("💡 Ejemplo: python main.py --mode cache --input dataset/valid/images --weights best.pt")
+                return
+            
+            sweep_config = config.get('sweep', {})
+            if os.path.isdir(args.input):
+                sources = sorted(str(p) for p in Path(args.input).iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+            else:
+                sources = args.input
+            model = load_model_from_config(args.weights, config['model'])
+            
+            start_time = time.perf_counter()
+            cache = build_detection_cache(
+                model, sources,
+                conf=sweep_config.get('cache_conf', 0.001),
+                max_det=sweep_config.get('max_det', 1000),
+                frame_stride=sweep_config.get('frame_stride', 1),
+                meta={'weights': os.path.abspath(args.weights),
+                      'model_hash': weights_fingerprint(args.weights),
+                      'backend': config['model'].get('backend', 'pytorch')},
+            )
+            cache_path = cache.save(args.output or os.path.join(config['output']['predictions_dir'],
+                                                                'detection_cache.npz'))
+            print(f"🗃️ {len(cache)} imágenes, {len(cache.boxes)} candidatas en "
+                  f"{time.perf_counter() - start_time:.1f}s")
+            print(f"💾 Caché guardada en: {cache_path}")
+            print(f"💡 Barrido: python main.py --mode sweep --input {cache_path}")
+        
+        elif args.mode == 'sweep':
+            cache_path = args.input or os.path.join(config['output']['predictions_dir'], 'detection_cache.npz')
+            if not os.path.exists(cache_path):
+                print(f"❌ Error: No se encontró la caché {cache_path}")
+                print("💡 Genérala con: python main.py --mode cache --input <imágenes|video> --weights best.pt")
+                return
+            
+            sweep_config = config.get('sweep', {})
+            confidences = ([float(c) for c in args.conf_grid.split(',')] if args.conf_grid
+                           else sweep_config.get('confidences', [0.1, 0.2, 0.3, 0.4, 0.5]))
+            ious = ([float(i) for i in args.iou_grid.split(',')] if args.iou_grid
+                    else sweep_config.get('ious', [0.5, 0.7]))
+            cache = DetectionCache.load(cache_path)
+            if min(confidences) < cache.meta.get('conf', 0.0):
+                print(f"⚠️ La caché se generó con confianza {cache.meta['conf']}; "
+                      f"los umbrales inferiores no son exactos")
+            ground_truths = load_ground_truths(cache, args.labels)
+            
+            start_time = time.perf_counter()
+            rows = sweep(cache, confidences, ious, sweep_config.get('filters', [False, True]), config,
+                         ground_truths=ground_truths)
+            print(f"🧪 {len(rows)} combinaciones sobre {len(cache)} imágenes en "
+                  f"{time.perf_counter() - start_time:.2f}s")
+            
+            print(f"\n{'conf':>6} {'iou':>6} {'filtro':>10} {'detecciones':>12}" + (f" {'mAP50':>7}" if ground_truths else ""))
+            for row in rows:
+                line = f"{row['conf']:>6.2f} {row['iou']:>6.2f} {row['filter'][:10]:>10} {row['detections']:>12}"
+                print(line + (f" {row['map50']:>7.3f}" if ground_truths else ""))
+            if ground_truths:
+                best = max(rows, key=lambda row: row['map50'])
+                print(f"\n🏆 Mejor mAP50 {best['map50']:.3f}: confidence_threshold={best['conf']} "
+                      f"iou_threshold={best['iou']} filtro={best['filter']}")
+            else:
+                print("💡 Sin etiquetas: solo conteos (usa --labels para calcular mAP50)")
+            
+            report_path = args.output or os.path.splitext(cache_path)[0] + '_sweep.json'
+            with open(report_path, 'w', encoding='utf-8') as f:
+                json.dump({'cache': cache_path, 'meta': cache.meta, 'labels': ground_truths is not None,
+                           'results': rows}, f, indent=2, ensure_ascii=False)
+            print(f"💾 Informe guardado en: {report_path}")
+        
     except KeyboardInterrupt:
         print("\n⏹️ Proceso interrumpido por el usuario")
         
@@ -0,0 +1,525 @@
+#!/usr/bin/env python3
+"""
+🌵 Nopal Detector - Benchmarks de rendimiento
+Mide el rendimiento de las rutas críticas del sistema
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import yaml
+
+# Agregar src al path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+
+def load_config(config_path):
+    """Carga la configuración YAML del proyecto"""
+    with open(config_path, 'r') as f:
+        return yaml.safe_load(f)
+
+
+def read_frames(video_path, max_frames):
+    """
+    Lee hasta max_frames frames de un video en memoria
+
+    Args:
+        video_path: Ruta del video
+        max_frames: Número máximo de frames a leer
+
+    Returns:
+        list: Frames BGR
+    """
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def bench_video_batch(args):
+    """Frames/seg de la inferencia de video para distintos tamaños de lote"""
+    from models.detector import NopalPersonDetector
+
+    config = load_config(args.config)
+    detector = NopalPersonDetector(config)
+    detector.load_models(args.weights)
+    conf_thresh = config['model']['prediction']['confidence_threshold']
+
+    frames = read_frames(args.video, args.frames)
+    if not frames:
+        print(f"❌ No se pudieron leer frames de: {args.video}")
+        return
+
+    # Calentamiento para excluir la inicialización del predictor
+    detector._predict_batch(frames[:1], conf_thresh)
+
+    print(f"📊 {len(frames)} frames de {args.video}")
+    print(f"{'batch':>6} {'fps':>8} {'seg':>8}")
+    for batch_size in args.batch_sizes:
+        start = time.perf_counter()
+        for i in range(0, len(frames), batch_size):
+            detector._predict_batch(frames[i:i + batch_size], conf_thresh)
+        elapsed = time.perf_counter() - start
+        print(f"{batch_size:>6} {len(frames) / elapsed:>8.2f} {elapsed:>8.2f}")
+
+
+def bench_registry(args):
+    """Tiempo de arranque y memoria al crear los tres detectores en un proceso"""
+    import resource
+
+    from models.detector import NopalPersonDetector
+    from models.multi_class_detector import MultiClassDetector
+    from models.registry import get_registry
+    from utils.camera_detector import CameraDetector
+
+    config = load_config(args.config)
+    config['model'].setdefault('registry', {})['enabled'] = not args.disabled
+    registry = get_registry(config['model'])
+
+    start = time.perf_counter()
+    detector = NopalPersonDetector(config)
+    detector.load_models(args.weights)
+    multi = MultiClassDetector(config)
+    multi.load_models(args.weights)
+    camera = CameraDetector(config)
+    camera.load_models(args.weights)
+    elapsed = time.perf_counter() - start
+
+    # ru_maxrss está en KB en Linux
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"📊 Registro {'desactivado' if args.disabled else 'activado'}")
+    print(f"   Arranque: {elapsed:.2f}s | RSS máx: {rss_mb:.0f}MB")
+    print(f"   Cargas: {registry.misses} | Reutilizados: {registry.hits} | "
+          f"Memoria estimada: {registry.memory_usage_mb():.1f}MB")
+
+
+def bench_tracker(args):
+    """Tiempo de asociación del tracker con decenas de objetos sintéticos"""
+    import numpy as np
+
+    from utils.tracker import ByteTracker
+
+    rng = np.random.default_rng(0)
+    print(f"{'tracks':>7} {'update ms':>10} {'predict ms':>11} {'IDs':>6}")
+    for num_tracks in args.tracks:
+        start = rng.uniform(0, 1800, (num_tracks, 2))
+        velocity = rng.uniform(-3, 3, (num_tracks, 2))
+        size = rng.uniform(40, 120, (num_tracks, 2))
+        tracker = ByteTracker()
+        update_times, predict_times = [], []
+
+        for frame in range(args.frames):
+            top_left = start + velocity * frame
+            boxes = np.concatenate([top_left, top_left + size], axis=1)
+            boxes += rng.normal(0, 1.5, boxes.shape)
+            detections = np.concatenate([
+                boxes, rng.uniform(0.2, 0.95, (num_tracks, 1)), np.zeros((num_tracks, 1))
+            ], axis=1).astype(np.float32)
+
+            t0 = time.perf_counter()
+            if frame % args.detect_interval == 0:
+                tracker.update(detections)
+                update_times.append(time.perf_counter() - t0)
+            else:
+                tracker.predict()
+                predict_times.append(time.perf_counter() - t0)
+
+        print(f"{num_tracks:>7} {np.median(update_times) * 1000:>10.3f} "
+              f"{np.median(predict_times) * 1000:>11.3f} {tracker.unique_count:>6}")
+
+
+def bench_annotate(args):
+    """Coste de anotación por frame con 5, 50 y 500 cajas sintéticas"""
+    import numpy as np
+
+    from utils.annotator import Annotator
+
+    def loop_annotate(image, detections, names, colors):
+        # Referencia: el bucle caja a caja que usaban los detectores
+        canvas = image.copy()
+        for x1, y1, x2, y2, conf, cls in detections.tolist():
+            x1, y1, x2, y2, cls = int(x1), int(y1), int(x2), int(y2), int(cls)
+            color = colors[cls]
+            cv2.rectangle(canvas, (x1, y1), (x2, y2), color, 2)
+            label = f"{names[cls]}: {conf:.2f}"
+            (text_width, text_height), baseline = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
+            cv2.rectangle(canvas, (x1, y1 - text_height - baseline - 5), (x1 + text_width, y1), color, -1)
+            cv2.putText(canvas, label, (x1, y1 - baseline - 2), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        return canvas
+
+    rng = np.random.default_rng(0)
+    width, height = args.width, args.height
+    names = ['nopal', 'nopalChino', 'person']
+    colors = [(0, 255, 0), (255, 165, 0), (255, 0, 0)]
+    full = Annotator(names, colors)
+    boxes_only = Annotator(names, colors, boxes_only=True)
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+
+    print(f"{'cajas':>6} {'bucle ms':>9} {'annotator ms':>13} {'solo cajas ms':>14}")
+    for num_boxes in args.boxes:
+        top_left = rng.uniform(0, [width - 120, height - 120], (num_boxes, 2))
+        size = rng.uniform(30, 120, (num_boxes, 2))
+        detections = np.concatenate([
+            top_left, top_left + size,
+            rng.uniform(0.25, 0.99, (num_boxes, 1)).round(2),
+            rng.integers(0, len(names), (num_boxes, 1)),
+        ], axis=1).astype(np.float32)
+
+        timings = []
+        for fn in (lambda: loop_annotate(image, detections, names, colors),
+                   lambda: full.draw(image, detections),
+                   lambda: boxes_only.draw(image, detections)):
+            fn()  # calentamiento (llena la caché de métricas de texto)
+            start = time.perf_counter()
+            for _ in range(args.repeats):
+                fn()
+            timings.append((time.perf_counter() - start) / args.repeats * 1000)
+        print(f"{num_boxes:>6} {timings[0]:>9.3f} {timings[1]:>13.3f} {timings[2]:>14.3f}")
+
+
+def bench_suppression(args):
+    """Coste por frame de la supresión nopal/persona con NMS por clase"""
+    import numpy as np
+
+    from utils.suppression import PersonOverlapSuppressor
+
+    def random_boxes(rng, count, num_classes):
+        top_left = rng.uniform(0, 1200, (count, 2))
+        size = rng.uniform(30, 200, (count, 2))
+        return np.concatenate([
+            top_left, top_left + size, rng.uniform(0.3, 1.0, (count, 1)),
+            rng.integers(0, num_classes, (count, 1)),
+        ], axis=1).astype(np.float32)
+
+    rng = np.random.default_rng(0)
+    suppressor = PersonOverlapSuppressor(mode=args.mode)
+    print(f"{'nopales':>8} {'personas':>9} {'ms/frame':>9}")
+    for num_nopales in args.nopales:
+        nopales = random_boxes(rng, num_nopales, 2)
+        persons = random_boxes(rng, max(1, num_nopales // 5), 1)
+        start = time.perf_counter()
+        for _ in range(args.repeats):
+            suppressor.apply(nopales, persons)
+        elapsed = (time.perf_counter() - start) / args.repeats * 1000
+        print(f"{num_nopales:>8} {len(persons):>9} {elapsed:>9.3f}")
+
+
+def bench_frame_buffer(args):
+    """Coste de add_frame del buffer de pre-roll: lista con frame.copy() vs array circular preasignado"""
+    import numpy as np
+
+    from utils.video_processor import FrameBuffer
+
+    class ListFrameBuffer:
+        # Referencia: la implementación anterior (lista de copias)
+        def __init__(self, max_size):
+            self.max_size = max_size
+            self.frames = []
+            self.current_index = 0
+
+        def add_frame(self, frame):
+            if len(self.frames) >= self.max_size:
+                self.frames[self.current_index] = frame.copy()
+                self.current_index = (self.current_index + 1) % self.max_size
+            else:
+                self.frames.append(frame.copy())
+
+    width, height = args.width, args.height
+    frames = [np.full((height, width, 3), i, dtype=np.uint8) for i in range(8)]
+    print(f"📊 {width}x{height}, {args.frames} frames por medición")
+    print(f"{'capacidad':>10} {'lista µs':>9} {'anillo µs':>10} {'MB':>8}")
+    for capacity in args.sizes:
+        timings = []
+        for buffer in (ListFrameBuffer(capacity), FrameBuffer(capacity)):
+            for i in range(capacity):  # calentamiento: buffer lleno
+                buffer.add_frame(frames[i % len(frames)])
+            start = time.perf_counter()
+            for i in range(args.frames):
+                buffer.add_frame(frames[i % len(frames)])
+            timings.append((time.perf_counter() - start) / args.frames * 1e6)
+        print(f"{capacity:>10} {timings[0]:>9.1f} {timings[1]:>10.1f} {buffer.nbytes / 1e6:>8.1f}")
+
+        # El más reciente es el último añadido y el snapshot sale en orden cronológico
+        expected = [(args.frames - 1 - k) % len(frames) for k in range(min(capacity, len(frames)))]
+        latest = [int(buffer.get_frame(-k)[0, 0, 0]) for k in range(len(expected))]
+        snapshot, _ = buffer.snapshot(len(expected))
+        if latest != expected or snapshot[::-1, 0, 0, 0].tolist() != expected:
+            print(f"   ❌ Orden incorrecto: {latest} (esperado {expected})")
+
+
+def video_signatures(video_path):
+    """
+    Firma de cada frame de un video (miniatura en escala de grises)
+
+    Returns:
+        list: Una miniatura 32x18 float32 por frame, en orden
+    """
+    import numpy as np
+
+    cap = cv2.VideoCapture(video_path)
+    signatures = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        small = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), (32, 18), interpolation=cv2.INTER_AREA)
+        signatures.append(small.astype(np.float32))
+    cap.release()
+    return signatures
+
+
+def check_same_frames(reference, candidate, window=3, tolerance=8.0):
+    """
+    Comprueba que dos videos tienen los mismos frames en el mismo orden
+
+    Los videos se recodifican, así que no se comparan bytes: el desfase con
+    menor diferencia media entre ambos debe ser 0 (frente a ±window) y
+    ningún frame puede diferir de su pareja más de ``tolerance`` niveles.
+
+    Returns:
+        tuple: (correcto, mensaje)
+    """
+    import numpy as np
+
+    if len(reference) != len(candidate):
+        return False, f"frames distintos: {len(candidate)} vs {len(reference)}"
+    reference, candidate = np.stack(reference), np.stack(candidate)
+    offsets = {}
+    for offset in range(-window, window + 1):
+        a = reference[max(offset, 0):len(reference) + min(offset, 0)]
+        b = candidate[max(-offset, 0):len(candidate) + min(-offset, 0)]
+        offsets[offset] = float(np.abs(a - b).mean())
+    best = min(offsets, key=offsets.get)
+    if best != 0:
+        return False, f"frames desplazados {best} posiciones respecto a la referencia"
+    per_frame = np.abs(reference - candidate).mean(axis=(1, 2))
+    worst = int(per_frame.argmax())
+    if per_frame[worst] > tolerance:
+        return False, f"el frame {worst} difiere {per_frame[worst]:.1f} niveles de la referencia"
+    return True, f"{len(candidate)} frames en orden (dif. máx {per_frame[worst]:.1f})"
+
+
+def bench_video_segments(args):
+    """Escalado del video por tramos en procesos (1..N) y comprobación contra el camino serie"""
+    import shutil
+    import tempfile
+
+    from models.detector import NopalPersonDetector
+    from models.parallel_video import process_video_parallel
+    from utils.detection_log import DetectionLog
+
+    config = load_config(args.config)
+    work_dir = tempfile.mkdtemp(prefix='bench-segments-')
+    config['output'] = dict(config['output'], videos_dir=work_dir)
+    try:
+        # Referencia: camino serie de process_video
+        detector = NopalPersonDetector(config)
+        detector.load_models(args.weights)
+        serial_log = f"{work_dir}/serial.csv"
+        start = time.perf_counter()
+        with DetectionLog(serial_log) as detection_log:
+            detector.process_video(args.video, "serial.mp4", detection_log=detection_log)
+        serial_time = time.perf_counter() - start
+        reference = video_signatures(f"{work_dir}/serial.mp4")
+        with open(serial_log) as f:
+            reference_log = f.read()
+
+        print(f"📊 {len(reference)} frames de {args.video}")
+        print(f"{'procesos':>9} {'seg':>8} {'fps':>8} {'acel.':>6}  comprobación")
+        print(f"{'serie':>9} {serial_time:>8.2f} {len(reference) / serial_time:>8.2f} {1.0:>6.2f}  referencia")
+        for workers in args.workers:
+            log_path = f"{work_dir}/parallel-{workers}.csv"
+            report = process_video_parallel(config, args.weights, args.video, f"parallel-{workers}.mp4",
+                                            workers=workers, log_path=log_path)
+            ok, message = check_same_frames(reference, video_signatures(report['output_path']))
+            with open(log_path) as f:
+                if f.read() != reference_log:
+                    ok, message = False, f"{message}; el registro de detecciones difiere"
+            print(f"{workers:>9} {report['elapsed']:>8.2f} {report['frames'] / report['elapsed']:>8.2f} "
+                  f"{serial_time / report['elapsed']:>6.2f}  {'✅' if ok else '❌'} {message}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def bench_video_stride(args):
+    """Tiempo de process_video con submuestreo temporal (1 de cada N frames) vs todos los frames"""
+    import shutil
+    import tempfile
+
+    from models.detector import NopalPersonDetector
+
+    config = load_config(args.config)
+    work_dir = tempfile.mkdtemp(prefix='bench-stride-')
+    config['output'] = dict(config['output'], videos_dir=work_dir)
+    try:
+        detector = NopalPersonDetector(config)
+        detector.load_models(args.weights)
+        reference, base_time = None, None
+        print(f"📊 {args.video} (salida: {args.output})")
+        print(f"{'paso':>5} {'frames':>7} {'seg':>8} {'acel.':>6}  comprobación")
+        for stride in sorted(set([1] + args.strides)):
+            start = time.perf_counter()
+            output_path = detector.process_video(args.video, f"stride-{stride}.mp4", frame_stride=stride,
+                                                 stride_output=args.output)
+            elapsed = time.perf_counter() - start
+            signatures = video_signatures(output_path)
+            if reference is None:
+                reference, base_time = signatures, elapsed
+                message = "referencia"
+            else:
+                if args.output == 'carry':
+                    ok, message = len(signatures) == len(reference), f"{len(signatures)} frames"
+                else:
+                    # El video debe ser exactamente los frames múltiplo del paso
+                    ok, message = check_same_frames(reference[::stride], signatures)
+                message = f"{'✅' if ok else '❌'} {message}"
+            print(f"{stride:>5} {len(signatures):>7} {elapsed:>8.2f} {base_time / elapsed:>6.2f}  {message}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def bench_video_io(args):
+    """Lectura y escritura de video con OpenCV (mp4v) vs ffmpeg por tubería: fps y tamaño de salida"""
+    import os
+    import shutil
+    import tempfile
+
+    from utils.ffmpeg_io import open_video_reader, open_video_writer
+
+    config = load_config(args.config)
+    frames = read_frames(args.video, args.frames)
+    if not frames:
+        print(f"❌ No se pudieron leer frames de {args.video}")
+        return
+    height, width = frames[0].shape[:2]
+    cap = cv2.VideoCapture(args.video)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+    work_dir = tempfile.mkdtemp(prefix='bench-io-')
+    try:
+        print(f"📊 {len(frames)} frames {width}x{height} de {args.video}")
+        print(f"{'backend':>8} {'lectura fps':>12} {'escritura fps':>14} {'MB':>8}")
+        for backend in args.backends:
+            backend_config = dict(config, video=dict(config.get('video') or {}, io_backend=backend))
+
+            cap = open_video_reader(args.video, backend_config)
+            start = time.perf_counter()
+            decoded = 0
+            while decoded < len(frames):
+                ret, _ = cap.read()
+                if not ret:
+                    break
+                decoded += 1
+            read_time = time.perf_counter() - start
+            cap.release()
+
+            output_path = os.path.join(work_dir, f"{backend}.mp4")
+            out = open_video_writer(output_path, fps, (width, height), backend_config)
+            start = time.perf_counter()
+            for frame in frames:
+                out.write(frame)
+            out.release()
+            write_time = time.perf_counter() - start
+
+            size_mb = os.path.getsize(output_path) / 1e6
+            print(f"{backend:>8} {decoded / read_time:>12.1f} {len(frames) / write_time:>14.1f} {size_mb:>8.2f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks de Nopal Detector')
+    parser.add_argument('--config', default='config/model_config.yaml',
+                        help='Ruta al archivo de configuración')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    video_batch = subparsers.add_parser('video-batch', help='Inferencia por lotes en video')
+    video_batch.add_argument('--video', required=True, help='Video de entrada')
+    video_batch.add_argument('--weights', help='Pesos del modelo de nopales')
+    video_batch.add_argument('--frames', type=int, default=128,
+                             help='Frames a procesar (default: 128)')
+    video_batch.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 8, 16],
+                             help='Tamaños de lote a comparar (default: 1 4 8 16)')
+    video_batch.set_defaults(func=bench_video_batch)
+
+    segments = subparsers.add_parser('video-segments',
+                                     help='Video por tramos en varios procesos vs camino serie')
+    segments.add_argument('--video', required=True, help='Video de entrada')
+    segments.add_argument('--weights', help='Pesos del modelo de nopales')
+    segments.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8],
+                          help='Procesos a comparar (default: 1 2 4 8)')
+    segments.set_defaults(func=bench_video_segments)
+
+    stride = subparsers.add_parser('video-stride', help='Submuestreo temporal del video (1 de cada N frames)')
+    stride.add_argument('--video', required=True, help='Video de entrada')
+    stride.add_argument('--weights', help='Pesos del modelo de nopales')
+    stride.add_argument('--strides', type=int, nargs='+', default=[2, 5, 10],
+                        help='Pasos a comparar con el video completo (default: 2 5 10)')
+    stride.add_argument('--output', choices=['sampled', 'carry'], default='sampled',
+                        help='Salida del video submuestreado (default: sampled)')
+    stride.set_defaults(func=bench_video_stride)
+
+    video_io = subparsers.add_parser('video-io', help='E/S de video: OpenCV vs ffmpeg (fps y tamaño)')
+    video_io.add_argument('--video', required=True, help='Video de entrada')
+    video_io.add_argument('--frames', type=int, default=600,
+                          help='Frames a leer y escribir (default: 600)')
+    video_io.add_argument('--backends', nargs='+', choices=['opencv', 'ffmpeg'], default=['opencv', 'ffmpeg'],
+                          help='Backends a comparar (default: opencv ffmpeg)')
+    video_io.set_defaults(func=bench_video_io)
+
+    frame_buffer = subparsers.add_parser('frame-buffer', help='Buffer circular de frames (sin modelos)')
+    frame_buffer.add_argument('--sizes', type=int, nargs='+', default=[30, 90, 300],
+                              help='Capacidades a comparar (default: 30 90 300)')
+    frame_buffer.add_argument('--width', type=int, default=1920, help='Ancho del frame (default: 1920)')
+    frame_buffer.add_argument('--height', type=int, default=1080, help='Alto del frame (default: 1080)')
+    frame_buffer.add_argument('--frames', type=int, default=600,
+                              help='Frames añadidos por medición (default: 600)')
+    frame_buffer.set_defaults(func=bench_frame_buffer)
+
+    registry = subparsers.add_parser('registry', help='Arranque de varios detectores en un proceso')
+    registry.add_argument('--weights', help='Pesos del modelo de nopales')
+    registry.add_argument('--disabled', action='store_true',
+                          help='Desactivar el registro (cada detector carga sus modelos)')
+    registry.set_defaults(func=bench_registry)
+
+    tracker = subparsers.add_parser('tracker', help='Asociación del tracker (sin modelos)')
+    tracker.add_argument('--tracks', type=int, nargs='+', default=[10, 30, 60, 100],
+                         help='Número de objetos simulados (default: 10 30 60 100)')
+    tracker.add_argument('--frames', type=int, default=500,
+                         help='Frames simulados (default: 500)')
+    tracker.add_argument('--detect-interval', type=int, default=5,
+                         help='Frames entre actualizaciones con detecciones (default: 5)')
+    tracker.set_defaults(func=bench_tracker)
+
+    annotate = subparsers.add_parser('annotate', help='Coste de dibujar cajas y etiquetas (sin modelos)')
+    annotate.add_argument('--boxes', type=int, nargs='+', default=[5, 50, 500],
+                          help='Cajas por frame (default: 5 50 500)')
+    annotate.add_argument('--width', type=int, default=1280, help='Ancho del frame (default: 1280)')
+    annotate.add_argument('--height', type=int, default=720, help='Alto del frame (default: 720)')
+    annotate.add_argument('--repeats', type=int, default=50,
+                          help='Repeticiones por medición (default: 50)')
+    annotate.set_defaults(func=bench_annotate)
+
+    suppression = subparsers.add_parser('suppression', help='Supresión nopal/persona (sin modelos)')
+    suppression.add_argument('--nopales', type=int, nargs='+', default=[5, 20, 50, 100],
+                             help='Nopales por frame; personas = nopales / 5 (default: 5 20 50 100)')
+    suppression.add_argument('--mode', choices=['suppress', 'relabel'], default='suppress',
+                             help='Modo de supresión (default: suppress)')
+    suppression.add_argument('--repeats', type=int, default=200,
+                             help='Repeticiones por medición (default: 200)')
+    suppression.set_defaults(func=bench_suppression)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
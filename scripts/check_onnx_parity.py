@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+🌵 Nopal Detector - Verificación de paridad PyTorch vs ONNX
+Compara las detecciones de MultiClassDetector.process_results con ambos backends
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+import yaml
+
+# Agregar src al path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from models.backends import load_detection_model, IMAGE_EXTENSIONS
+from models.multi_class_detector import MultiClassDetector
+from utils.box_ops import box_iou
+
+
+def compare_detections(reference, candidate, iou_threshold, conf_tolerance):
+    """
+    Empareja detecciones por clase e IoU y devuelve las diferencias
+
+    Args:
+        reference: Detecciones del backend PyTorch
+        candidate: Detecciones del backend ONNX
+        iou_threshold: IoU mínimo para considerar dos cajas iguales
+        conf_tolerance: Diferencia máxima de confianza permitida
+
+    Returns:
+        list: Mensajes de diferencias (vacía si hay paridad)
+    """
+    problems = []
+    if len(reference) != len(candidate):
+        problems.append(f"número de detecciones {len(reference)} != {len(candidate)}")
+
+    if not reference or not candidate:
+        return problems
+
+    ref_boxes = np.array([d['bbox'] for d in reference], dtype=np.float32)
+    cand_boxes = np.array([d['bbox'] for d in candidate], dtype=np.float32)
+    ious = box_iou(ref_boxes, cand_boxes)
+
+    for i, det in enumerate(reference):
+        j = int(ious[i].argmax())
+        match = candidate[j]
+        if ious[i, j] < iou_threshold:
+            problems.append(f"{det['class']} {det['bbox']} sin pareja (IoU máx {ious[i, j]:.3f})")
+        elif match['class'] != det['class']:
+            problems.append(f"clase {det['class']} != {match['class']} en {det['bbox']}")
+        elif abs(match['confidence'] - det['confidence']) > conf_tolerance:
+            problems.append(f"confianza {det['confidence']:.3f} != {match['confidence']:.3f}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Paridad de detecciones PyTorch vs ONNX')
+    parser.add_argument('--config', default='config/model_config.yaml',
+                        help='Ruta al archivo de configuración')
+    parser.add_argument('--weights', required=True, help='Pesos .pt del modelo entrenado')
+    parser.add_argument('--onnx', help='Modelo .onnx (default: exportar junto a --weights)')
+    parser.add_argument('--images', required=True, help='Directorio de imágenes de prueba')
+    parser.add_argument('--iou', type=float, default=0.9,
+                        help='IoU mínimo entre cajas emparejadas (default: 0.9)')
+    parser.add_argument('--conf-tolerance', type=float, default=0.02,
+                        help='Diferencia máxima de confianza (default: 0.02)')
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        config = yaml.safe_load(f)
+    conf = config['model']['prediction']['confidence_threshold']
+
+    detector = MultiClassDetector(config)
+    torch_model = load_detection_model(args.weights, backend='pytorch')
+    onnx_model = load_detection_model(args.onnx or args.weights, backend='onnx')
+    detector.class_names = list(torch_model.names.values())
+    detector.generate_class_colors()
+
+    images = sorted(p for p in Path(args.images).iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+    failures = 0
+
+    for image_path in images:
+        image = cv2.imread(str(image_path))
+        if image is None:
+            continue
+        reference = detector.process_results(torch_model(image, conf=conf, verbose=False)[0])
+        candidate = detector.process_results(onnx_model(image, conf=conf, verbose=False)[0])
+
+        problems = compare_detections(reference, candidate, args.iou, args.conf_tolerance)
+        if problems:
+            failures += 1
+            print(f"❌ {image_path.name}:")
+            for problem in problems:
+                print(f"   {problem}")
+        else:
+            print(f"✅ {image_path.name}: {len(reference)} detecciones iguales")
+
+    print(f"\n📊 {len(images) - failures}/{len(images)} imágenes con paridad")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
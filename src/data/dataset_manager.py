@@ -166,6 +166,172 @@ class DatasetManager:
         
         print(f"✅ data.yaml actualizado: {data_yaml_path}")
     
+    def build_fused_dataset(self, paths: Optional[Dict[str, str]] = None,
+                            output_dir: Optional[str] = None) -> str:
+        """
+        Construye un dataset combinado nopales + personas para el modelo fusionado
+        
+        Parte de la estructura de ``prepare_dataset`` y agrega la clase 'person'
+        al final de las clases de Roboflow. Las personas se obtienen de:
+        
+        - Pseudo-etiquetas del modelo COCO (``model.person_model``) sobre las
+          imágenes de nopales (``fused.pseudo_label_persons``), para que las
+          personas presentes en esas imágenes no cuenten como fondo.
+        - Un dataset YOLO opcional de personas (``fused.person_dataset``) con
+          carpetas train/valid; solo se conservan las cajas de
+          ``fused.person_source_class``.
+        
+        Args:
+            paths: Rutas devueltas por prepare_dataset (se llama si es None)
+            output_dir: Directorio del dataset combinado (default: <dataset>-fused)
+            
+        Returns:
+            str: Ruta del data.yaml del dataset combinado
+        """
+        if paths is None:
+            paths = self.prepare_dataset()
+        
+        fused_config = self.config.get('fused', {})
+        base_dir = self.dataset_location
+        output_dir = output_dir or f"{base_dir.rstrip(os.sep)}-fused"
+        
+        print(f"🔀 Construyendo dataset combinado en: {output_dir}")
+        
+        with open(os.path.join(base_dir, "data.yaml"), "r") as f:
+            data_yaml = yaml.safe_load(f)
+        
+        names = data_yaml.get('names', [])
+        if isinstance(names, dict):
+            names = [names[k] for k in sorted(names)]
+        names = list(names)
+        if 'person' in names:
+            raise ValueError("❌ El dataset ya contiene la clase 'person'")
+        person_id = len(names)
+        
+        person_model = None
+        if fused_config.get('pseudo_label_persons', True):
+            from ultralytics import YOLO
+            person_model = YOLO(self.config['model']['person_model'])
+        pseudo_conf = fused_config.get('pseudo_label_conf', 0.5)
+        
+        fused_paths = {}
+        for split in ('train', 'valid', 'test'):
+            img_out = os.path.join(output_dir, split, "images")
+            lbl_out = os.path.join(output_dir, split, "labels")
+            os.makedirs(img_out, exist_ok=True)
+            os.makedirs(lbl_out, exist_ok=True)
+            fused_paths[split] = img_out
+            
+            count = self._merge_split(
+                paths[f'{split}_img'], paths[f'{split}_lbl'], img_out, lbl_out,
+                class_map=None, person_model=person_model,
+                person_id=person_id, pseudo_conf=pseudo_conf
+            )
+            print(f"   ✅ {split}: {count} imágenes de nopales")
+        
+        # Dataset externo de personas (formato YOLO)
+        person_dataset = fused_config.get('person_dataset')
+        if person_dataset:
+            source_class = fused_config.get('person_source_class', 0)
+            max_images = fused_config.get('max_person_images')
+            for split in ('train', 'valid'):
+                src_img = os.path.join(person_dataset, split, "images")
+                src_lbl = os.path.join(person_dataset, split, "labels")
+                if not os.path.isdir(src_img):
+                    print(f"   ⚠️ No existe {src_img}, omitiendo")
+                    continue
+                count = self._merge_split(
+                    src_img, src_lbl,
+                    fused_paths[split], os.path.join(output_dir, split, "labels"),
+                    class_map={source_class: person_id}, prefix="person_",
+                    max_images=max_images
+                )
+                print(f"   ✅ {split}: {count} imágenes de personas")
+        elif person_model is None:
+            print("⚠️ Sin fused.person_dataset ni pseudo-etiquetas: no habrá ejemplos de 'person'")
+        
+        fused_yaml = {
+            'names': names + ['person'],
+            'nc': person_id + 1,
+            'train': fused_paths['train'],
+            'val': fused_paths['valid'],
+        }
+        if os.listdir(fused_paths['test']):
+            fused_yaml['test'] = fused_paths['test']
+        
+        fused_yaml_path = os.path.join(output_dir, "data.yaml")
+        with open(fused_yaml_path, "w") as f:
+            yaml.dump(fused_yaml, f)
+        
+        print(f"✅ Dataset combinado listo: {fused_yaml_path} ({fused_yaml['names']})")
+        return fused_yaml_path
+    
+    def _merge_split(self, src_img_dir: str, src_lbl_dir: str, dst_img_dir: str,
+                     dst_lbl_dir: str, class_map: Optional[Dict[int, int]] = None,
+                     person_model=None, person_id: int = 0, pseudo_conf: float = 0.5,
+                     prefix: str = "", max_images: Optional[int] = None) -> int:
+        """
+        Copia imágenes y etiquetas de un split al dataset combinado
+        
+        Args:
+            src_img_dir: Directorio de imágenes de origen
+            src_lbl_dir: Directorio de etiquetas de origen
+            dst_img_dir: Directorio de imágenes de destino
+            dst_lbl_dir: Directorio de etiquetas de destino
+            class_map: Remapeo de clases (None conserva todas; las clases
+                fuera del mapa se descartan)
+            person_model: Modelo COCO para pseudo-etiquetar personas
+            person_id: Índice de 'person' en el dataset combinado
+            pseudo_conf: Confianza mínima de las pseudo-etiquetas
+            prefix: Prefijo de nombres para evitar colisiones
+            max_images: Límite de imágenes a copiar
+            
+        Returns:
+            int: Número de imágenes copiadas
+        """
+        if not os.path.isdir(src_img_dir):
+            return 0
+        
+        images = sorted(f for f in os.listdir(src_img_dir)
+                        if f.lower().endswith((".jpg", ".jpeg", ".png")))
+        if max_images:
+            images = images[:max_images]
+        
+        for img in images:
+            stem = os.path.splitext(img)[0]
+            dst_img = os.path.join(dst_img_dir, prefix + img)
+            if not os.path.exists(dst_img):
+                try:
+                    os.link(os.path.join(src_img_dir, img), dst_img)
+                except OSError:
+                    shutil.copy2(os.path.join(src_img_dir, img), dst_img)
+            
+            lines = []
+            lbl_path = os.path.join(src_lbl_dir, stem + ".txt")
+            if os.path.exists(lbl_path):
+                with open(lbl_path, "r") as f:
+                    for line in f:
+                        parts = line.split()
+                        if not parts:
+                            continue
+                        class_id = int(parts[0])
+                        if class_map is not None:
+                            if class_id not in class_map:
+                                continue
+                            class_id = class_map[class_id]
+                        lines.append(" ".join([str(class_id)] + parts[1:]))
+            
+            if person_model is not None:
+                result = person_model(dst_img, conf=pseudo_conf, classes=[0], verbose=False)[0]
+                if result.boxes is not None:
+                    for cx, cy, w, h in result.boxes.xywhn.cpu().numpy():
+                        lines.append(f"{person_id} {cx:.6f} {cy:.6f} {w:.6f} {h:.6f}")
+            
+            with open(os.path.join(dst_lbl_dir, prefix + stem + ".txt"), "w") as f:
+                f.write("\n".join(lines) + ("\n" if lines else ""))
+        
+        return len(images)
+    
     def get_data_yaml_path(self) -> Optional[str]:
         """
         Obtiene la ruta del archivo data.yaml
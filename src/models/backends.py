@@ -0,0 +1,368 @@
+"""
+Backends de inferencia - Nopal Detector
+Permite usar los modelos YOLO con PyTorch (ultralytics) o con ONNX Runtime en CPU.
+El backend ONNX implementa letterbox, decodificación y NMS en NumPy y devuelve
+objetos ``Results`` de ultralytics, de modo que los detectores no cambian.
+"""
+
+import ast
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+from ultralytics.engine.results import Results
+
+from utils.box_ops import batched_nms, xywh2xyxy
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('pytorch', 'onnx')
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'}
+
+
+def letterbox(image: np.ndarray, new_shape: Tuple[int, int] = (640, 640),
+              color: Tuple[int, int, int] = (114, 114, 114)) -> Tuple[np.ndarray, float, Tuple[float, float]]:
+    """
+    Redimensiona manteniendo la proporción y rellena hasta new_shape
+
+    Args:
+        image: Imagen BGR (H, W, 3)
+        new_shape: Tamaño destino (alto, ancho)
+        color: Color del relleno
+
+    Returns:
+        Tuple: (imagen, escala, (relleno_x, relleno_y))
+    """
+    h, w = image.shape[:2]
+    gain = min(new_shape[0] / h, new_shape[1] / w)
+    new_w, new_h = int(round(w * gain)), int(round(h * gain))
+    pad_x = (new_shape[1] - new_w) / 2
+    pad_y = (new_shape[0] - new_h) / 2
+
+    if (w, h) != (new_w, new_h):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)
+    return image, gain, (pad_x, pad_y)
+
+
+def decode_predictions(output: np.ndarray, conf: float, iou: float, max_det: int = 300,
+                       classes: Optional[List[int]] = None, max_nms: int = 30000) -> np.ndarray:
+    """
+    Decodifica la salida cruda de YOLO (4 + nc, anclas) y aplica NMS por clase
+
+    Args:
+        output: Salida de una imagen con forma (4 + nc, N)
+        conf: Umbral de confianza
+        iou: Umbral de IoU para NMS
+        max_det: Máximo de detecciones a conservar
+        classes: Clases permitidas (None = todas)
+        max_nms: Máximo de candidatos que entran a NMS
+
+    Returns:
+        np.ndarray: Detecciones (M, 6) [x1, y1, x2, y2, conf, cls] en coordenadas del letterbox
+    """
+    preds = output.T
+    class_scores = preds[:, 4:]
+    cls = class_scores.argmax(axis=1)
+    scores = class_scores[np.arange(len(cls)), cls]
+
+    mask = scores > conf
+    if classes is not None:
+        mask &= np.isin(cls, classes)
+    if not mask.any():
+        return np.zeros((0, 6), dtype=np.float32)
+
+    boxes = xywh2xyxy(preds[mask, :4])
+    scores = scores[mask]
+    cls = cls[mask]
+
+    if len(scores) > max_nms:
+        top = np.argsort(-scores)[:max_nms]
+        boxes, scores, cls = boxes[top], scores[top], cls[top]
+
+    keep = batched_nms(boxes, scores, cls, iou)[:max_det]
+    return np.concatenate(
+        [boxes[keep], scores[keep, None], cls[keep, None].astype(np.float32)], axis=1
+    ).astype(np.float32)
+
+
+def scale_boxes(boxes: np.ndarray, gain: float, pad: Tuple[float, float],
+                orig_shape: Tuple[int, int]) -> np.ndarray:
+    """
+    Lleva cajas del espacio letterbox a la imagen original
+
+    Args:
+        boxes: Array (N, 4+) con xyxy en las primeras columnas (se modifica)
+        gain: Escala aplicada en letterbox
+        pad: Relleno (x, y) aplicado en letterbox
+        orig_shape: (alto, ancho) de la imagen original
+
+    Returns:
+        np.ndarray: El mismo array con las cajas reescaladas y recortadas
+    """
+    boxes[:, [0, 2]] = np.clip((boxes[:, [0, 2]] - pad[0]) / gain, 0, orig_shape[1])
+    boxes[:, [1, 3]] = np.clip((boxes[:, [1, 3]] - pad[1]) / gain, 0, orig_shape[0])
+    return boxes
+
+
+class OnnxYOLO:
+    """
+    Modelo YOLO exportado a ONNX ejecutado con ONNX Runtime en CPU.
+
+    Imita la interfaz de llamada de ``ultralytics.YOLO`` usada por los
+    detectores (``model(source, conf=..., iou=...)`` y ``model.names``).
+    """
+
+    def __init__(self, onnx_path: str, imgsz: Optional[int] = None, threads: Optional[int] = None):
+        """
+        Carga la sesión de ONNX Runtime
+
+        Args:
+            onnx_path: Ruta del modelo .onnx
+            imgsz: Tamaño de entrada (default: el de los metadatos del modelo)
+            threads: Hilos intra-op de ONNX Runtime (default: automático)
+        """
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ImportError("❌ onnxruntime no está instalado. Ejecuta: pip install onnxruntime")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+
+        self.onnx_path = str(onnx_path)
+        self.session = ort.InferenceSession(
+            self.onnx_path, sess_options=options, providers=['CPUExecutionProvider']
+        )
+        self.input_name = self.session.get_inputs()[0].name
+        input_shape = self.session.get_inputs()[0].shape
+        self.dynamic_batch = not isinstance(input_shape[0], int)
+
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = self._parse_names(metadata.get('names'))
+        if imgsz is None:
+            imgsz = ast.literal_eval(metadata['imgsz'])[0] if 'imgsz' in metadata else 640
+        self.imgsz = int(imgsz)
+
+    @staticmethod
+    def _parse_names(raw: Optional[str]) -> Dict[int, str]:
+        """Lee los nombres de clases guardados por el exportador de ultralytics"""
+        if not raw:
+            return {0: 'nopal'}
+        names = ast.literal_eval(raw)
+        if isinstance(names, list):
+            names = dict(enumerate(names))
+        return {int(k): v for k, v in names.items()}
+
+    def __call__(self, source: Any, conf: float = 0.25, iou: float = 0.7, max_det: int = 300,
+                 classes: Optional[List[int]] = None, stream: bool = False, save: bool = False,
+                 verbose: bool = False, **kwargs) -> Union[List[Results], Iterator[Results]]:
+        """
+        Ejecuta la detección
+
+        Args:
+            source: Imagen (ndarray o ruta), lista de imágenes o directorio
+            conf: Umbral de confianza
+            iou: Umbral de IoU para NMS
+            max_det: Máximo de detecciones por imagen
+            classes: Clases permitidas (None = todas)
+            stream: Si True, devuelve un generador
+            save: Si True, guarda las imágenes anotadas en runs/detect/predict
+            verbose: Ignorado (compatibilidad con ultralytics)
+
+        Returns:
+            List o generador de ``Results``
+        """
+        generator = self._predict(source, conf, iou, max_det, classes, save)
+        return generator if stream else list(generator)
+
+    def predict_raw(self, images: List[np.ndarray]) -> Tuple[np.ndarray, List[Tuple[float, Tuple[float, float]]]]:
+        """
+        Ejecuta el modelo sin decodificar ni aplicar NMS
+
+        Args:
+            images: Imágenes BGR
+
+        Returns:
+            Tuple: (salida (B, 4 + nc, N), [(escala, relleno)] por imagen)
+        """
+        batch = []
+        transforms = []
+        for image in images:
+            boxed, gain, pad = letterbox(image, (self.imgsz, self.imgsz))
+            batch.append(boxed)
+            transforms.append((gain, pad))
+
+        # BGR HWC uint8 → RGB CHW float32 [0, 1]
+        tensor = np.ascontiguousarray(np.stack(batch)[..., ::-1].transpose(0, 3, 1, 2), dtype=np.float32)
+        tensor /= 255.0
+
+        if self.dynamic_batch:
+            output = self.session.run(None, {self.input_name: tensor})[0]
+        else:
+            output = np.concatenate([
+                self.session.run(None, {self.input_name: tensor[i:i + 1]})[0]
+                for i in range(len(tensor))
+            ])
+        return output, transforms
+
+    def _predict(self, source: Any, conf: float, iou: float, max_det: int,
+                 classes: Optional[List[int]], save: bool) -> Iterator[Results]:
+        """Genera resultados por lotes de la fuente"""
+        for paths, images in self._iter_source(source):
+            output, transforms = self.predict_raw(images)
+            for i, (path, image) in enumerate(zip(paths, images)):
+                detections = decode_predictions(output[i], conf, iou, max_det, classes)
+                gain, pad = transforms[i]
+                scale_boxes(detections, gain, pad, image.shape[:2])
+                result = Results(image, path=path, names=self.names, boxes=detections)
+                if save:
+                    self._save_result(result)
+                yield result
+
+    def _iter_source(self, source: Any, batch_size: int = 16) -> Iterator[Tuple[List[str], List[np.ndarray]]]:
+        """Normaliza la fuente en lotes de (rutas, imágenes)"""
+        if isinstance(source, np.ndarray):
+            yield ["image0.jpg"], [source]
+            return
+
+        if isinstance(source, (list, tuple)):
+            if all(isinstance(item, np.ndarray) for item in source):
+                yield [f"image{i}.jpg" for i in range(len(source))], list(source)
+                return
+            files = [str(item) for item in source]
+        else:
+            path = Path(source)
+            if path.is_dir():
+                files = sorted(str(p) for p in path.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+            else:
+                files = [str(path)]
+
+        for start in range(0, len(files), batch_size):
+            paths, images = [], []
+            for file in files[start:start + batch_size]:
+                image = cv2.imread(file)
+                if image is None:
+                    logger.warning("⚠️ No se pudo leer: %s", file)
+                    continue
+                paths.append(file)
+                images.append(image)
+            if images:
+                yield paths, images
+
+    @staticmethod
+    def _save_result(result: Results, save_dir: str = "runs/detect/predict") -> None:
+        """Guarda la imagen anotada como lo hace ultralytics con save=True"""
+        os.makedirs(save_dir, exist_ok=True)
+        cv2.imwrite(os.path.join(save_dir, Path(result.path).name), result.plot())
+
+
+def export_onnx(weights_path: str, imgsz: int = 640, dynamic: bool = True,
+                simplify: bool = True, opset: Optional[int] = None,
+                output_path: Optional[str] = None) -> str:
+    """
+    Exporta un modelo entrenado (best.pt) a ONNX
+
+    Args:
+        weights_path: Ruta del modelo .pt
+        imgsz: Tamaño de entrada
+        dynamic: Si permitir tamaño de lote dinámico
+        simplify: Si simplificar el grafo con onnxslim/onnxsim
+        opset: Versión de opset (default: la de ultralytics)
+        output_path: Ruta del .onnx (default: la de ultralytics, <pesos>.onnx)
+
+    Returns:
+        str: Ruta del archivo .onnx generado
+    """
+    logger.info("📦 Exportando a ONNX: %s", weights_path)
+    kwargs = {'format': 'onnx', 'imgsz': imgsz, 'dynamic': dynamic, 'simplify': simplify}
+    if opset:
+        kwargs['opset'] = opset
+
+    # ultralytics siempre escribe <pesos>.onnx: con otra salida se aparta el existente
+    default_path = Path(weights_path).with_suffix('.onnx')
+    backup = None
+    if output_path and default_path.exists():
+        backup = default_path.with_suffix('.onnx.bak')
+        os.replace(default_path, backup)
+    try:
+        onnx_path = YOLO(weights_path).export(**kwargs)
+        if output_path:
+            os.replace(onnx_path, output_path)
+            onnx_path = output_path
+    finally:
+        if backup is not None:
+            os.replace(backup, default_path)
+    logger.info("✅ Modelo ONNX: %s", onnx_path)
+    return str(onnx_path)
+
+
+def resolve_backend(weights_path: str, backend: Optional[str] = None) -> str:
+    """
+    Determina el backend a usar para unos pesos
+
+    Args:
+        weights_path: Ruta de los pesos (.pt u .onnx)
+        backend: 'pytorch', 'onnx' o None/'auto' (según la extensión).
+            Los archivos .onnx siempre usan 'onnx'
+
+    Returns:
+        str: 'pytorch' u 'onnx'
+    """
+    # Un archivo .onnx solo puede ejecutarse con ONNX Runtime
+    if str(weights_path).endswith('.onnx'):
+        return 'onnx'
+    if backend in (None, 'auto'):
+        return 'pytorch'
+    if backend not in BACKENDS:
+        raise ValueError(f"❌ Backend no soportado: {backend}. Opciones: {', '.join(BACKENDS)}")
+    return backend
+
+
+def load_detection_model(weights_path: str, backend: Optional[str] = None,
+                         imgsz: Optional[int] = None, threads: Optional[int] = None) -> Any:
+    """
+    Carga un modelo de detección con el backend indicado
+
+    Con backend 'onnx' y pesos .pt se exporta (o reutiliza) el .onnx junto a
+    los pesos, regenerándolo si el .pt es más reciente.
+
+    Args:
+        weights_path: Ruta de los pesos (.pt u .onnx)
+        backend: 'pytorch', 'onnx' o None/'auto'
+        imgsz: Tamaño de entrada para ONNX
+        threads: Hilos intra-op de ONNX Runtime
+
+    Returns:
+        YOLO u OnnxYOLO
+    """
+    backend = resolve_backend(weights_path, backend)
+    if backend == 'pytorch':
+        return YOLO(weights_path)
+
+    onnx_path = str(weights_path)
+    if onnx_path.endswith('.onnx'):
+        return OnnxYOLO(onnx_path, imgsz=imgsz, threads=threads)
+
+    onnx_path = str(Path(weights_path).with_suffix('.onnx'))
+    if not os.path.exists(onnx_path) or (
+            os.path.exists(weights_path)
+            and os.path.getmtime(onnx_path) < os.path.getmtime(weights_path)):
+        onnx_path = export_onnx(weights_path, imgsz=imgsz or 640)
+    model = OnnxYOLO(onnx_path, imgsz=imgsz, threads=threads)
+    if not model.dynamic_batch and os.path.exists(weights_path):
+        # Exportado con lote fijo (p. ej. por una cuantización antigua): se infiere de uno en uno
+        logger.warning("⚠️ %s tiene lote fijo; se vuelve a exportar con lote dinámico", onnx_path)
+        onnx_path = export_onnx(weights_path, imgsz=imgsz or 640)
+        model = OnnxYOLO(onnx_path, imgsz=imgsz, threads=threads)
+    return model
@@ -7,7 +7,7 @@ import os
 import cv2
 import numpy as np
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 from ultralytics import YOLO
 from sys import path as syspath
 from pathlib import Path
@@ -15,6 +15,20 @@ from pathlib import Path
 # Importar error handler
 syspath.insert(0, str(Path(__file__).parent.parent))
 from utils.error_handler import ResourceManager, log_execution_time
+from utils.pipeline import StagedPipeline
+from utils.motion_gate import MotionGate
+from utils.tracker import KeyframeTracker
+from utils.annotator import Annotator, extract_detections
+from utils.filters import SizeFilter
+from utils.suppression import PersonOverlapSuppressor, split_person_detections
+from utils.detection_log import DetectionLog
+from utils.sidecar import SidecarReader, SidecarWriter, sidecar_path_for
+from utils.video_processor import STRIDE_OUTPUTS, resolve_frame_stride, skip_frames
+from utils.ffmpeg_io import open_video_writer
+from models.registry import load_model_from_config
+from models.fused import (
+    COCO_PERSON_CLASS_ID, is_fused_enabled, person_class_id, split_fused_result
+)
 
 logger = logging.getLogger(__name__)
 
@@ -36,6 +50,32 @@ class NopalPersonDetector:
         self.nopal_model = None
         self.person_model = None
         self.best_model_path = None
+        self.person_class_id = COCO_PERSON_CLASS_ID
+        self.fused = False
+        self.last_pipeline_stats = {}
+        self._frames_written = 0
+        self.motion_gate = MotionGate.from_config(config)
+        self._last_results = None
+        self.tracker = None
+        self.last_track_stats = {}
+        self.last_stats = {}
+        self.size_filter = SizeFilter.from_config(config, 'video')
+        self.suppressor = PersonOverlapSuppressor.from_config(config)
+        self._detection_log: Optional[DetectionLog] = None
+        self._log_source = None
+        self._log_fps = 0.0
+        self._frames_annotated = 0
+        self._frame_step = 1
+        self._frames_read = 0
+        self._carry_stride = 1
+        self._stride_position = 0
+        self.last_frame_range = (0, 0)
+        
+        # Renderizado compartido: nopales en verde, personas en azul
+        self.nopal_annotator = Annotator.from_config(config, ['nopal'], [(0, 255, 0)],
+                                                     font_scale=0.5, label_background=False)
+        self.person_annotator = Annotator.from_config(config, ['person'], [(255, 0, 0)],
+                                                      font_scale=0.5, label_background=False)
         
     def train_nopal_model(self, data_yaml_path: str) -> Dict[str, Any]:
         """
@@ -79,26 +119,111 @@ class NopalPersonDetector:
         """
         logger.info("📥 Cargando modelos...")
         
+        if not nopal_model_path and is_fused_enabled(self.config):
+            nopal_model_path = self.config['fused'].get('model_path')
+        
         # Cargar modelo de nopales
         if nopal_model_path and os.path.exists(nopal_model_path):
-            self.nopal_model = YOLO(nopal_model_path)
+            self.nopal_model = load_model_from_config(nopal_model_path, self.model_config)
             logger.info(f"✅ Modelo nopales: {nopal_model_path}")
         elif self.best_model_path and os.path.exists(self.best_model_path):
-            self.nopal_model = YOLO(self.best_model_path)
+            self.nopal_model = load_model_from_config(self.best_model_path, self.model_config)
             logger.info(f"✅ Modelo nopales: {self.best_model_path}")
         else:
             logger.warning("⚠️ No se encontró modelo de nopales")
             
+        # Modelo fusionado: una sola pasada cubre nopales y personas
+        fused_person_id = person_class_id(getattr(self.nopal_model, 'names', None))
+        if self.nopal_model is not None and fused_person_id is not None:
+            if not is_fused_enabled(self.config):
+                logger.info("🔀 El modelo incluye la clase 'person', usando modo fusionado")
+            self.fused = True
+            self.person_model = self.nopal_model
+            self.person_class_id = fused_person_id
+            logger.info("✅ Modelo fusionado (persona = clase %d)", fused_person_id)
+            return
+        
+        if is_fused_enabled(self.config):
+            logger.warning("⚠️ fused.enabled activo pero el modelo no tiene clase 'person'")
+        
         # Cargar modelo de personas
-        self.person_model = YOLO(self.model_config['person_model'])
+        self.fused = False
+        self.person_class_id = COCO_PERSON_CLASS_ID
+        self.person_model = load_model_from_config(self.model_config['person_model'], self.model_config)
         logger.info("✅ Modelo personas cargado")
     
-    def predict_images(self, test_img_dir: str) -> str:
+    def _run_models(self, source: Any, conf_thresh: float, **kwargs) -> List[Tuple[Any, Any]]:
+        """
+        Ejecuta la inferencia de nopales y personas sobre una fuente
+        
+        En modo fusionado se hace una sola pasada y el resultado se separa
+        por clase; en modo clásico se llama a cada modelo una vez, o una sola
+        vez si ambos comparten instancia. Con ``stream=True`` se devuelve un
+        generador: solo el modelo de nopales hace streaming y el de personas
+        se ejecuta sobre ``orig_img`` de cada resultado, porque dos
+        generadores sobre el mismo predictor se bloquean entre sí.
+        
+        Args:
+            source: Frame, lista de frames, imagen o directorio
+            conf_thresh: Umbral de confianza
+            **kwargs: Argumentos adicionales para YOLO
+            
+        Returns:
+            List (o iterador si stream=True): Pares (resultado_nopal, resultado_persona)
+            en el orden de entrada
+        """
+        if self.fused:
+            results = self.nopal_model(source, conf=conf_thresh, **kwargs)
+            pairs = (split_fused_result(r, self.person_class_id) for r in results)
+        elif self.person_model is self.nopal_model:
+            # Mismos pesos para ambos: una pasada sirve para los dos resultados
+            results = self.nopal_model(source, conf=conf_thresh, **kwargs)
+            pairs = ((r, r) for r in results)
+        elif kwargs.get('stream'):
+            person_kwargs = dict(kwargs, stream=False)
+            res_nopal = self.nopal_model(source, conf=conf_thresh, **kwargs)
+            pairs = ((r, self.person_model(r.orig_img, conf=conf_thresh, **person_kwargs)[0])
+                     for r in res_nopal)
+        else:
+            res_nopal = self.nopal_model(source, conf=conf_thresh, **kwargs)
+            res_person = self.person_model(source, conf=conf_thresh, **kwargs)
+            pairs = zip(res_nopal, res_person)
+        if self.size_filter.enabled:
+            # Una pasada de NumPy por frame antes del tracker, las anotaciones y los conteos
+            pairs = ((self.size_filter.filter_result(r_nopal), r_person) for r_nopal, r_person in pairs)
+        return pairs if kwargs.get('stream') else list(pairs)
+    
+    def _resolve_detections(self, r_nopal, r_person) -> Tuple[np.ndarray, Optional[np.ndarray],
+                                                               np.ndarray, Optional[np.ndarray]]:
+        """
+        Detecciones finales de un par de resultados, como arrays (N, 6)
+        
+        Solo se conserva la clase persona (clase 0 en COCO, 'person' en el
+        modelo fusionado) y se resuelven los nopales solapados con personas.
+        
+        Returns:
+            Tuple: (nopales, IDs de nopales, personas, IDs de personas)
+        """
+        nopal_dets, nopal_ids = extract_detections(r_nopal)
+        person_dets, person_ids = extract_detections(r_person)
+        person_dets, person_ids = split_person_detections(person_dets, self.person_class_id, person_ids)
+        nopal_dets, person_dets, nopal_ids, person_ids = self.suppressor.apply(
+            nopal_dets, person_dets, nopal_ids, person_ids
+        )
+        return nopal_dets, nopal_ids, person_dets, person_ids
+    
+    def predict_images(self, test_img_dir: str, detection_log: Optional[DetectionLog] = None) -> str:
         """
         Realiza predicciones en imágenes de test
         
+        Los resultados se procesan en streaming: cada imagen se anota desde
+        ``orig_img`` (sin volver a decodificarla) y se descarta, por lo que la
+        memoria no crece con el tamaño del directorio. Las estadísticas se
+        acumulan en la misma pasada y quedan en ``self.last_stats``.
+        
         Args:
             test_img_dir: Directorio con imágenes de test
+            detection_log: Registro estructurado de detecciones (opcional)
             
         Returns:
             str: Directorio con las predicciones
@@ -115,37 +240,74 @@ class NopalPersonDetector:
         # Configuración de predicción
         conf_thresh = self.model_config['prediction']['confidence_threshold']
         
-        # Realizar predicciones
-        res_nopal = self.nopal_model(test_img_dir, save=False, conf=conf_thresh)
-        res_person = self.person_model(test_img_dir, save=False, conf=conf_thresh)
+        stats = {'total_images': 0, 'total_nopales': 0, 'total_persons': 0}
         
-        # Anotar imágenes
-        for idx, r_nopal in enumerate(res_nopal):
-            img_path = r_nopal.path
-            img = cv2.imread(img_path)
-            if img is None:
-                continue
-                
-            annotated_img = self._annotate_image(img, r_nopal, res_person[idx])
+        # Predicciones en streaming: un par de resultados vivo a la vez
+        for r_nopal, r_person in self._run_models(test_img_dir, conf_thresh, save=False, stream=True):
+            resolved = self._resolve_detections(r_nopal, r_person)
+            stats['total_images'] += 1
+            stats['total_nopales'] += len(resolved[0])
+            stats['total_persons'] += len(resolved[2])
+            
+            if detection_log is not None:
+                self._log_detections(detection_log, r_nopal.path, resolved)
+            annotated_img = self._draw_detections(r_nopal.orig_img.copy(), resolved)
             
             # Guardar imagen anotada
-            out_path = os.path.join(predictions_dir, os.path.basename(img_path))
+            out_path = os.path.join(predictions_dir, os.path.basename(r_nopal.path))
             cv2.imwrite(out_path, annotated_img)
-            
+        
+        self.last_stats = stats
         logger.info("✅ Guardado en: %s", predictions_dir)
         return predictions_dir
     
     @log_execution_time
-    def process_video(self, video_path: str, output_filename: str = "output_video.mp4") -> str:
+    def process_video(self, video_path: str, output_filename: str = "output_video.mp4",
+                      batch_size: Optional[int] = None,
+                      detection_log: Optional[DetectionLog] = None,
+                      sidecar_path: Optional[str] = None,
+                      frame_range: Optional[Tuple[int, Optional[int]]] = None,
+                      frame_stride: Optional[int] = None, target_fps: Optional[float] = None,
+                      stride_output: Optional[str] = None) -> str:
         """
         Procesa un video aplicando detecciones con manejo seguro de recursos.
         
+        Los frames se agrupan en lotes de ``batch_size`` y cada modelo recibe
+        una sola llamada por lote. Decodificación, inferencia, anotación y
+        codificación corren en hilos separados conectados por colas acotadas
+        (``video.queue_size``); los frames se escriben en el orden original.
+        Con ``motion.enabled`` los frames sin cambios reutilizan las últimas
+        detecciones en lugar de ejecutar los modelos. Con ``tracking.enabled``
+        los modelos solo corren en fotogramas clave y las cajas se propagan con
+        un tracker que asigna IDs estables (y cuenta nopales únicos).
+        
+        Con ``sidecar_path`` no se codifica ningún video: las detecciones de
+        cada frame se guardan en un sidecar binario (``utils.sidecar``) y se
+        anotan después, por tramos, con ``render_video``.
+        
+        Con ``frame_range`` solo se procesa el tramo [inicio, fin) del video
+        (``models.parallel_video`` reparte así un video entre procesos); los
+        índices de frame del registro de detecciones son los del video completo.
+        
+        Con ``frame_stride`` (o ``target_fps``) solo se infieren los frames
+        múltiplo del paso. En salida ``sampled`` los demás se saltan con
+        ``grab`` sin convertirlos y el video contiene solo los frames
+        muestreados (a ``fps / paso``); en salida ``carry`` se decodifican
+        todos y los saltados se dibujan con las últimas detecciones.
+        
         Args:
             video_path: Ruta del video de entrada
             output_filename: Nombre del archivo de salida
+            batch_size: Frames por lote de inferencia (default: config['video']['batch_size'])
+            detection_log: Registro estructurado de detecciones por frame (opcional)
+            sidecar_path: Guardar las detecciones en este sidecar en lugar de codificar el video
+            frame_range: Tramo (inicio, fin) en frames; fin None = hasta el final
+            frame_stride: Inferir uno de cada N frames (default: config['video']['frame_stride'])
+            target_fps: FPS a inferir, alternativa a ``frame_stride`` (default: config['video']['target_fps'])
+            stride_output: 'sampled' o 'carry' (default: config['video']['stride_output'])
             
         Returns:
-            str: Ruta del video procesado
+            str: Ruta del video procesado (o del sidecar)
             
         Raises:
             ValueError: Si los modelos no están cargados
@@ -157,6 +319,9 @@ class NopalPersonDetector:
             
         if not os.path.exists(video_path):
             raise FileNotFoundError(f"Video no encontrado: {video_path}")
+        
+        if sidecar_path and frame_range:
+            raise ValueError("El sidecar debe cubrir el video completo (sin frame_range)")
             
         logger.info("🎥 Procesando: %s", video_path)
         
@@ -166,52 +331,432 @@ class NopalPersonDetector:
         output_path = os.path.join(videos_dir, output_filename)
         
         conf_thresh = self.model_config['prediction']['confidence_threshold']
+        batch_size = self._resolve_batch_size(batch_size)
+        queue_size = self.config.get('video', {}).get('queue_size', 4)
         frame_count = 0
         
-        logger.info("🎬 Procesando frames...")
+        logger.info("🎬 Procesando frames (lotes de %d)...", batch_size)
         
-        # Usar context manager para garantizar liberación de recursos
-        with ResourceManager(video_path, mode='read') as cap:
+        # Usar context manager para garantizar liberación de recursos. Con el
+        # backend ffmpeg los frames leídos viven en un pool preasignado: cubre
+        # los lotes en las dos colas previas a la anotación más los que están
+        # en decodificación, inferencia y anotación
+        pool_size = batch_size * (2 * queue_size + 4)
+        with ResourceManager(video_path, mode='read', config=self.config, pool_size=pool_size) as cap:
             # Crear writer con propiedades del video original
-            rm = ResourceManager(video_path, mode='read')
             frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
             frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
             fps = int(cap.get(cv2.CAP_PROP_FPS))
             
-            # Configurar escritor de video
-            fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-            out = cv2.VideoWriter(output_path, fourcc, fps, (frame_width, frame_height))
+            stride, carry = self._resolve_frame_stride(cap.get(cv2.CAP_PROP_FPS), frame_stride,
+                                                       target_fps, stride_output)
+            if stride > 1 and not carry:
+                if sidecar_path:
+                    raise ValueError("El sidecar necesita todos los frames: usa stride_output='carry'")
+                fps = cap.get(cv2.CAP_PROP_FPS) / stride
+            
+            start_frame, max_frames = 0, None
+            if frame_range:
+                start_frame = self._seek(cap, frame_range[0])
+                if frame_range[1] is not None:
+                    max_frames = max(frame_range[1] - start_frame, 0)
+            
+            if sidecar_path:
+                # Solo detecciones: sin anotación ni codificación
+                output_path = sidecar_path
+                out = SidecarWriter(sidecar_path, cap.get(cv2.CAP_PROP_FPS), frame_width, frame_height,
+                                    metadata=self._sidecar_metadata(video_path)).open()
+            else:
+                # Configurar escritor de video (video.io_backend)
+                out = open_video_writer(output_path, fps, (frame_width, frame_height), self.config)
+                
+                if not out.isOpened():
+                    raise RuntimeError(f"No se pudo crear VideoWriter: {output_path}")
             
+            try:
+                pipeline = StagedPipeline(queue_size=queue_size)
+                pipeline.set_source("decode", self._read_batches(
+                    cap, batch_size, max_frames, stride=1 if carry else stride, first_frame=start_frame))
+                pipeline.add_stage("infer", lambda batch: (batch, self._predict_batch(batch, conf_thresh)))
+                if sidecar_path:
+                    pipeline.set_sink("record", lambda item: self._record_batch(out, item))
+                else:
+                    pipeline.add_stage("annotate", self._annotate_batch)
+                    pipeline.set_sink("encode", lambda frames: self._write_frames(out, frames))
+                
+                self._frames_written = 0
+                self._frames_read = 0
+                # Índice (en el video completo) del primer frame muestreado y paso entre frames
+                self._frame_step = 1 if carry else stride
+                self._frames_annotated = start_frame + (-start_frame % self._frame_step)
+                self._carry_stride = stride if carry else 1
+                self._stride_position = start_frame
+                self._detection_log = detection_log
+                self._log_source = video_path
+                self._log_fps = float(cap.get(cv2.CAP_PROP_FPS)) or 0.0
+                self._last_results = None
+                self.motion_gate.reset()
+                self.tracker = KeyframeTracker.from_config(self.config, self.person_class_id)
+                if self.tracker and self.motion_gate.enabled:
+                    logger.info("💡 tracking.enabled activo: se ignora la compuerta de movimiento")
+                if self.tracker and carry and stride > 1:
+                    logger.info("💡 tracking.enabled activo: el tracker decide los fotogramas clave (se ignora el paso)")
+                if stride > 1:
+                    logger.info("⏩ Inferencia en 1 de cada %d frames (salida: %s)", stride,
+                                'carry' if carry else 'sampled')
+                pipeline.run()
+                frame_count = self._frames_written
+                self.last_frame_range = (start_frame, start_frame + self._frames_read)
+                self.last_pipeline_stats = pipeline.stats
+                pipeline.log_stats()
+                if self.tracker:
+                    self.last_track_stats = self.tracker.stats
+                    logger.info("🔢 Nopales únicos: %d | Personas únicas: %d | Fotogramas clave: %d/%d",
+                                self.last_track_stats['unique_nopales'],
+                                self.last_track_stats['unique_personas'],
+                                self.last_track_stats['keyframes'], self.last_track_stats['frames'])
+                elif self.motion_gate.enabled:
+                    gate = self.motion_gate.stats
+                    logger.info("🏃 Compuerta de movimiento: %d/%d frames reutilizados (%.0f%%)",
+                                gate['skipped'], gate['frames'], gate['skip_ratio'] * 100)
+            finally:
+                self._detection_log = None
+                if sidecar_path:
+                    out.close()
+                else:
+                    out.release()
+                    logger.debug("✅ VideoWriter liberado")
+        
+        logger.info("🎞️ Frames totales: %d", frame_count)
+        if sidecar_path:
+            logger.info("✅ Sidecar guardado: %s (%d detecciones)", output_path, out.records)
+        else:
+            logger.info("✅ Video guardado: %s", output_path)
+        return output_path
+    
+    def render_video(self, video_path: str, sidecar_path: Optional[str] = None,
+                     output_filename: str = "rendered_video.mp4", start: Optional[float] = None,
+                     end: Optional[float] = None, min_confidence: float = 0.0) -> str:
+        """
+        Anota un tramo del video con las detecciones de un sidecar (sin modelos)
+        
+        El video se posiciona en el primer frame del tramo y solo se
+        decodifican y codifican los frames pedidos; las detecciones de cada
+        frame se leen del sidecar por índice.
+        
+        Args:
+            video_path: Video original
+            sidecar_path: Sidecar de ``process_video`` (default: mismo nombre con .dets)
+            output_filename: Nombre del video anotado
+            start: Segundo inicial (default: inicio del video)
+            end: Segundo final, exclusivo (default: final del video)
+            min_confidence: Umbral de confianza para dibujar
+            
+        Returns:
+            str: Ruta del video anotado
+            
+        Raises:
+            FileNotFoundError: Si el video o el sidecar no existen
+            ValueError: Si el tramo está vacío
+        """
+        sidecar_path = sidecar_path or sidecar_path_for(video_path)
+        for path in (video_path, sidecar_path):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"No encontrado: {path}")
+        
+        reader = SidecarReader(sidecar_path)
+        start_frame = reader.frame_at(start) if start is not None else 0
+        end_frame = reader.frame_at(end) if end is not None else len(reader)
+        if start_frame >= end_frame:
+            raise ValueError(f"Tramo vacío: frames {start_frame}-{end_frame} de {len(reader)}")
+        
+        videos_dir = self.output_config['videos_dir']
+        os.makedirs(videos_dir, exist_ok=True)
+        output_path = os.path.join(videos_dir, output_filename)
+        logger.info("🎨 Renderizando frames %d-%d de %s", start_frame, end_frame, video_path)
+        
+        frame_count = 0
+        with ResourceManager(video_path, mode='read', config=self.config) as cap:
+            frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            if (frame_width, frame_height) != (reader.width, reader.height):
+                logger.warning("⚠️ El sidecar es de un video de %dx%d; este es de %dx%d",
+                               reader.width, reader.height, frame_width, frame_height)
+            
+            frame_idx = self._seek(cap, start_frame)
+            
+            out = open_video_writer(output_path, reader.fps, (frame_width, frame_height), self.config)
             if not out.isOpened():
                 raise RuntimeError(f"No se pudo crear VideoWriter: {output_path}")
             
             try:
-                while cap.isOpened():
+                while frame_idx < end_frame:
                     ret, frame = cap.read()
                     if not ret:
                         break
-                        
-                    # Realizar predicciones
-                    res_nopal = self.nopal_model(frame, conf=conf_thresh, verbose=False)
-                    res_person = self.person_model(frame, conf=conf_thresh, verbose=False)
-                    
-                    # Anotar frame
-                    annotated_frame = self._annotate_image(frame, res_nopal[0], res_person[0])
-                    
-                    # Escribir frame
-                    out.write(annotated_frame)
+                    out.write(self._draw_detections(frame, reader.detections(frame_idx, min_confidence)))
+                    frame_idx += 1
                     frame_count += 1
-                    
-                    # Progreso cada 100 frames
-                    if frame_count % 100 == 0:
-                        logger.info("📹 Frames procesados: %d", frame_count)
             finally:
                 out.release()
-                logger.debug("✅ VideoWriter liberado")
         
+        logger.info("🎞️ Frames renderizados: %d", frame_count)
         logger.info("✅ Video guardado: %s", output_path)
         return output_path
     
+    @staticmethod
+    def _seek(cap, frame: int) -> int:
+        """
+        Posiciona el video en ``frame`` con CAP_PROP_POS_FRAMES
+        
+        Si el códec se queda antes (solo salta a fotogramas clave), avanza
+        con ``grab`` sin decodificar.
+        
+        Returns:
+            int: Frame en el que quedó el video
+        """
+        if frame <= 0:
+            return 0
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame)
+        position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+        while position < frame and cap.grab():
+            position += 1
+        return position
+    
+    def _sidecar_metadata(self, video_path: str) -> Dict[str, Any]:
+        """Metadatos del sidecar: video de origen y nombres de clase de cada modelo"""
+        nopal_names = getattr(self.nopal_model, 'names', None) or ['nopal']
+        if not isinstance(nopal_names, dict):
+            nopal_names = dict(enumerate(nopal_names))
+        return {
+            'source': os.path.abspath(video_path),
+            'names': {'nopal': {str(k): v for k, v in nopal_names.items()},
+                      'person': {str(self.person_class_id): 'person'}},
+            'confidence_threshold': self.model_config['prediction']['confidence_threshold'],
+        }
+    
+    def _read_batches(self, cap, batch_size: int, max_frames: Optional[int] = None,
+                      stride: int = 1, first_frame: int = 0) -> Iterator[List[np.ndarray]]:
+        """
+        Etapa de decodificación: agrupa los frames del video en lotes
+        
+        Con ``stride`` > 1 solo se decodifican los frames cuyo índice es
+        múltiplo del paso; los demás se avanzan con ``grab``.
+        
+        Args:
+            cap: VideoCapture abierto
+            batch_size: Frames por lote
+            max_frames: Frames a leer como máximo (None = hasta el final)
+            stride: Decodificar uno de cada N frames
+            first_frame: Índice del frame actual del video (para alinear el paso)
+            
+        Yields:
+            List: Lote de frames BGR en orden
+        """
+        batch = []
+        remaining = max_frames
+        position = first_frame
+        while cap.isOpened() and remaining != 0:
+            to_skip = -position % stride
+            if to_skip:
+                if remaining is not None:
+                    to_skip = min(to_skip, remaining)
+                skipped = skip_frames(cap, to_skip)
+                self._frames_read += skipped
+                position += skipped
+                if remaining is not None:
+                    remaining -= skipped
+                if skipped < to_skip or remaining == 0:
+                    break
+            if remaining is not None:
+                remaining -= 1
+            ret, frame = cap.read()
+            if not ret:
+                break
+            self._frames_read += 1
+            position += 1
+            batch.append(frame)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    
+    def _annotate_batch(self, item: Tuple[List[np.ndarray], List[Tuple[Any, Any]]]) -> List[np.ndarray]:
+        """
+        Etapa de anotación: dibuja las detecciones de un lote
+        
+        Args:
+            item: Tupla (frames, resultados) producida por la etapa de inferencia
+            
+        Returns:
+            List: Frames anotados en el mismo orden
+        """
+        frames, results = item
+        return [
+            self._draw_detections(frame.copy(), self._resolve_frame(r_nopal, r_person))
+            for frame, (r_nopal, r_person) in zip(frames, results)
+        ]
+    
+    def _record_batch(self, sidecar: SidecarWriter, item: Tuple[List[np.ndarray], List[Tuple[Any, Any]]]) -> None:
+        """
+        Etapa final en modo sidecar: guarda las detecciones de un lote
+        
+        Args:
+            sidecar: Sidecar abierto
+            item: Tupla (frames, resultados) producida por la etapa de inferencia
+        """
+        _, results = item
+        for r_nopal, r_person in results:
+            nopal_dets, nopal_ids, person_dets, person_ids = self._resolve_frame(r_nopal, r_person)
+            sidecar.write_frame(nopal_dets, person_dets, nopal_ids, person_ids)
+            self._frames_written += 1
+            if self._frames_written % 100 == 0:
+                logger.info("📹 Frames procesados: %d", self._frames_written)
+    
+    def _resolve_frame(self, r_nopal, r_person) -> Tuple[np.ndarray, Optional[np.ndarray],
+                                                         np.ndarray, Optional[np.ndarray]]:
+        """Resuelve las detecciones del siguiente frame del video y las registra si hay log"""
+        resolved = self._resolve_detections(r_nopal, r_person)
+        if self._detection_log is not None:
+            frame_idx = self._frames_annotated
+            timestamp = frame_idx / self._log_fps if self._log_fps else None
+            self._log_detections(self._detection_log, self._log_source, resolved,
+                                 frame=frame_idx, timestamp=timestamp)
+        self._frames_annotated += self._frame_step
+        return resolved
+    
+    def _write_frames(self, out, frames: List[np.ndarray]) -> None:
+        """
+        Etapa de codificación: escribe los frames anotados
+        
+        Args:
+            out: VideoWriter abierto
+            frames: Frames anotados en orden
+        """
+        for frame in frames:
+            out.write(frame)
+            self._frames_written += 1
+            
+            # Progreso cada 100 frames
+            if self._frames_written % 100 == 0:
+                logger.info("📹 Frames procesados: %d", self._frames_written)
+    
+    def _resolve_frame_stride(self, fps: float, frame_stride: Optional[int] = None,
+                              target_fps: Optional[float] = None,
+                              stride_output: Optional[str] = None) -> Tuple[int, bool]:
+        """
+        Determina el submuestreo temporal para modo video
+        
+        Args:
+            fps: FPS del video de origen
+            frame_stride: Paso explícito (tiene prioridad sobre la configuración)
+            target_fps: FPS a inferir (si no hay paso)
+            stride_output: 'sampled' o 'carry'
+            
+        Returns:
+            Tuple: (paso, True si los frames saltados arrastran las últimas detecciones)
+            
+        Raises:
+            ValueError: Si el modo de salida no es válido
+        """
+        video_config = self.config.get('video', {})
+        if frame_stride is None and target_fps is None:
+            frame_stride = video_config.get('frame_stride')
+            target_fps = video_config.get('target_fps')
+        stride_output = stride_output or video_config.get('stride_output') or 'sampled'
+        if stride_output not in STRIDE_OUTPUTS:
+            raise ValueError(f"stride_output no válido: {stride_output}. Opciones: {STRIDE_OUTPUTS}")
+        return resolve_frame_stride(fps, frame_stride, target_fps), stride_output == 'carry'
+    
+    def _resolve_batch_size(self, batch_size: Optional[int] = None) -> int:
+        """
+        Determina el tamaño de lote para modo video
+        
+        Args:
+            batch_size: Valor explícito (tiene prioridad sobre la configuración)
+            
+        Returns:
+            int: Tamaño de lote (mínimo 1)
+        """
+        if batch_size is None:
+            batch_size = self.config.get('video', {}).get('batch_size', 1)
+        return max(1, int(batch_size))
+    
+    def _predict_batch(self, frames: List[np.ndarray], conf_thresh: float) -> List[Tuple[Any, Any]]:
+        """
+        Ejecuta ambos modelos sobre un lote de frames con una llamada por modelo
+        
+        Solo se infieren los frames que la compuerta de movimiento deja pasar
+        (y, en salida ``carry``, los múltiplos del paso); el resto reutiliza
+        el resultado del último frame inferido.
+        
+        Args:
+            frames: Lista de frames BGR
+            conf_thresh: Umbral de confianza
+            
+        Returns:
+            List: Pares (resultado_nopal, resultado_persona) en el orden de entrada
+        """
+        if self.tracker:
+            return self._track_batch(frames, conf_thresh)
+        stride, position = self._carry_stride, self._stride_position
+        self._stride_position += len(frames)
+        if not self.motion_gate.enabled and stride == 1:
+            return self._run_models(frames, conf_thresh, verbose=False)
+        
+        to_infer = [
+            i for i, frame in enumerate(frames)
+            if ((position + i) % stride == 0
+                and (not self.motion_gate.enabled or self.motion_gate.should_infer(frame)))
+            or (i == 0 and self._last_results is None)
+        ]
+        fresh = {}
+        if to_infer:
+            inferred = self._run_models([frames[i] for i in to_infer], conf_thresh, verbose=False)
+            fresh = dict(zip(to_infer, inferred))
+        
+        results = []
+        for i in range(len(frames)):
+            if i in fresh:
+                self._last_results = fresh[i]
+            results.append(self._last_results)
+        return results
+    
+    def _track_batch(self, frames: List[np.ndarray], conf_thresh: float) -> List[Tuple[Any, Any]]:
+        """
+        Inferencia con seguimiento: modelos en fotogramas clave, tracker en el resto
+        
+        Los fotogramas clave previstos por intervalo se infieren en una sola
+        llamada; si la confianza de un track cae se infiere además ese frame.
+        
+        Args:
+            frames: Lista de frames BGR
+            conf_thresh: Umbral de confianza para crear tracks
+            
+        Returns:
+            List: Pares (resultado_nopal, resultado_persona) con IDs de track
+        """
+        tracker = self.tracker
+        tracker.set_high_threshold(conf_thresh)
+        # Umbral bajo para que el tracker reciba también las detecciones débiles
+        detect_conf = min(conf_thresh, tracker.detection_conf)
+        
+        planned = tracker.plan_keyframes(len(frames))
+        detections = {}
+        if planned:
+            inferred = self._run_models([frames[i] for i in planned], detect_conf, verbose=False)
+            detections = dict(zip(planned, inferred))
+        
+        results = []
+        for i, frame in enumerate(frames):
+            if i in detections or tracker.needs_detection():
+                pair = detections.get(i) or self._run_models(frame, detect_conf, verbose=False)[0]
+                results.append(tracker.update(frame, *pair))
+            else:
+                results.append(tracker.predict(frame))
+        return results
+    
     def _annotate_image(self, img: np.ndarray, nopal_results, person_results) -> np.ndarray:
         """
         Anota una imagen con las detecciones de nopales y personas
@@ -224,72 +769,54 @@ class NopalPersonDetector:
         Returns:
             np.ndarray: Imagen anotada
         """
-        annotated_img = img.copy()
-        
-        # Anotar detecciones de nopales (verde)
-        if nopal_results.boxes is not None:
-            for box in nopal_results.boxes:
-                x1, y1, x2, y2 = [int(coord) for coord in box.xyxy[0]]
-                cv2.rectangle(annotated_img, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                
-                if box.conf is not None:
-                    confidence = box.conf.item()
-                    label = f"nopal: {confidence:.2f}"
-                    cv2.putText(
-                        annotated_img, label, (x1, y1 - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2
-                    )
-        
-        # Anotar detecciones de personas (azul)
-        if person_results.boxes is not None:
-            for box in person_results.boxes:
-                # Solo personas (clase 0 en COCO)
-                if int(box.cls) == 0:
-                    x1, y1, x2, y2 = [int(coord) for coord in box.xyxy[0]]
-                    cv2.rectangle(annotated_img, (x1, y1), (x2, y2), (255, 0, 0), 2)
-                    
-                    if box.conf is not None:
-                        confidence = box.conf.item()
-                        label = f"person: {confidence:.2f}"
-                        cv2.putText(
-                            annotated_img, label, (x1, y1 - 10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2
-                        )
-        
-        return annotated_img
+        resolved = self._resolve_detections(nopal_results, person_results)
+        return self._draw_detections(img.copy(), resolved)
     
-    def get_detection_stats(self, test_img_dir: str) -> Dict[str, int]:
+    def _draw_detections(self, canvas: np.ndarray, resolved: Tuple[np.ndarray, Optional[np.ndarray],
+                                                                  np.ndarray, Optional[np.ndarray]]) -> np.ndarray:
         """
-        Obtiene estadísticas de detección
+        Dibuja sobre ``canvas`` (en sitio) las detecciones de ``_resolve_detections``
         
-        Args:
-            test_img_dir: Directorio con imágenes de test
-            
         Returns:
-            Dict: Estadísticas de detección
+            np.ndarray: El mismo canvas anotado
         """
-        if not self.nopal_model or not self.person_model:
-            raise ValueError("Primero debe cargar los modelos")
-        
-        conf_thresh = self.model_config['prediction']['confidence_threshold']
+        nopal_dets, nopal_ids, person_dets, person_ids = resolved
         
-        res_nopal = self.nopal_model(test_img_dir, save=False, conf=conf_thresh)
-        res_person = self.person_model(test_img_dir, save=False, conf=conf_thresh)
+        # Nopales en verde (cualquier clase del modelo se etiqueta como 'nopal')
+        nopal_dets = nopal_dets.copy()
+        nopal_dets[:, 5] = 0
+        self.nopal_annotator.draw(canvas, nopal_dets, ids=nopal_ids, inplace=True)
         
-        total_nopales = 0
-        total_persons = 0
+        # Personas en azul
+        person_dets = person_dets.copy()
+        person_dets[:, 5] = 0
+        self.person_annotator.draw(canvas, person_dets, ids=person_ids, inplace=True)
         
-        for r_nopal in res_nopal:
-            if r_nopal.boxes is not None:
-                total_nopales += len(r_nopal.boxes)
+        return canvas
+    
+    def _log_detections(self, detection_log: DetectionLog, source: str,
+                        resolved: Tuple[np.ndarray, Optional[np.ndarray], np.ndarray, Optional[np.ndarray]],
+                        frame: Optional[int] = None, timestamp: Optional[float] = None) -> None:
+        """Registra nopales y personas con las clases originales de cada modelo"""
+        nopal_dets, nopal_ids, person_dets, person_ids = resolved
+        detection_log.write(source, nopal_dets, getattr(self.nopal_model, 'names', None) or ['nopal'],
+                            frame=frame, timestamp=timestamp, ids=nopal_ids)
+        detection_log.write(source, person_dets, {self.person_class_id: 'person'},
+                            frame=frame, timestamp=timestamp, ids=person_ids)
+    
+    def get_detection_stats(self) -> Dict[str, int]:
+        """
+        Obtiene estadísticas de la última ejecución de ``predict_images``
         
-        for r_person in res_person:
-            if r_person.boxes is not None:
-                # Solo contar personas (clase 0)
-                total_persons += sum(1 for box in r_person.boxes if int(box.cls) == 0)
+        Los conteos se acumulan durante la misma pasada de inferencia, así que
+        no se vuelve a procesar el directorio.
         
-        return {
-            'total_images': len(res_nopal),
-            'total_nopales': total_nopales,
-            'total_persons': total_persons
-        }
\ No newline at end of file
+        Returns:
+            Dict: Estadísticas de detección
+            
+        Raises:
+            ValueError: Si todavía no se ha ejecutado ``predict_images``
+        """
+        if not self.last_stats:
+            raise ValueError("Primero debe ejecutar predict_images")
+        return dict(self.last_stats)
\ No newline at end of file
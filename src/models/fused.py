@@ -0,0 +1,61 @@
+"""
+Utilidades para el modelo fusionado nopal + persona
+Un único modelo entrenado con las clases de Roboflow más 'person' permite
+una sola pasada por frame en lugar de dos modelos YOLO
+"""
+
+from typing import Any, Dict, Optional, Tuple, Union
+
+PERSON_CLASS_NAME = 'person'
+
+# Clase 'person' en el modelo COCO usado como modelo de personas separado
+COCO_PERSON_CLASS_ID = 0
+
+
+def is_fused_enabled(config: Dict[str, Any]) -> bool:
+    """
+    Indica si la configuración pide servir el modelo fusionado
+
+    Args:
+        config: Configuración del proyecto
+
+    Returns:
+        bool: True si fused.enabled está activo
+    """
+    return bool(config.get('fused', {}).get('enabled', False))
+
+
+def person_class_id(names: Union[Dict[int, str], list, None]) -> Optional[int]:
+    """
+    Busca el índice de la clase 'person' en los nombres de un modelo
+
+    Args:
+        names: Nombres de clases (dict id → nombre o lista)
+
+    Returns:
+        int: Índice de 'person' o None si el modelo no la incluye
+    """
+    if not names:
+        return None
+    items = names.items() if isinstance(names, dict) else enumerate(names)
+    for class_id, name in items:
+        if name == PERSON_CLASS_NAME:
+            return int(class_id)
+    return None
+
+
+def split_fused_result(result: Any, person_id: int) -> Tuple[Any, Any]:
+    """
+    Separa un resultado del modelo fusionado en (nopales, personas)
+
+    Args:
+        result: Resultado de YOLO del modelo fusionado
+        person_id: Índice de la clase 'person'
+
+    Returns:
+        Tuple: (resultado_nopales, resultado_personas)
+    """
+    if result.boxes is None:
+        return result, result
+    is_person = result.boxes.cls == person_id
+    return result[~is_person], result[is_person]
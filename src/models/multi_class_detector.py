@@ -7,9 +7,16 @@ import os
 import yaml
 import cv2
 import numpy as np
-from typing import Dict, Any, List, Tuple, Optional
+from typing import Callable, Dict, Any, List, Tuple, Optional
 from ultralytics import YOLO
 from pathlib import Path
+from models.registry import get_registry, load_model_from_config
+from models.fused import is_fused_enabled, person_class_id
+from utils.slicing import SlicedPredictor
+from utils.batch_engine import BatchEngine
+from utils.detections import Detections
+from utils.annotator import Annotator
+from utils.filters import SizeFilter
 
 class MultiClassDetector:
     """Detector que maneja múltiples clases dinámicamente"""
@@ -30,6 +37,12 @@ class MultiClassDetector:
         self.class_names = []
         self.class_colors = {}
         self.best_model_path = None
+        self.slicer = None
+        self.last_batch_stats = {}
+        self.weights_path = None
+        self._annotator = None
+        self._annotator_key = None
+        self.size_filter = SizeFilter.from_config(config, 'multi_class')
         
         # Cargar información de clases desde dataset
         self.load_class_info()
@@ -44,9 +57,10 @@ class MultiClassDetector:
             trained_model_path = self.model_config.get('nopal_model_path')
             if trained_model_path and os.path.exists(trained_model_path):
                 try:
-                    temp_model = YOLO(trained_model_path)
-                    if hasattr(temp_model, 'names') and temp_model.names:
-                        self.class_names = list(temp_model.names.values())
+                    # Leer los nombres de los metadatos sin construir el modelo
+                    names = get_registry(self.model_config).class_names(trained_model_path)
+                    if names:
+                        self.class_names = list(names.values())
                         print(f"✅ Clases cargadas desde modelo entrenado: {self.class_names}")
                         classes_loaded = True
                 except Exception as e:
@@ -154,10 +168,13 @@ class MultiClassDetector:
         Args:
             custom_weights_path: Ruta a pesos del modelo personalizado
         """
+        if not custom_weights_path and is_fused_enabled(self.config):
+            custom_weights_path = self.config['fused'].get('model_path')
+        
         try:
             # Cargar modelo personalizado
             if custom_weights_path and os.path.exists(custom_weights_path):
-                self.custom_model = YOLO(custom_weights_path)
+                self._load_custom_model(custom_weights_path)
                 print(f"✅ Modelo personalizado cargado: {custom_weights_path}")
             else:
                 # Buscar último modelo entrenado
@@ -168,30 +185,73 @@ class MultiClassDetector:
                         latest_train = max(train_dirs, key=lambda x: x.stat().st_mtime)
                         best_path = latest_train / 'weights' / 'best.pt'
                         if best_path.exists():
-                            self.custom_model = YOLO(str(best_path))
+                            self._load_custom_model(str(best_path))
                             print(f"✅ Último modelo entrenado cargado: {best_path}")
                         else:
                             print("⚠️ No se encontró modelo entrenado, usando modelo base")
-                            self.custom_model = YOLO(self.model_config['base_model'])
+                            self._load_custom_model(self.model_config['base_model'])
                     else:
                         print("⚠️ No se encontraron entrenamientos previos")
-                        self.custom_model = YOLO(self.model_config['base_model'])
+                        self._load_custom_model(self.model_config['base_model'])
                 else:
                     print("⚠️ Directorio de entrenamientos no existe")
-                    self.custom_model = YOLO(self.model_config['base_model'])
+                    self._load_custom_model(self.model_config['base_model'])
+            
+            # Modelo fusionado: 'person' ya es una clase del modelo personalizado
+            names = getattr(self.custom_model, 'names', None)
+            if person_class_id(names) is not None:
+                self.person_model = None
+                # Las clases salen del propio modelo, no de data.yaml
+                self.class_names = list(names.values()) if isinstance(names, dict) else list(names)
+                self.generate_class_colors()
+                self._annotator = None
+                print("✅ Modelo fusionado: personas detectadas en la misma pasada")
+                return
+            
+            if is_fused_enabled(self.config):
+                print("⚠️ fused.enabled activo pero el modelo no tiene clase 'person'")
             
             # Cargar modelo de personas
-            self.person_model = YOLO(self.model_config['person_model'])
+            self.person_model = load_model_from_config(self.model_config['person_model'], self.model_config)
             print(f"✅ Modelo de personas cargado")
             
         except Exception as e:
             print(f"❌ Error cargando modelos: {e}")
             
+    def _load_custom_model(self, weights_path: str):
+        """Carga el modelo personalizado y recuerda la ruta de sus pesos"""
+        self.custom_model = load_model_from_config(weights_path, self.model_config)
+        self.weights_path = weights_path
+    
+    def configure_slicing(self, tile_size: int = None, overlap: float = None,
+                          workers: int = None) -> SlicedPredictor:
+        """
+        Activa la inferencia por tiles (sección 'slicing' de la configuración)
+        
+        Args:
+            tile_size: Lado del tile en píxeles (default: config)
+            overlap: Fracción de solape entre tiles (default: config)
+            workers: Hilos de decodificación de imágenes (default: config)
+            
+        Returns:
+            SlicedPredictor: Predictor configurado
+        """
+        if not self.custom_model:
+            raise ValueError("Primero debe cargar los modelos")
+        self.slicer = SlicedPredictor.from_config(
+            self.custom_model, self.config, tile_size=tile_size, overlap=overlap, workers=workers
+        )
+        print(f"🧩 Inferencia por tiles: {self.slicer.tile_size}px, solape {self.slicer.overlap:.0%}, "
+              f"fusión {self.slicer.merge}")
+        return self.slicer
+    
     def predict_image(self, image_path: str, conf_threshold: float = None, 
                      save_result: bool = True) -> Dict[str, Any]:
         """
         Realizar predicción en una imagen
         
+        Si se llamó a ``configure_slicing`` la imagen se procesa por tiles.
+        
         Args:
             image_path: Ruta de la imagen
             conf_threshold: Umbral de confianza
@@ -207,6 +267,9 @@ class MultiClassDetector:
         conf = conf_threshold or self.model_config['prediction']['confidence_threshold']
         
         try:
+            if self.slicer:
+                return self._sliced_result(self.slicer(image_path, conf=conf), conf, save_result)
+            
             # Realizar predicción con modelo personalizado
             results = self.custom_model(image_path, conf=conf, save=save_result)
             
@@ -217,50 +280,135 @@ class MultiClassDetector:
                 'image_path': image_path,
                 'detections': processed_results,
                 'confidence_threshold': conf,
-                'classes_detected': list(set([det['class'] for det in processed_results]))
+                'classes_detected': processed_results.classes_detected()
             }
             
         except Exception as e:
             print(f"❌ Error en predicción: {e}")
             return {}
     
-    def process_results(self, result):
+    def predict_images_sliced(self, image_paths: List[str], conf_threshold: float = None,
+                              save_result: bool = True, on_complete: Callable = None):
         """
-        Procesar resultados de YOLO para múltiples clases
+        Predicción por tiles de varias imágenes, decodificando las siguientes en paralelo
         
         Args:
-            result: Resultado de YOLO
+            image_paths: Rutas de las imágenes
+            conf_threshold: Umbral de confianza
+            save_result: Si guardar las imágenes anotadas
+            on_complete: Llamada (ruta, resultado) tras guardar cada imagen
             
-        Returns:
-            List: Lista de detecciones procesadas
+        Yields:
+            Dict: Resultados de cada imagen, en orden ({} si hubo error)
+        """
+        slicer = self.slicer or self.configure_slicing()
+        conf = conf_threshold or self.model_config['prediction']['confidence_threshold']
+        
+        for image_path, result in zip(image_paths, slicer.predict_many(image_paths, conf=conf)):
+            if result is None:
+                print(f"❌ No se pudo leer la imagen: {image_path}")
+                if on_complete:
+                    on_complete(image_path, {})
+                yield {}
+                continue
+            output = self._sliced_result(result, conf, save_result)
+            if on_complete:
+                on_complete(image_path, output)
+            yield output
+    
+    def predict_batch(self, image_paths: List[str], conf_threshold: float = None,
+                      save_result: bool = True, batch_size: int = 16, workers: int = 4,
+                      on_complete: Callable = None):
         """
-        detections = []
+        Predicción de muchas imágenes con decodificación anticipada, inferencia
+        por lotes y escritura asíncrona de las imágenes anotadas
         
-        if result.boxes is not None:
-            boxes = result.boxes.cpu().numpy()
+        Args:
+            image_paths: Rutas de las imágenes
+            conf_threshold: Umbral de confianza
+            save_result: Si guardar las imágenes anotadas
+            batch_size: Imágenes por llamada al modelo
+            workers: Hilos de decodificación (y de escritura)
+            on_complete: Llamada (ruta, resultado) cuando la salida de una imagen
+                ya está escrita (desde un hilo de escritura)
             
-            for box in boxes:
-                # Obtener información de la detección
-                x1, y1, x2, y2 = box.xyxy[0]
-                confidence = box.conf[0]
-                class_id = int(box.cls[0])
-                
-                # Obtener nombre de la clase
-                if class_id < len(self.class_names):
-                    class_name = self.class_names[class_id]
-                else:
-                    class_name = f"clase_{class_id}"
+        Yields:
+            Dict: Resultados de cada imagen, en orden ({} si hubo error)
+        """
+        if not self.custom_model:
+            print("❌ Modelo no cargado")
+            return
+        
+        conf = conf_threshold or self.model_config['prediction']['confidence_threshold']
+        output_dir = os.path.join(self.output_config['predictions_dir'], 'batch')
+        imgsz = self.model_config.get('onnx_imgsz') or self.model_config['training']['image_size']
+        
+        engine = BatchEngine(self.custom_model, batch_size=batch_size, workers=workers, imgsz=imgsz)
+        with engine:
+            for image_path, result in engine.predict(image_paths, conf=conf):
+                if result is None:
+                    print(f"❌ No se pudo leer la imagen: {image_path}")
+                    if on_complete:
+                        on_complete(image_path, {})
+                    yield {}
+                    continue
                 
-                detection = {
-                    'bbox': [int(x1), int(y1), int(x2), int(y2)],
-                    'confidence': float(confidence),
-                    'class': class_name,
-                    'class_id': class_id,
-                    'color': self.class_colors.get(class_name, (0, 255, 0))
+                processed_results = self.process_results(result)
+                output = {
+                    'image_path': image_path,
+                    'detections': processed_results,
+                    'confidence_threshold': conf,
+                    'classes_detected': processed_results.classes_detected()
                 }
+                if save_result:
+                    output_path = os.path.join(output_dir, os.path.basename(image_path))
+                    engine.submit(self._save_annotated, result.orig_img, processed_results,
+                                  output_path, on_complete, output)
+                elif on_complete:
+                    on_complete(image_path, output)
                 
-                detections.append(detection)
+                yield output
+        self.last_batch_stats = dict(engine.stats)
+    
+    def _save_annotated(self, image: np.ndarray, detections: List[Dict], output_path: str,
+                        on_complete: Callable = None, output: Dict[str, Any] = None):
+        """Anota y guarda una imagen (se ejecuta en el pool de escritura)"""
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        cv2.imwrite(output_path, self.annotate_image(image, detections))
+        if on_complete:
+            on_complete(output['image_path'], output)
+    
+    def _sliced_result(self, result, conf: float, save_result: bool) -> Dict[str, Any]:
+        """Convierte un resultado por tiles al formato de ``predict_image``"""
+        processed_results = self.process_results(result)
         
+        if save_result:
+            output_dir = os.path.join(self.output_config['predictions_dir'], 'sliced')
+            self._save_annotated(result.orig_img, processed_results,
+                                 os.path.join(output_dir, os.path.basename(result.path)))
+        
+        return {
+            'image_path': result.path,
+            'detections': processed_results,
+            'confidence_threshold': conf,
+            'classes_detected': processed_results.classes_detected()
+        }
+    
+    def process_results(self, result) -> Detections:
+        """
+        Procesar resultados de YOLO para múltiples clases
+        
+        Args:
+            result: Resultado de YOLO
+            
+        Returns:
+            Detections: Detecciones en formato columnar (iterable como lista de dicts)
+        """
+        colors = [self.class_colors.get(name, (0, 255, 0)) for name in self.class_names]
+        detections = Detections.from_result(result, self.class_names, colors)
+        if self.size_filter.enabled and len(detections):
+            frame_shape = getattr(result, 'orig_shape', None) or result.orig_img.shape[:2]
+            detections = detections.filter(self.size_filter.mask(detections.xyxy, frame_shape, detections.cls))
         return detections
     
     def annotate_image(self, image: np.ndarray, detections: List[Dict]) -> np.ndarray:
@@ -269,51 +417,25 @@ class MultiClassDetector:
         
         Args:
             image: Imagen original
-            detections: Lista de detecciones
+            detections: Detecciones (``Detections`` o lista de dicts)
             
         Returns:
             np.ndarray: Imagen anotada
         """
-        annotated_image = image.copy()
-        
-        for detection in detections:
-            bbox = detection['bbox']
-            confidence = detection['confidence']
-            class_name = detection['class']
-            color = detection['color']
-            
-            # Dibujar bounding box
-            cv2.rectangle(annotated_image, (bbox[0], bbox[1]), (bbox[2], bbox[3]), color, 2)
-            
-            # Preparar texto
-            label = f"{class_name}: {confidence:.2f}"
-            
-            # Calcular tamaño del texto
-            (text_width, text_height), baseline = cv2.getTextSize(
-                label, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2
-            )
-            
-            # Dibujar fondo del texto
-            cv2.rectangle(
-                annotated_image,
-                (bbox[0], bbox[1] - text_height - baseline - 5),
-                (bbox[0] + text_width, bbox[1]),
-                color,
-                -1
-            )
-            
-            # Dibujar texto
-            cv2.putText(
-                annotated_image,
-                label,
-                (bbox[0], bbox[1] - baseline - 2),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.7,
-                (255, 255, 255),
-                2
-            )
-        
-        return annotated_image
+        if not isinstance(detections, Detections):
+            detections = np.array([[*d['bbox'], d['confidence'], d['class_id']] for d in detections],
+                                  dtype=np.float32).reshape(-1, 6)
+        return self._get_annotator().draw(image, detections)
+    
+    def _get_annotator(self) -> Annotator:
+        """Renderizador con la paleta actual (se recrea si cambian las clases)"""
+        key = (tuple(self.class_names), tuple(self.class_colors.get(n) for n in self.class_names))
+        if self._annotator is None or self._annotator_key != key:
+            colors = [self.class_colors.get(name, (0, 255, 0)) for name in self.class_names]
+            self._annotator = Annotator.from_config(self.config, self.class_names, colors,
+                                                    font_scale=0.7, text_thickness=2)
+            self._annotator_key = key
+        return self._annotator
     
     def get_class_statistics(self, detections: List[Dict]) -> Dict[str, int]:
         """
@@ -325,6 +447,9 @@ class MultiClassDetector:
         Returns:
             Dict: Conteo por clase
         """
+        if isinstance(detections, Detections):
+            return detections.class_counts()
+        
         stats = {}
         for detection in detections:
             class_name = detection['class']
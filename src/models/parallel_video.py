@@ -0,0 +1,221 @@
+"""
+Procesamiento de video en paralelo por tramos - Nopal Detector
+Reparte un video en N tramos contiguos, procesa cada uno en un proceso con
+sus propios modelos y une los videos y registros parciales en orden
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from multiprocessing import get_context
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+
+from utils.detection_log import DetectionLog, concatenate_logs, resolve_format
+from utils.error_handler import ResourceManager
+
+logger = logging.getLogger(__name__)
+
+Segment = Tuple[int, Optional[int]]
+
+
+def split_segments(total_frames: int, segments: int) -> List[Segment]:
+    """
+    Divide un video en tramos contiguos de tamaño similar
+
+    El último tramo queda abierto (fin None) por si CAP_PROP_FRAME_COUNT
+    se queda corto.
+
+    Args:
+        total_frames: Frames del video (CAP_PROP_FRAME_COUNT)
+        segments: Número de tramos
+
+    Returns:
+        List: Tramos (inicio, fin) en frames
+    """
+    segments = max(1, min(segments, total_frames)) if total_frames > 0 else 1
+    bounds = [round(i * total_frames / segments) for i in range(segments + 1)]
+    return [(bounds[i], bounds[i + 1] if i < segments - 1 else None) for i in range(segments)]
+
+
+def _limit_threads(threads: int) -> None:
+    """Reparte los núcleos entre procesos: cada trabajador usa ``threads`` hilos"""
+    cv2.setNumThreads(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def _process_segment(task: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Trabajador: procesa un tramo con ``NopalPersonDetector.process_video``
+
+    Args:
+        task: Configuración, pesos, video, tramo y rutas de salida del tramo
+
+    Returns:
+        Dict: Índice del tramo, frames escritos, frame inicial real y rutas parciales
+    """
+    from models.detector import NopalPersonDetector
+
+    _limit_threads(task['threads'])
+    config = dict(task['config'])
+    config['output'] = dict(config['output'], videos_dir=os.path.dirname(task['video_part']))
+    if config['model'].get('onnx_threads') is None:
+        config['model'] = dict(config['model'], onnx_threads=task['threads'])
+
+    detector = NopalPersonDetector(config)
+    detector.load_models(task['weights'])
+
+    start_time = time.perf_counter()
+    log = DetectionLog.from_config(task['log_part'], config) if task['log_part'] else nullcontext()
+    with log as detection_log:
+        detector.process_video(task['video_path'], os.path.basename(task['video_part']),
+                               batch_size=task['batch_size'], detection_log=detection_log,
+                               frame_range=task['segment'])
+    return {
+        'index': task['index'],
+        'segment': task['segment'],
+        'frames': detector.last_frame_range[1] - detector.last_frame_range[0],
+        'first_frame': detector.last_frame_range[0],
+        'video_part': task['video_part'],
+        'log_part': task['log_part'],
+        'elapsed': time.perf_counter() - start_time,
+    }
+
+
+def concatenate_videos(parts: List[str], output_path: str) -> str:
+    """
+    Une videos parciales en orden
+
+    Con ``ffmpeg`` en el PATH se copian los paquetes sin recodificar; si no,
+    se decodifica y codifica cada tramo con OpenCV.
+
+    Args:
+        parts: Videos parciales, en orden
+        output_path: Video de salida
+
+    Returns:
+        str: Ruta del video unido
+    """
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg:
+        import subprocess
+
+        list_path = output_path + '.parts.txt'
+        with open(list_path, 'w', encoding='utf-8') as f:
+            f.writelines(f"file '{os.path.abspath(part)}'\n" for part in parts)
+        try:
+            subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0',
+                            '-i', list_path, '-c', 'copy', output_path], check=True)
+            return output_path
+        except subprocess.CalledProcessError as e:
+            logger.warning("⚠️ ffmpeg no pudo unir los tramos (%s); se recodifican con OpenCV", e)
+        finally:
+            os.remove(list_path)
+
+    out = None
+    try:
+        for part in parts:
+            with ResourceManager(part, mode='read') as cap:
+                if out is None:
+                    size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+                    out = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*"mp4v"),
+                                          cap.get(cv2.CAP_PROP_FPS), size)
+                    if not out.isOpened():
+                        raise RuntimeError(f"No se pudo crear VideoWriter: {output_path}")
+                while True:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    out.write(frame)
+    finally:
+        if out is not None:
+            out.release()
+    return output_path
+
+
+def process_video_parallel(config: Dict[str, Any], weights: Optional[str], video_path: str,
+                           output_filename: str = "output_video.mp4", workers: int = 2,
+                           batch_size: Optional[int] = None, log_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Procesa un video repartiendo tramos entre procesos
+
+    Cada proceso carga sus modelos, se posiciona con CAP_PROP_POS_FRAMES y
+    procesa su tramo con el pipeline de ``process_video``. Los tramos se
+    escriben en un directorio temporal junto a la salida y se unen en orden.
+    La compuerta de movimiento y el tracker arrancan de cero en cada tramo.
+
+    Args:
+        config: Configuración del proyecto
+        weights: Pesos del modelo de nopales
+        video_path: Video de entrada
+        output_filename: Nombre del video de salida (en output.videos_dir)
+        workers: Procesos (y tramos)
+        batch_size: Frames por lote de inferencia en cada proceso
+        log_path: Registro de detecciones (opcional); el formato sigue a la extensión
+            o a ``detection_log.format``
+
+    Returns:
+        Dict: Ruta de salida, frames, tramos y tiempos
+
+    Raises:
+        FileNotFoundError: Si el video no existe
+        RuntimeError: Si algún tramo no empieza donde se pidió
+    """
+    if not os.path.exists(video_path):
+        raise FileNotFoundError(f"Video no encontrado: {video_path}")
+
+    with ResourceManager(video_path, mode='read', config=config) as cap:
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    segments = split_segments(total_frames, workers)
+    threads = max(1, (os.cpu_count() or 1) // len(segments))
+
+    videos_dir = config['output']['videos_dir']
+    os.makedirs(videos_dir, exist_ok=True)
+    output_path = os.path.join(videos_dir, output_filename)
+    log_format = resolve_format(log_path, (config.get('detection_log') or {}).get('format')) if log_path else None
+
+    logger.info("🧵 %d tramos de ~%d frames en %d procesos (%d hilos cada uno)",
+                len(segments), total_frames // len(segments), len(segments), threads)
+
+    work_dir = tempfile.mkdtemp(prefix='.segments-', dir=videos_dir)
+    start_time = time.perf_counter()
+    try:
+        tasks = [{
+            'index': i, 'config': config, 'weights': weights, 'video_path': video_path,
+            'segment': segment, 'batch_size': batch_size, 'threads': threads,
+            'video_part': os.path.join(work_dir, f"part-{i:03d}.mp4"),
+            'log_part': os.path.join(work_dir, f"part-{i:03d}.{log_format}") if log_path else None,
+        } for i, segment in enumerate(segments)]
+
+        # spawn: cada proceso inicializa sus propios modelos (sin heredar estado de CUDA/hilos)
+        with ProcessPoolExecutor(max_workers=len(tasks), mp_context=get_context('spawn')) as pool:
+            results = sorted(pool.map(_process_segment, tasks), key=lambda r: r['index'])
+
+        for result in results:
+            if result['first_frame'] != result['segment'][0]:
+                raise RuntimeError(f"El tramo {result['index']} empezó en el frame {result['first_frame']} "
+                                   f"en lugar de {result['segment'][0]} (búsqueda inexacta del códec)")
+            logger.info("   Tramo %d: frames %d-%d en %.1fs", result['index'], result['first_frame'],
+                        result['first_frame'] + result['frames'], result['elapsed'])
+
+        concatenate_videos([r['video_part'] for r in results], output_path)
+        if log_path:
+            concatenate_logs([r['log_part'] for r in results], log_path, log_format)
+            logger.info("🧾 Registro de detecciones: %s", log_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    elapsed = time.perf_counter() - start_time
+    frames = sum(r['frames'] for r in results)
+    logger.info("🎞️ Frames totales: %d (%.1f fps)", frames, frames / elapsed if elapsed else 0.0)
+    logger.info("✅ Video guardado: %s", output_path)
+    return {'output_path': output_path, 'frames': frames, 'segments': results, 'elapsed': elapsed}
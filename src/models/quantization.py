@@ -0,0 +1,259 @@
+"""
+Cuantización INT8 post-entrenamiento - Nopal Detector
+Genera un modelo ONNX INT8 estático calibrado con imágenes del dataset de
+Roboflow y compara latencia, tamaño y mAP50 contra el modelo FP32
+"""
+
+import json
+import logging
+import os
+import random
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from models.backends import IMAGE_EXTENSIONS, OnnxYOLO, export_onnx, letterbox
+from utils.metrics import load_yolo_labels, map50
+
+logger = logging.getLogger(__name__)
+
+
+def collect_images(dataset_dir: str, splits: tuple = ('train', 'valid'),
+                   limit: Optional[int] = None, seed: int = 42) -> List[str]:
+    """
+    Lista imágenes de la estructura de ``DatasetManager.prepare_dataset``
+
+    Args:
+        dataset_dir: Directorio del dataset (contiene train/images, valid/images)
+        splits: Splits de los que tomar imágenes
+        limit: Número máximo de imágenes (muestreo aleatorio reproducible)
+        seed: Semilla del muestreo
+
+    Returns:
+        List: Rutas de imágenes
+    """
+    images = []
+    for split in splits:
+        img_dir = Path(dataset_dir) / split / "images"
+        if img_dir.is_dir():
+            images.extend(sorted(str(p) for p in img_dir.iterdir()
+                                 if p.suffix.lower() in IMAGE_EXTENSIONS))
+
+    if limit and len(images) > limit:
+        random.Random(seed).shuffle(images)
+        images = sorted(images[:limit])
+    return images
+
+
+class ImageCalibrationReader:
+    """
+    Lector de calibración para ``onnxruntime.quantization.quantize_static``.
+
+    Aplica el mismo preprocesamiento que ``OnnxYOLO`` (letterbox, RGB, [0, 1]).
+    """
+
+    def __init__(self, image_paths: List[str], input_name: str, imgsz: int):
+        """
+        Inicializa el lector
+
+        Args:
+            image_paths: Imágenes de calibración
+            input_name: Nombre de la entrada del modelo ONNX
+            imgsz: Tamaño de entrada del modelo
+        """
+        self.image_paths = image_paths
+        self.input_name = input_name
+        self.imgsz = imgsz
+        self._iterator = iter(self.image_paths)
+
+    def get_next(self) -> Optional[Dict[str, np.ndarray]]:
+        """Devuelve la siguiente entrada de calibración o None al terminar"""
+        for path in self._iterator:
+            image = cv2.imread(path)
+            if image is None:
+                continue
+            boxed, _, _ = letterbox(image, (self.imgsz, self.imgsz))
+            tensor = np.ascontiguousarray(boxed[..., ::-1].transpose(2, 0, 1)[None], dtype=np.float32)
+            return {self.input_name: tensor / 255.0}
+        return None
+
+    def rewind(self) -> None:
+        """Reinicia el recorrido de imágenes"""
+        self._iterator = iter(self.image_paths)
+
+
+def _head_nodes(model: Any) -> List[str]:
+    """
+    Nodos de la cabeza de detección (última capa ``/model.N/``)
+
+    La decodificación de cajas (DFL, concatenaciones finales) es muy sensible
+    a la cuantización, por lo que se mantiene en FP32.
+    """
+    layer = re.compile(r"/model\.(\d+)/")
+    indices = [int(m.group(1)) for node in model.graph.node for m in [layer.search(node.name)] if m]
+    if not indices:
+        return []
+    prefix = f"/model.{max(indices)}/"
+    return [node.name for node in model.graph.node if node.name.startswith(prefix)]
+
+
+def quantize_model(weights_path: str, dataset_dir: str, output_path: Optional[str] = None,
+                   num_calibration: int = 200, imgsz: int = 640, per_channel: bool = True,
+                   keep_head_fp32: bool = True) -> Dict[str, str]:
+    """
+    Cuantiza estáticamente a INT8 un modelo entrenado
+
+    Args:
+        weights_path: Modelo entrenado (.pt u .onnx FP32)
+        dataset_dir: Dataset con train/images y valid/images para calibración
+        output_path: Ruta del modelo INT8 (default: <modelo>.int8.onnx)
+        num_calibration: Número de imágenes de calibración
+        imgsz: Tamaño de entrada
+        per_channel: Cuantización por canal de los pesos
+        keep_head_fp32: Mantener la cabeza de detección en FP32
+
+    Returns:
+        Dict: {'fp32': ruta, 'int8': ruta}
+    """
+    try:
+        import onnx
+        from onnxruntime.quantization import (
+            CalibrationMethod, QuantFormat, QuantType, quantize_static
+        )
+    except ImportError:
+        raise ImportError("❌ Se requieren onnx y onnxruntime. Ejecuta: pip install onnx onnxruntime")
+
+    # Modelo FP32 de referencia con lote fijo (requerido por la calibración). Va a
+    # <modelo>.static.onnx: <modelo>.onnx es el de lote dinámico de --backend onnx
+    fp32_path = str(weights_path)
+    if not fp32_path.endswith('.onnx'):
+        fp32_path = export_onnx(weights_path, imgsz=imgsz, dynamic=False,
+                                output_path=str(Path(weights_path).with_suffix('.static.onnx')))
+    output_path = output_path or str(Path(weights_path).with_suffix('.int8.onnx'))
+
+    images = collect_images(dataset_dir, limit=num_calibration)
+    if not images:
+        raise ValueError(f"❌ No hay imágenes de calibración en {dataset_dir}/train|valid/images")
+    logger.info("🎯 Calibrando con %d imágenes de %s", len(images), dataset_dir)
+
+    fp32_model = onnx.load(fp32_path)
+    input_name = fp32_model.graph.input[0].name
+    excluded = _head_nodes(fp32_model) if keep_head_fp32 else []
+    if excluded:
+        logger.info("🧠 %d nodos de la cabeza se mantienen en FP32", len(excluded))
+
+    reader = ImageCalibrationReader(images, input_name, imgsz)
+    quantize_static(
+        fp32_path,
+        output_path,
+        reader,
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=per_channel,
+        calibrate_method=CalibrationMethod.MinMax,
+        nodes_to_exclude=excluded,
+    )
+
+    # Conservar metadatos de ultralytics (names, imgsz, stride...)
+    int8_model = onnx.load(output_path)
+    existing = {prop.key for prop in int8_model.metadata_props}
+    for prop in fp32_model.metadata_props:
+        if prop.key not in existing:
+            int8_model.metadata_props.add(key=prop.key, value=prop.value)
+    onnx.save(int8_model, output_path)
+
+    logger.info("✅ Modelo INT8: %s", output_path)
+    return {'fp32': fp32_path, 'int8': output_path}
+
+
+def evaluate_onnx_model(model_path: str, dataset_dir: str, conf: float = 0.001,
+                        iou: float = 0.7, max_images: Optional[int] = None) -> Dict[str, float]:
+    """
+    Mide latencia, tamaño y mAP50 de un modelo ONNX sobre valid/
+
+    Args:
+        model_path: Modelo .onnx
+        dataset_dir: Dataset con valid/images y valid/labels
+        conf: Umbral de confianza (bajo para mAP)
+        iou: Umbral de IoU para NMS
+        max_images: Límite de imágenes a evaluar
+
+    Returns:
+        Dict: Métricas del modelo
+    """
+    model = OnnxYOLO(model_path)
+    images = collect_images(dataset_dir, splits=('valid',), limit=max_images)
+    labels_dir = Path(dataset_dir) / "valid" / "labels"
+
+    predictions, ground_truths, latencies = [], [], []
+    for i, path in enumerate(images):
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        start = time.perf_counter()
+        result = model(image, conf=conf, iou=iou)[0]
+        elapsed = time.perf_counter() - start
+        # La primera imagen incluye la inicialización de la sesión
+        if i > 0:
+            latencies.append(elapsed)
+
+        boxes = result.boxes
+        predictions.append(np.concatenate(
+            [boxes.xyxy, boxes.conf[:, None], boxes.cls[:, None]], axis=1
+        ).astype(np.float32))
+        ground_truths.append(load_yolo_labels(str(labels_dir / (Path(path).stem + ".txt")), image.shape[:2]))
+
+    metrics = map50(predictions, ground_truths, num_classes=len(model.names))
+    return {
+        'model': model_path,
+        'size_mb': os.path.getsize(model_path) / (1024 * 1024),
+        'latency_ms': float(np.mean(latencies) * 1000) if latencies else 0.0,
+        'map50': metrics['map50'],
+        'images': len(predictions),
+    }
+
+
+def compare_models(fp32_path: str, int8_path: str, dataset_dir: str,
+                   report_path: Optional[str] = None, max_images: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Genera el reporte comparativo FP32 vs INT8 sobre el split de validación
+
+    Args:
+        fp32_path: Modelo ONNX FP32
+        int8_path: Modelo ONNX INT8
+        dataset_dir: Dataset con valid/images y valid/labels
+        report_path: Ruta del reporte JSON (default: junto al modelo INT8)
+        max_images: Límite de imágenes a evaluar
+
+    Returns:
+        Dict: Reporte con métricas de ambos modelos
+    """
+    logger.info("📊 Evaluando FP32 y INT8 en %s/valid", dataset_dir)
+    fp32 = evaluate_onnx_model(fp32_path, dataset_dir, max_images=max_images)
+    int8 = evaluate_onnx_model(int8_path, dataset_dir, max_images=max_images)
+
+    report = {
+        'fp32': fp32,
+        'int8': int8,
+        'speedup': fp32['latency_ms'] / int8['latency_ms'] if int8['latency_ms'] else 0.0,
+        'size_ratio': int8['size_mb'] / fp32['size_mb'] if fp32['size_mb'] else 0.0,
+        'map50_drop': fp32['map50'] - int8['map50'],
+    }
+
+    logger.info("   %-6s %10s %12s %8s", "modelo", "tamaño", "latencia", "mAP50")
+    for name in ('fp32', 'int8'):
+        m = report[name]
+        logger.info("   %-6s %8.1fMB %10.1fms %8.3f", name, m['size_mb'], m['latency_ms'], m['map50'])
+    logger.info("   ⚡ Aceleración: %.2fx | Tamaño: %.0f%% | Δ mAP50: %.3f",
+                report['speedup'], report['size_ratio'] * 100, report['map50_drop'])
+
+    report_path = report_path or str(Path(int8_path).with_suffix('.report.json'))
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    logger.info("📄 Reporte: %s", report_path)
+    return report
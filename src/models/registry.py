@@ -0,0 +1,293 @@
+"""
+Registro de modelos compartido - Nopal Detector
+Mantiene una instancia por (pesos, mtime, backend) para todo el proceso, de modo
+que varios detectores no vuelvan a cargar los mismos pesos
+"""
+
+import ast
+import logging
+import os
+import pickle
+import threading
+import zipfile
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from models.backends import load_detection_model, resolve_backend
+
+logger = logging.getLogger(__name__)
+
+RegistryKey = Tuple[str, float, str]
+
+
+class ModelRegistry:
+    """
+    Caché LRU de modelos cargados y calentados, con presupuesto de memoria.
+
+    Las instancias se comparten entre detectores; una instancia de YOLO no
+    debe usarse desde varios hilos a la vez. Al expulsar un modelo solo se
+    libera la referencia del registro: los detectores que lo usan lo conservan.
+    """
+
+    def __init__(self, memory_budget_mb: Optional[float] = None, warmup: bool = True,
+                 enabled: bool = True):
+        """
+        Inicializa el registro
+
+        Args:
+            memory_budget_mb: Memoria máxima estimada de los modelos en caché (None = sin límite)
+            warmup: Si ejecutar una inferencia de calentamiento al cargar
+            enabled: Si False, cada llamada carga una instancia nueva
+        """
+        self.memory_budget_mb = memory_budget_mb
+        self.warmup = warmup
+        self.enabled = enabled
+        self._models: 'OrderedDict[RegistryKey, Tuple[Any, float]]' = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(weights_path: str, backend: Optional[str] = None) -> RegistryKey:
+        """
+        Clave del registro: ruta absoluta, fecha de modificación y backend
+
+        Los pesos por nombre (p. ej. 'yolo11s.pt' aún no descargado) usan mtime 0.
+        """
+        backend = resolve_backend(weights_path, backend)
+        if os.path.exists(weights_path):
+            return os.path.abspath(weights_path), os.path.getmtime(weights_path), backend
+        return str(weights_path), 0.0, backend
+
+    def get(self, weights_path: str, backend: Optional[str] = None,
+            imgsz: Optional[int] = None, threads: Optional[int] = None) -> Any:
+        """
+        Obtiene un modelo compartido, cargándolo si no está en caché
+
+        Args:
+            weights_path: Ruta de los pesos
+            backend: 'pytorch', 'onnx' o None/'auto'
+            imgsz: Tamaño de entrada para ONNX
+            threads: Hilos intra-op de ONNX Runtime
+
+        Returns:
+            YOLO u OnnxYOLO
+        """
+        if not self.enabled:
+            return load_detection_model(weights_path, backend, imgsz=imgsz, threads=threads)
+
+        key = self.make_key(weights_path, backend)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                self.hits += 1
+                logger.debug("♻️ Modelo compartido: %s", weights_path)
+                return self._models[key][0]
+
+            self.misses += 1
+            model = load_detection_model(weights_path, key[2], imgsz=imgsz, threads=threads)
+            if self.warmup:
+                self._warmup(model, imgsz or 640)
+
+            size_mb = self._estimate_size_mb(model, weights_path)
+            self._models[key] = (model, size_mb)
+            logger.debug("📥 Modelo registrado: %s (%.1f MB)", weights_path, size_mb)
+            self._evict(keep=key)
+            return model
+
+    def class_names(self, weights_path: str) -> Optional[Dict[int, str]]:
+        """
+        Nombres de clases de unos pesos sin construir el modelo
+
+        Usa un modelo ya registrado si existe; si no, lee los metadatos del archivo.
+        """
+        with self._lock:
+            for (path, _, _), (model, _) in self._models.items():
+                if path == os.path.abspath(weights_path) and getattr(model, 'names', None):
+                    return dict(model.names)
+        return read_class_names(weights_path)
+
+    def memory_usage_mb(self) -> float:
+        """Memoria estimada de los modelos en caché"""
+        with self._lock:
+            return sum(size for _, size in self._models.values())
+
+    def clear(self) -> None:
+        """Vacía el registro"""
+        with self._lock:
+            self._models.clear()
+
+    def _evict(self, keep: RegistryKey) -> None:
+        """Expulsa los modelos menos usados hasta respetar el presupuesto"""
+        if not self.memory_budget_mb:
+            return
+        while self.memory_usage_mb() > self.memory_budget_mb and len(self._models) > 1:
+            oldest = next(iter(self._models))
+            if oldest == keep:
+                break
+            self._models.pop(oldest)
+            logger.info("🗑️ Modelo expulsado del registro: %s", oldest[0])
+
+    @staticmethod
+    def _warmup(model: Any, imgsz: int) -> None:
+        """Inferencia inicial para crear el predictor y reservar memoria"""
+        try:
+            model(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), verbose=False)
+        except Exception as e:
+            logger.warning("⚠️ Calentamiento fallido: %s", e)
+
+    @staticmethod
+    def _estimate_size_mb(model: Any, weights_path: str) -> float:
+        """Estima la memoria del modelo (parámetros o tamaño del archivo)"""
+        try:
+            params = model.model.parameters()
+            return sum(p.numel() * p.element_size() for p in params) / (1024 * 1024)
+        except Exception:
+            pass
+        path = getattr(model, 'onnx_path', weights_path)
+        if os.path.exists(path):
+            return os.path.getsize(path) / (1024 * 1024)
+        return 0.0
+
+
+class _Stub:
+    """Objeto genérico que absorbe el estado de clases no permitidas al deserializar"""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __setstate__(self, state):
+        if isinstance(state, tuple) and len(state) == 2:
+            for part in state:
+                if isinstance(part, dict):
+                    self.__dict__.update(part)
+        elif isinstance(state, dict):
+            self.__dict__.update(state)
+
+
+class _MetadataUnpickler(pickle.Unpickler):
+    """
+    Deserializa un checkpoint de PyTorch sin importar torch ni leer tensores.
+
+    Solo se crean tipos básicos; cualquier otra clase (módulos, tensores) se
+    reemplaza por ``_Stub`` y los datos de tensores no se cargan.
+    """
+
+    _SAFE = {
+        ('builtins', 'set'), ('builtins', 'frozenset'), ('builtins', 'slice'),
+        ('builtins', 'dict'), ('builtins', 'list'), ('builtins', 'tuple'),
+        ('builtins', 'object'), ('collections', 'OrderedDict'),
+        ('copyreg', '_reconstructor'),
+    }
+
+    def find_class(self, module, name):
+        if (module, name) in self._SAFE:
+            return super().find_class(module, name)
+        return _Stub
+
+    def persistent_load(self, pid):
+        return None
+
+
+def _normalize_names(names: Any) -> Dict[int, str]:
+    """Convierte nombres de clases (lista o dict) a dict id → nombre"""
+    if isinstance(names, (list, tuple)):
+        names = dict(enumerate(names))
+    return {int(k): v for k, v in names.items()}
+
+
+def _names_from_checkpoint(weights_path: str) -> Optional[Dict[int, str]]:
+    """Lee model.names de un checkpoint .pt de ultralytics"""
+    with zipfile.ZipFile(weights_path) as archive:
+        data_pkl = next((n for n in archive.namelist() if n.endswith('data.pkl')), None)
+        if data_pkl is None:
+            return None
+        with archive.open(data_pkl) as f:
+            ckpt = _MetadataUnpickler(f).load()
+
+    if not isinstance(ckpt, dict):
+        return None
+    # ultralytics guarda el modelo en 'ema' (y 'model' puede ser None)
+    for key in ('ema', 'model'):
+        names = getattr(ckpt.get(key), 'names', None)
+        if names:
+            return _normalize_names(names)
+    return None
+
+
+def _names_from_onnx(weights_path: str) -> Optional[Dict[int, str]]:
+    """Lee los nombres de clases de los metadatos de un modelo ONNX"""
+    import onnx
+    model = onnx.load(weights_path, load_external_data=False)
+    for prop in model.metadata_props:
+        if prop.key == 'names':
+            return _normalize_names(ast.literal_eval(prop.value))
+    return None
+
+
+def read_class_names(weights_path: str) -> Optional[Dict[int, str]]:
+    """
+    Lee los nombres de clases de unos pesos sin construir el modelo
+
+    Args:
+        weights_path: Ruta de los pesos (.pt u .onnx)
+
+    Returns:
+        Dict: id → nombre de clase, o None si no se pudieron leer
+    """
+    if not os.path.exists(weights_path):
+        return None
+    try:
+        if str(weights_path).endswith('.onnx'):
+            return _names_from_onnx(weights_path)
+        return _names_from_checkpoint(weights_path)
+    except Exception as e:
+        logger.debug("No se pudieron leer los metadatos de %s: %s", weights_path, e)
+        return None
+
+
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry(model_config: Optional[Dict[str, Any]] = None) -> ModelRegistry:
+    """
+    Registro de modelos del proceso (se crea en la primera llamada)
+
+    Args:
+        model_config: Sección 'model' de la configuración (usa 'registry')
+
+    Returns:
+        ModelRegistry: Instancia compartida
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            registry_config = (model_config or {}).get('registry', {})
+            _registry = ModelRegistry(
+                memory_budget_mb=registry_config.get('memory_budget_mb'),
+                warmup=registry_config.get('warmup', True),
+                enabled=registry_config.get('enabled', True),
+            )
+        return _registry
+
+
+def load_model_from_config(weights_path: str, model_config: Dict[str, Any]) -> Any:
+    """
+    Obtiene un modelo del registro usando ``model.backend`` y ``model.onnx_threads``
+
+    Args:
+        weights_path: Ruta de los pesos
+        model_config: Sección 'model' de la configuración
+
+    Returns:
+        YOLO u OnnxYOLO compartido
+    """
+    return get_registry(model_config).get(
+        weights_path,
+        backend=model_config.get('backend'),
+        imgsz=model_config.get('onnx_imgsz'),
+        threads=model_config.get('onnx_threads'),
+    )
@@ -0,0 +1,242 @@
+"""
+Renderizado de anotaciones - Nopal Detector
+Dibujo de cajas y etiquetas compartido por los tres detectores: paleta por
+clase precalculada, etiquetas en caché y cajas agrupadas por clase
+"""
+
+from functools import lru_cache
+from typing import Any, Dict, Optional, Sequence, Tuple, Union
+
+import cv2
+import numpy as np
+
+from utils.box_ops import _to_numpy, result_to_detections
+
+Color = Tuple[int, int, int]
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+@lru_cache(maxsize=8192)
+def text_size(label: str, font_scale: float, thickness: int) -> Tuple[int, int, int]:
+    """
+    Métricas de una etiqueta (en caché: las etiquetas se repiten entre frames)
+
+    Returns:
+        Tuple: (ancho, alto, baseline) en píxeles
+    """
+    (width, height), baseline = cv2.getTextSize(label, FONT, font_scale, thickness)
+    return width, height, baseline
+
+
+def extract_detections(source: Any) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Convierte las detecciones a arrays una sola vez
+
+    Args:
+        source: Resultado de YOLO, ``Detections`` o array (N, 6) [x1, y1, x2, y2, conf, cls]
+
+    Returns:
+        Tuple: (array (N, 6), IDs de seguimiento (N,) o None)
+    """
+    if source is None:
+        return np.zeros((0, 6), dtype=np.float32), None
+    if hasattr(source, 'to_array'):
+        return source.to_array(), None
+    if hasattr(source, 'boxes'):
+        ids = source.boxes.id if source.boxes is not None else None
+        detections = result_to_detections(source)
+        if ids is None or len(detections) == 0:
+            return detections, None
+        return detections, np.asarray(_to_numpy(ids)).reshape(-1).astype(np.int64)
+    return np.asarray(source, dtype=np.float32).reshape(-1, 6), None
+
+
+@lru_cache(maxsize=4096)
+def label_sprite(label: str, font_scale: float, thickness: int, text_color: Color,
+                 background: Optional[Color]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Etiqueta pre-renderizada (en caché: se pega con un slice en lugar de putText)
+
+    Args:
+        label: Texto
+        font_scale: Escala de la fuente
+        thickness: Grosor del texto
+        text_color: Color del texto
+        background: Color del fondo (None = texto sin fondo)
+
+    Returns:
+        Tuple: (píxeles (h, w, 3), máscara del texto (h, w) o None si el fondo es opaco)
+    """
+    width, height, baseline = text_size(label, font_scale, thickness)
+    sprite_h = height + baseline + 5
+    glyphs = np.zeros((sprite_h, width), dtype=np.uint8)
+    cv2.putText(glyphs, label, (0, sprite_h - baseline - 2), FONT, font_scale, 255, thickness)
+    text = glyphs > 0
+
+    pixels = np.empty((sprite_h, width, 3), dtype=np.uint8)
+    pixels[:] = background if background is not None else text_color
+    pixels[text] = text_color
+    for array in (pixels, text):
+        array.flags.writeable = False
+    return pixels, (None if background is not None else text)
+
+
+class Annotator:
+    """
+    Dibuja detecciones sobre una imagen.
+
+    Las cajas de cada clase se dibujan con una sola llamada a
+    ``cv2.polylines``; cada etiqueta se renderiza una vez y después se pega
+    con un slice de NumPy. Con ``boxes_only`` se omiten las etiquetas para
+    maximizar los FPS.
+    """
+
+    def __init__(self, names: Union[Sequence[str], Dict[int, str]],
+                 colors: Optional[Union[Sequence[Color], Dict[int, Color]]] = None,
+                 text_colors: Optional[Union[Sequence[Color], Dict[int, Color]]] = None,
+                 default_color: Color = (0, 255, 0), box_thickness: int = 2,
+                 font_scale: float = 0.6, text_thickness: int = 2,
+                 label_background: bool = True, boxes_only: bool = False):
+        """
+        Inicializa el renderizador
+
+        Args:
+            names: Nombre de cada clase (lista o dict id → nombre)
+            colors: Color BGR de caja por clase (default: default_color)
+            text_colors: Color del texto por clase (default: blanco con fondo, color de la caja sin él)
+            default_color: Color para clases sin entrada en la paleta
+            box_thickness: Grosor de las cajas
+            font_scale: Escala de la fuente de las etiquetas
+            text_thickness: Grosor del texto
+            label_background: Dibujar un fondo relleno detrás de cada etiqueta
+            boxes_only: Dibujar solo las cajas (sin etiquetas)
+        """
+        self.names = self._table(names, None)
+        num_classes = len(self.names)
+        self.palette = self._colors(self._table(colors, default_color, num_classes))
+        default_text = (255, 255, 255) if label_background else None
+        self.text_palette = self._colors(self._table(text_colors, default_text, num_classes))
+        self.default_color = tuple(int(c) for c in default_color)
+        self.default_text_color = default_text
+        self.box_thickness = box_thickness
+        self.font_scale = font_scale
+        self.text_thickness = text_thickness
+        self.label_background = label_background
+        self.boxes_only = boxes_only
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], names: Union[Sequence[str], Dict[int, str]],
+                    colors: Optional[Union[Sequence[Color], Dict[int, Color]]] = None,
+                    **kwargs) -> 'Annotator':
+        """
+        Crea el renderizador con las opciones de la sección 'annotation'
+
+        Args:
+            config: Configuración completa del proyecto
+            names: Nombres de clase
+            colors: Paleta por clase
+            **kwargs: Estilo propio de cada detector (fuente, fondo...)
+        """
+        settings = (config or {}).get('annotation') or {}
+        kwargs.setdefault('boxes_only', settings.get('boxes_only', False))
+        if 'box_thickness' in settings:
+            kwargs.setdefault('box_thickness', settings['box_thickness'])
+        return cls(names, colors, **kwargs)
+
+    def name_of(self, class_id: int) -> str:
+        """Nombre de una clase (``clase_<id>`` si no está en la tabla)"""
+        if 0 <= class_id < len(self.names) and self.names[class_id] is not None:
+            return self.names[class_id]
+        return f"clase_{class_id}"
+
+    def color_of(self, class_id: int) -> Color:
+        """Color de caja de una clase"""
+        return self.palette[class_id] if 0 <= class_id < len(self.palette) else self.default_color
+
+    def draw(self, image: np.ndarray, detections: Any, ids: Optional[np.ndarray] = None,
+             inplace: bool = False) -> np.ndarray:
+        """
+        Dibuja las detecciones
+
+        Args:
+            image: Imagen BGR
+            detections: Resultado de YOLO, ``Detections`` o array (N, 6)
+            ids: IDs de seguimiento (si detections es un array)
+            inplace: Dibujar sobre la propia imagen en lugar de una copia
+
+        Returns:
+            np.ndarray: Imagen anotada
+        """
+        canvas = image if inplace else image.copy()
+        data, result_ids = extract_detections(detections)
+        ids = result_ids if ids is None else ids
+        if len(data) == 0:
+            return canvas
+
+        boxes = data[:, :4].astype(np.int32)
+        classes = data[:, 5].astype(np.int64)
+        corners = self._corners(boxes)
+        for class_id in np.unique(classes):
+            members = classes == class_id
+            cv2.polylines(canvas, list(corners[members]), True, self.color_of(int(class_id)),
+                          self.box_thickness)
+
+        if not self.boxes_only:
+            self._draw_labels(canvas, boxes, data[:, 4], classes, ids)
+        return canvas
+
+    def _draw_labels(self, canvas: np.ndarray, boxes: np.ndarray, confidences: np.ndarray,
+                     classes: np.ndarray, ids: Optional[np.ndarray]) -> None:
+        """Pega las etiquetas pre-renderizadas sobre el borde superior de cada caja"""
+        names = [self.name_of(class_id) for class_id in classes.tolist()]
+        if ids is not None:
+            labels = [f"{name} #{track_id}: {conf:.2f}"
+                      for name, track_id, conf in zip(names, ids.tolist(), confidences.tolist())]
+        else:
+            labels = [f"{name}: {conf:.2f}" for name, conf in zip(names, confidences.tolist())]
+
+        canvas_h, canvas_w = canvas.shape[:2]
+        for label, x, bottom, class_id in zip(labels, boxes[:, 0].tolist(), boxes[:, 1].tolist(),
+                                              classes.tolist()):
+            in_table = 0 <= class_id < len(self.text_palette)
+            text_color = (self.text_palette[class_id] if in_table else self.default_text_color) \
+                or self.color_of(class_id)
+            background = self.color_of(class_id) if self.label_background else None
+            pixels, mask = label_sprite(label, self.font_scale, self.text_thickness, text_color, background)
+
+            # Recortar la etiqueta a los bordes de la imagen
+            top = bottom - pixels.shape[0]
+            x0, y0 = max(x, 0), max(top, 0)
+            x1, y1 = min(x + pixels.shape[1], canvas_w), min(bottom, canvas_h)
+            if x0 >= x1 or y0 >= y1:
+                continue
+            src = (slice(y0 - top, y1 - top), slice(x0 - x, x1 - x))
+            if mask is None:
+                canvas[y0:y1, x0:x1] = pixels[src]
+            else:
+                region = canvas[y0:y1, x0:x1]
+                region[mask[src]] = text_color
+
+    @staticmethod
+    def _corners(boxes: np.ndarray) -> np.ndarray:
+        """Cajas (N, 4) xyxy → polígonos (N, 4, 2) int32 para polylines/fillPoly"""
+        x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+        return np.stack([np.stack([x1, y1], 1), np.stack([x2, y1], 1),
+                         np.stack([x2, y2], 1), np.stack([x1, y2], 1)], axis=1).astype(np.int32)
+
+    @staticmethod
+    def _table(values: Any, default: Any, length: int = 0) -> list:
+        """Convierte una lista o dict id → valor en una tabla indexada por id"""
+        if values is None:
+            return [default] * length
+        if isinstance(values, dict):
+            size = max(length, max(values, default=-1) + 1)
+            return [values.get(i, default) for i in range(size)]
+        table = list(values)
+        return table + [default] * (length - len(table))
+
+    @staticmethod
+    def _colors(table: list) -> list:
+        """Normaliza los colores a tuplas de int (requisito de OpenCV)"""
+        return [tuple(int(c) for c in color) if color is not None else None for color in table]
@@ -0,0 +1,164 @@
+"""
+Motor de procesamiento por lotes - Nopal Detector
+Decodifica y aplica letterbox en paralelo, infiere N imágenes por llamada
+y escribe las salidas en un pool asíncrono
+"""
+
+import logging
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from ultralytics.engine.results import Results
+
+from models.backends import letterbox, scale_boxes
+from utils.box_ops import result_to_detections
+
+logger = logging.getLogger(__name__)
+
+# (ruta, imagen original, imagen con letterbox, escala, relleno)
+Prepared = Tuple[str, Optional[np.ndarray], Optional[np.ndarray], float, Tuple[float, float]]
+
+
+class BatchEngine:
+    """
+    Procesa directorios grandes de imágenes con tres etapas solapadas.
+
+    - Decodificación + letterbox en ``workers`` hilos, hasta ``prefetch_batches``
+      lotes por delante del modelo (OpenCV libera el GIL).
+    - Inferencia de ``batch_size`` imágenes por llamada al modelo.
+    - Escritura de salidas en un pool de hilos con un máximo de tareas pendientes.
+
+    Los resultados se entregan en el orden de entrada y con las cajas en
+    coordenadas de la imagen original.
+    """
+
+    def __init__(self, model: Any, batch_size: int = 16, workers: int = 4, imgsz: int = 640,
+                 prefetch_batches: int = 2, write_workers: Optional[int] = None):
+        """
+        Inicializa el motor
+
+        Args:
+            model: Modelo YOLO u OnnxYOLO
+            batch_size: Imágenes por llamada al modelo
+            workers: Hilos de decodificación y letterbox
+            imgsz: Tamaño de entrada del modelo
+            prefetch_batches: Lotes preparados por delante de la inferencia
+            write_workers: Hilos de escritura (default: workers)
+        """
+        self.model = model
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+        self.imgsz = imgsz
+        self.prefetch_batches = max(1, prefetch_batches)
+        self.write_workers = max(1, write_workers or workers)
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self._pending_writes: Deque[Future] = deque()
+        self.stats: Dict[str, float] = {}
+
+    def __enter__(self) -> 'BatchEngine':
+        self._writer = ThreadPoolExecutor(max_workers=self.write_workers, thread_name_prefix="writer")
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.flush()
+        self._writer.shutdown(wait=True)
+        self._writer = None
+
+    def predict(self, paths: List[str], conf: float = 0.25, iou: float = 0.7) -> Iterator[Tuple[str, Optional[Results]]]:
+        """
+        Infiere todas las imágenes por lotes
+
+        Args:
+            paths: Rutas de las imágenes
+            conf: Umbral de confianza
+            iou: Umbral de IoU para NMS
+
+        Yields:
+            Tuple: (ruta, resultado) en orden; resultado es None si la imagen no se pudo leer
+        """
+        self.stats = {'images': 0, 'failed': 0, 'infer_time': 0.0, 'wait_time': 0.0}
+        start = time.perf_counter()
+        window = self.batch_size * (self.prefetch_batches + 1)
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="decode") as pool:
+            pending: Deque[Future] = deque(pool.submit(self._prepare, p) for p in paths[:window])
+            next_index = len(pending)
+
+            while pending:
+                batch = []
+                t0 = time.perf_counter()
+                while pending and len(batch) < self.batch_size:
+                    batch.append(pending.popleft().result())
+                    if next_index < len(paths):
+                        pending.append(pool.submit(self._prepare, paths[next_index]))
+                        next_index += 1
+                self.stats['wait_time'] += time.perf_counter() - t0
+
+                yield from self._infer_batch(batch, conf, iou)
+
+        self.stats['elapsed'] = time.perf_counter() - start
+        self.stats['images_per_sec'] = self.stats['images'] / self.stats['elapsed'] if self.stats['elapsed'] else 0.0
+
+    def submit(self, fn: Callable, *args) -> None:
+        """
+        Encola una tarea de escritura en el pool asíncrono
+
+        Si hay demasiadas tareas pendientes se espera a la más antigua para
+        acotar la memoria de imágenes anotadas en cola.
+        """
+        if self._writer is None:
+            fn(*args)
+            return
+        while len(self._pending_writes) >= self.write_workers * 4:
+            self._pending_writes.popleft().result()
+        self._pending_writes.append(self._writer.submit(fn, *args))
+
+    def flush(self) -> None:
+        """Espera a que terminen todas las escrituras pendientes"""
+        while self._pending_writes:
+            self._pending_writes.popleft().result()
+
+    def log_stats(self) -> None:
+        """Muestra el resumen de rendimiento de la última ejecución"""
+        stats = self.stats
+        if not stats.get('elapsed'):
+            return
+        logger.info("⚡ %d imágenes en %.1fs (%.1f img/s) | inferencia %.1fs | espera de decodificación %.1fs",
+                    stats['images'], stats['elapsed'], stats['images_per_sec'],
+                    stats['infer_time'], stats['wait_time'])
+        if stats['failed']:
+            logger.warning("⚠️ %d imágenes no se pudieron leer", stats['failed'])
+
+    def _prepare(self, path: str) -> Prepared:
+        """Decodifica una imagen y aplica letterbox (en un hilo del pool)"""
+        image = cv2.imread(path)
+        if image is None:
+            return path, None, None, 1.0, (0.0, 0.0)
+        boxed, gain, pad = letterbox(image, (self.imgsz, self.imgsz))
+        return path, image, boxed, gain, pad
+
+    def _infer_batch(self, batch: List[Prepared], conf: float, iou: float) -> Iterator[Tuple[str, Optional[Results]]]:
+        """Infiere un lote preparado y devuelve resultados en la imagen original"""
+        valid = [i for i, item in enumerate(batch) if item[1] is not None]
+        outputs = {}
+        if valid:
+            t0 = time.perf_counter()
+            # Las imágenes ya tienen el tamaño de entrada: el letterbox del modelo no las cambia
+            results = self.model([batch[i][2] for i in valid], conf=conf, iou=iou, verbose=False)
+            self.stats['infer_time'] += time.perf_counter() - t0
+            for i, result in zip(valid, results):
+                path, image, _, gain, pad = batch[i]
+                detections = scale_boxes(result_to_detections(result), gain, pad, image.shape[:2])
+                outputs[i] = Results(image, path=path, names=self.model.names, boxes=detections)
+
+        for i, (path, image, _, _, _) in enumerate(batch):
+            if image is None:
+                self.stats['failed'] += 1
+                yield path, None
+            else:
+                self.stats['images'] += 1
+                yield path, outputs[i]
@@ -0,0 +1,202 @@
+"""
+Operaciones vectorizadas sobre cajas - Nopal Detector
+IoU, NMS y conversiones de formato implementadas en NumPy
+"""
+
+from typing import Any, Optional, Tuple
+
+import numpy as np
+
+
+def xywh2xyxy(boxes: np.ndarray) -> np.ndarray:
+    """
+    Convierte cajas (cx, cy, w, h) a (x1, y1, x2, y2)
+
+    Args:
+        boxes: Array (N, 4) en formato centro-ancho-alto
+
+    Returns:
+        np.ndarray: Array (N, 4) en formato esquinas
+    """
+    out = np.empty_like(boxes)
+    half_w = boxes[:, 2] / 2
+    half_h = boxes[:, 3] / 2
+    out[:, 0] = boxes[:, 0] - half_w
+    out[:, 1] = boxes[:, 1] - half_h
+    out[:, 2] = boxes[:, 0] + half_w
+    out[:, 3] = boxes[:, 1] + half_h
+    return out
+
+
+def box_area(boxes: np.ndarray) -> np.ndarray:
+    """Área de cajas (N, 4) en formato xyxy"""
+    return np.clip(boxes[:, 2] - boxes[:, 0], 0, None) * np.clip(boxes[:, 3] - boxes[:, 1], 0, None)
+
+
+def box_iou(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """
+    Matriz de IoU entre dos conjuntos de cajas
+
+    Args:
+        boxes_a: Array (N, 4) xyxy
+        boxes_b: Array (M, 4) xyxy
+
+    Returns:
+        np.ndarray: Matriz (N, M) de IoU
+    """
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return np.zeros((len(boxes_a), len(boxes_b)), dtype=np.float32)
+
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:4], boxes_b[None, :, 2:4])
+    wh = np.clip(bottom_right - top_left, 0, None)
+    inter = wh[..., 0] * wh[..., 1]
+    union = box_area(boxes_a)[:, None] + box_area(boxes_b)[None, :] - inter
+    return inter / np.maximum(union, 1e-9)
+
+
+def box_ios(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """
+    Matriz de intersección sobre la caja más pequeña (IoS)
+
+    A diferencia de IoU, vale 1 cuando una caja está contenida en otra, lo que
+    permite fusionar detecciones parciales cortadas por el borde de un tile.
+
+    Args:
+        boxes_a: Array (N, 4) xyxy
+        boxes_b: Array (M, 4) xyxy
+
+    Returns:
+        np.ndarray: Matriz (N, M) de IoS
+    """
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return np.zeros((len(boxes_a), len(boxes_b)), dtype=np.float32)
+
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:4], boxes_b[None, :, 2:4])
+    wh = np.clip(bottom_right - top_left, 0, None)
+    inter = wh[..., 0] * wh[..., 1]
+    smaller = np.minimum(box_area(boxes_a)[:, None], box_area(boxes_b)[None, :])
+    return inter / np.maximum(smaller, 1e-9)
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """
+    Supresión de no-máximos (greedy) por orden de confianza
+
+    Args:
+        boxes: Array (N, 4) xyxy
+        scores: Array (N,) de confianzas
+        iou_threshold: IoU a partir del cual se suprime una caja
+
+    Returns:
+        np.ndarray: Índices conservados, ordenados por confianza descendente
+    """
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = box_area(boxes)
+    order = np.argsort(-scores, kind='stable')
+    keep = []
+
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        if rest.size == 0:
+            break
+        w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = w * h
+        iou = inter / np.maximum(areas[i] + areas[rest] - inter, 1e-9)
+        order = rest[iou <= iou_threshold]
+
+    return np.asarray(keep, dtype=np.int64)
+
+
+def batched_nms(boxes: np.ndarray, scores: np.ndarray, classes: np.ndarray,
+                iou_threshold: float) -> np.ndarray:
+    """
+    NMS independiente por clase (desplazando las cajas de cada clase)
+
+    Args:
+        boxes: Array (N, 4) xyxy
+        scores: Array (N,) de confianzas
+        classes: Array (N,) de índices de clase
+        iou_threshold: IoU a partir del cual se suprime una caja
+
+    Returns:
+        np.ndarray: Índices conservados, ordenados por confianza descendente
+    """
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    offsets = classes.astype(boxes.dtype)[:, None] * (float(np.abs(boxes).max()) + 1.0)
+    return nms(boxes + offsets, scores, iou_threshold)
+
+
+def dense_nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float,
+              classes: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    NMS greedy a partir de la matriz completa de IoU
+
+    Para conjuntos pequeños (post-proceso por frame, pocos cientos de cajas)
+    es más rápido que ``nms``: la matriz se calcula de una vez y el bucle
+    solo recorre las cajas que se solapan con alguna de menor confianza.
+
+    Args:
+        boxes: Array (N, 4) xyxy
+        scores: Array (N,) de confianzas
+        iou_threshold: IoU a partir del cual se suprime una caja
+        classes: Si se indica, solo se suprimen cajas de la misma clase
+
+    Returns:
+        np.ndarray: Índices conservados, ordenados por confianza descendente
+    """
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    order = np.argsort(-scores, kind='stable')
+    sorted_boxes = boxes[order]
+    overlaps = box_iou(sorted_boxes, sorted_boxes) > iou_threshold
+    if classes is not None:
+        sorted_classes = classes[order]
+        overlaps &= sorted_classes[:, None] == sorted_classes[None, :]
+    # Solo una caja de mayor confianza puede suprimir a otra
+    overlaps = np.triu(overlaps, k=1)
+
+    keep = np.ones(len(order), dtype=bool)
+    for i in np.flatnonzero(overlaps.any(axis=1)):
+        if keep[i]:
+            keep &= ~overlaps[i]
+    return order[keep]
+
+
+def result_to_detections(result: Any, classes: Optional[Tuple[int, ...]] = None) -> np.ndarray:
+    """
+    Extrae las detecciones de un resultado de YOLO como array (N, 6)
+
+    Args:
+        result: Resultado de YOLO (o None)
+        classes: Si se indica, solo se conservan esas clases
+
+    Returns:
+        np.ndarray: [x1, y1, x2, y2, conf, cls]
+    """
+    if result is None or result.boxes is None or len(result.boxes) == 0:
+        return np.zeros((0, 6), dtype=np.float32)
+    boxes = result.boxes
+    data = np.concatenate([
+        np.asarray(_to_numpy(boxes.xyxy), dtype=np.float32),
+        np.asarray(_to_numpy(boxes.conf), dtype=np.float32)[:, None],
+        np.asarray(_to_numpy(boxes.cls), dtype=np.float32)[:, None],
+    ], axis=1)
+    if classes is not None:
+        data = data[np.isin(data[:, 5].astype(np.int64), classes)]
+    return data
+
+
+def _to_numpy(values: Any) -> np.ndarray:
+    """Convierte tensores de torch (o arrays) a NumPy"""
+    return values.cpu().numpy() if hasattr(values, 'cpu') else values
@@ -9,6 +9,13 @@ import queue
 import time
 from typing import Optional, Callable, Dict, Any, List, Tuple, Union
 from ultralytics import YOLO
+from models.registry import load_model_from_config
+from models.fused import COCO_PERSON_CLASS_ID, person_class_id, split_fused_result
+from utils.motion_gate import MotionGate
+from utils.tracker import KeyframeTracker
+from utils.annotator import Annotator, extract_detections
+from utils.filters import SizeFilter
+from utils.suppression import PersonOverlapSuppressor, split_person_detections
 
 
 class CameraDetector:
@@ -46,19 +53,45 @@ class CameraDetector:
         
         self.nopal_model = None
         self.person_model = None
+        self.fused = False
+        self.person_class_id = COCO_PERSON_CLASS_ID
         self.cap = None
         self.is_running = False
-        self.frame_queue = queue.Queue(maxsize=2)
-        self.result_queue = queue.Queue(maxsize=2)
-        
-        # Configuración de filtros
-        self.use_size_filters = True  # Activar filtros de tamaño por defecto
+        # Colas de un solo elemento: siempre se conserva el frame más reciente
+        self.frame_queue = queue.Queue(maxsize=1)
+        self.result_queue = queue.Queue(maxsize=1)
+        self.paused = False
+        # Descartes por cola: frames sin inferir y resultados sin mostrar
+        self.dropped_frames = 0
+        self.dropped_results = 0
+        self._drop_lock = threading.Lock()
+        self._capture_thread = None
+        self._inference_thread = None
+        
+        # Compuerta de movimiento: reutiliza detecciones en frames estáticos
+        self.motion_gate = MotionGate.from_config(self.config)
+        self._last_results = None
+        
+        # Seguimiento: modelos solo en fotogramas clave (None = desactivado)
+        self.tracker = None
+        
+        # Filtros de tamaño (sección 'filters' de la config; activos por defecto en cámara)
+        self.size_filter = SizeFilter.from_config(self.config, 'camera')
+        self.suppressor = PersonOverlapSuppressor.from_config(self.config)
+        
+        # Renderizadores de anotaciones (se crean al procesar el primer frame)
+        self._annotators = None
+        self._annotators_key = None
         
         # Estadísticas en tiempo real
         self.fps_counter = 0
         self.fps_start_time = time.time()
         self.current_fps = 0
         
+        # Latencia captura → pantalla (media móvil exponencial, en ms)
+        self.current_latency_ms = 0.0
+        self.latency_smoothing = 0.2
+        
         # Configuración de ventana
         self.window_name = "Nopal Detector - Cámara en Tiempo Real"
         
@@ -145,16 +178,38 @@ class CameraDetector:
         
         # Cargar modelo de nopales
         if nopal_model_path and cv2.os.path.exists(nopal_model_path):
-            self.nopal_model = YOLO(nopal_model_path)
+            self.nopal_model = load_model_from_config(nopal_model_path, self.model_config)
             print(f"✅ Modelo de nopales cargado: {nopal_model_path}")
         else:
             print("⚠️ Modelo de nopales no encontrado, usando modelo base")
-            self.nopal_model = YOLO(self.model_config['base_model'])
+            self.nopal_model = load_model_from_config(self.model_config['base_model'], self.model_config)
+        
+        if self._configure_fused():
+            return
             
         # Cargar modelo de personas
-        self.person_model = YOLO(self.model_config['person_model'])
+        self.person_model = load_model_from_config(self.model_config['person_model'], self.model_config)
         print("✅ Modelo de personas cargado")
     
+    def _configure_fused(self) -> bool:
+        """
+        Activa el modo fusionado si el modelo de nopales incluye la clase 'person'
+        
+        Returns:
+            bool: True si se usará una sola pasada por frame
+        """
+        fused_person_id = person_class_id(getattr(self.nopal_model, 'names', None))
+        if fused_person_id is None:
+            self.fused = False
+            self.person_class_id = COCO_PERSON_CLASS_ID
+            return False
+        
+        self.fused = True
+        self.person_model = self.nopal_model
+        self.person_class_id = fused_person_id
+        print(f"✅ Modelo fusionado: una pasada por frame (persona = clase {fused_person_id})")
+        return True
+    
     def setup_camera(self, camera_index: int = 0, resolution: Tuple[int, int] = None) -> bool:
         """
         Configura la cámara y carga los modelos
@@ -224,13 +279,16 @@ class CameraDetector:
         try:
             # Cargar modelo de nopales usando la ruta especificada
             print(f"📥 Cargando modelo de nopales: {self.weights_path}")
-            self.nopal_model = YOLO(self.weights_path)
+            self.nopal_model = load_model_from_config(self.weights_path, self.model_config)
             print("✅ Modelo de nopales cargado")
             
+            if self._configure_fused():
+                return
+            
             # Cargar modelo de personas (usar modelo base)
             person_model_path = self.model_config.get('person_model_path', 'yolo11s.pt')
             print(f"📥 Cargando modelo de personas: {person_model_path}")
-            self.person_model = YOLO(person_model_path)
+            self.person_model = load_model_from_config(person_model_path, self.model_config)
             print("✅ Modelo de personas cargado")
             
         except Exception as e:
@@ -324,6 +382,22 @@ class CameraDetector:
             print(f"❌ Error reconectando cámara: {e}")
             return False
     
+    def _run_models(self, frame: np.ndarray, conf_thresh: float, iou_thresh: float) -> Tuple[List[Any], List[Any]]:
+        """
+        Ejecuta los modelos sobre un frame
+        
+        Returns:
+            Tuple: (resultados_nopal, resultados_persona) como listas de YOLO
+        """
+        if self.fused:
+            # Una sola pasada: separar nopales y personas por clase
+            res_fused = self.nopal_model(frame, conf=conf_thresh, iou=iou_thresh, verbose=False)
+            r_nopal, r_person = split_fused_result(res_fused[0], self.person_class_id)
+            return [r_nopal], [r_person]
+        res_nopal = self.nopal_model(frame, conf=conf_thresh, iou=iou_thresh, verbose=False)
+        res_person = self.person_model(frame, conf=conf_thresh, iou=iou_thresh, verbose=False)
+        return res_nopal, res_person
+    
     def process_frame(self, frame: np.ndarray) -> np.ndarray:
         """
         Procesa un frame con detecciones
@@ -346,122 +420,48 @@ class CameraDetector:
             conf_thresh = self.config.get('prediction', {}).get('confidence_threshold', 0.7)
             iou_thresh = self.config.get('prediction', {}).get('iou_threshold', 0.5)
             
-            res_nopal = self.nopal_model(frame, conf=conf_thresh, iou=iou_thresh, verbose=False)
-            res_person = self.person_model(frame, conf=conf_thresh, iou=iou_thresh, verbose=False)
+            if self.tracker is not None:
+                # Modelos en fotogramas clave; cajas propagadas por el tracker en el resto
+                self.tracker.set_high_threshold(conf_thresh)
+                if self.tracker.needs_detection():
+                    detect_conf = min(conf_thresh, self.tracker.detection_conf)
+                    res_nopal, res_person = self._run_models(frame, detect_conf, iou_thresh)
+                    r_nopal, r_person = self.tracker.update(frame, res_nopal[0], res_person[0])
+                else:
+                    r_nopal, r_person = self.tracker.predict(frame)
+                res_nopal, res_person = [r_nopal], [r_person]
+            elif not self.motion_gate.should_infer(frame) and self._last_results is not None:
+                # Escena sin cambios: reutilizar las últimas detecciones
+                res_nopal, res_person = self._last_results
+            else:
+                res_nopal, res_person = self._run_models(frame, conf_thresh, iou_thresh)
+            self._last_results = (res_nopal, res_person)
             
             annotated_frame = frame.copy()
+            nopal_annotator, person_annotator = self._get_annotators()
             
-            # Contadores para estadísticas por clase
-            class_counts = {}
-            person_count = 0
+            # Detecciones de nopales (multi-clase), convertidas a arrays una sola vez
+            nopal_dets, nopal_ids = extract_detections(res_nopal[0] if res_nopal else None)
+            nopal_dets, nopal_ids = self.size_filter.apply(nopal_dets, frame.shape, nopal_ids)
             
-            # Dibujar detecciones de nopales (multi-clase)
-            if res_nopal and len(res_nopal) > 0 and res_nopal[0].boxes is not None:
-                for box in res_nopal[0].boxes:
-                    x1, y1, x2, y2 = [int(coord) for coord in box.xyxy[0]]
-                    
-                    # Filtros para reducir falsos positivos (solo si están activados)
-                    if self.use_size_filters:
-                        box_width = x2 - x1
-                        box_height = y2 - y1
-                        box_area = box_width * box_height
-                        frame_area = frame.shape[0] * frame.shape[1]
-                        area_ratio = box_area / frame_area
-                        
-                        # Filtro 1: Rechazar detecciones muy grandes (probablemente personas)
-                        if area_ratio > 0.12:  # Más del 12% del frame
-                            continue
-                        
-                        # Filtro 2: Filtro por tamaño mínimo (evitar ruido)
-                        if box_width < 30 or box_height < 30:  # Muy pequeño
-                            continue
-                        
-                        # Filtro 3: Aspecto ratio - nopales no son extremadamente alargados
-                        aspect_ratio = box_width / box_height if box_height > 0 else 0
-                        if aspect_ratio > 4.0 or aspect_ratio < 0.25:  # Muy alargado o muy alto
-                            continue
-                    
-                    # Obtener la clase antes de incrementar contador
-                    class_id = int(box.cls) if box.cls is not None else 0
-                    class_names = self.nopal_model.names if hasattr(self.nopal_model, 'names') else {0: 'nopal'}
-                    class_name = class_names.get(class_id, 'nopal')
-                    
-                    # Incrementar contador de esta clase
-                    class_counts[class_name] = class_counts.get(class_name, 0) + 1
-                    
-                    # Colores para diferentes clases
-                    colors = {
-                        'nopal': (0, 255, 0),        # Verde
-                        'nopalChino': (255, 165, 0),  # Naranja
-                        0: (0, 255, 0),              # Verde por defecto
-                        1: (255, 165, 0)             # Naranja para clase 1
-                    }
-                    
-                    # Seleccionar color
-                    if class_name in colors:
-                        color = colors[class_name]
-                    elif class_id in colors:
-                        color = colors[class_id]
-                    else:
-                        color = (0, 255, 0)  # Verde por defecto
-                    
-                    # Dibujar rectángulo
-                    cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 2)
-                    
-                    # Dibujar etiqueta
-                    if box.conf is not None:
-                        confidence = box.conf.item()
-                        label = f"{class_name}: {confidence:.2f}"
-                        
-                        # Fondo para el texto
-                        (text_width, text_height), _ = cv2.getTextSize(
-                            label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2
-                        )
-                        cv2.rectangle(
-                            annotated_frame, 
-                            (x1, y1 - text_height - 10), 
-                            (x1 + text_width, y1), 
-                            color, -1
-                        )
-                        
-                        # Texto
-                        text_color = (255, 255, 255) if class_name == 'nopalChino' else (0, 0, 0)
-                        cv2.putText(
-                            annotated_frame, label, (x1, y1 - 5),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, text_color, 2
-                        )
-            
-            # Dibujar detecciones de personas (azul)
-            if res_person and len(res_person) > 0 and res_person[0].boxes is not None:
-                for box in res_person[0].boxes:
-                    if int(box.cls) == 0:  # Solo personas (clase 0 en COCO)
-                        person_count += 1
-                        x1, y1, x2, y2 = [int(coord) for coord in box.xyxy[0]]
-                        
-                        # Dibujar rectángulo
-                        cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), (255, 0, 0), 2)
-                        
-                        # Dibujar etiqueta
-                        if box.conf is not None:
-                            confidence = box.conf.item()
-                            label = f"Persona: {confidence:.2f}"
-                            
-                            # Fondo para el texto
-                            (text_width, text_height), _ = cv2.getTextSize(
-                                label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2
-                            )
-                            cv2.rectangle(
-                                annotated_frame, 
-                                (x1, y1 - text_height - 10), 
-                                (x1 + text_width, y1), 
-                                (255, 0, 0), -1
-                            )
-                            
-                            # Texto
-                            cv2.putText(
-                                annotated_frame, label, (x1, y1 - 5),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2
-                            )
+            # Personas (el modelo COCO detecta otras clases)
+            person_dets, person_ids = extract_detections(res_person[0] if res_person else None)
+            person_dets, person_ids = split_person_detections(person_dets, self.person_class_id, person_ids)
+            
+            # Nopales solapados con personas: suprimir o reetiquetar (+ NMS por clase)
+            nopal_dets, person_dets, nopal_ids, person_ids = self.suppressor.apply(
+                nopal_dets, person_dets, nopal_ids, person_ids
+            )
+            
+            # Contadores por clase con bincount
+            classes = nopal_dets[:, 5].astype(np.int64)
+            counts = np.bincount(classes) if len(classes) else np.zeros(0, dtype=np.int64)
+            class_counts = {nopal_annotator.name_of(int(class_id)): int(counts[class_id])
+                            for class_id in np.flatnonzero(counts)}
+            person_count = len(person_dets)
+            
+            nopal_annotator.draw(annotated_frame, nopal_dets, ids=nopal_ids, inplace=True)
+            person_annotator.draw(annotated_frame, person_dets, ids=person_ids, inplace=True)
             
             # Agregar información en pantalla
             self._draw_info_overlay(annotated_frame, class_counts, person_count)
@@ -472,6 +472,25 @@ class CameraDetector:
             print(f"⚠️ Error procesando frame: {e}")
             return frame
     
+    def _get_annotators(self) -> Tuple[Annotator, Annotator]:
+        """Renderizadores de nopales y personas (se recrean si cambia el modelo)"""
+        key = (id(self.nopal_model), self.person_class_id)
+        if self._annotators is None or self._annotators_key != key:
+            names = dict(getattr(self.nopal_model, 'names', None) or {0: 'nopal'})
+            # Colores por nombre de clase; si no, naranja para la clase 1 y verde por defecto
+            named_colors = {'nopal': (0, 255, 0), 'nopalChino': (255, 165, 0)}
+            colors = {class_id: named_colors.get(name, (255, 165, 0) if class_id == 1 else (0, 255, 0))
+                      for class_id, name in names.items()}
+            text_colors = {class_id: (255, 255, 255) if name == 'nopalChino' else (0, 0, 0)
+                           for class_id, name in names.items()}
+            self._annotators = (
+                Annotator.from_config(self.config, names, colors, text_colors=text_colors, font_scale=0.6),
+                Annotator.from_config(self.config, {self.person_class_id: 'Persona'},
+                                      {self.person_class_id: (255, 0, 0)}, font_scale=0.6),
+            )
+            self._annotators_key = key
+        return self._annotators
+    
     def _draw_info_overlay(self, frame: np.ndarray, class_counts: Dict[str, int], person_count: int):
         """
         Dibuja información superpuesta en el frame con contadores por clase
@@ -486,7 +505,8 @@ class CameraDetector:
         # Obtener todas las clases disponibles del modelo
         all_classes = []
         if self.nopal_model and hasattr(self.nopal_model, 'names'):
-            all_classes = list(self.nopal_model.names.values())
+            all_classes = [name for class_id, name in self.nopal_model.names.items()
+                           if not (self.fused and class_id == self.person_class_id)]
         else:
             all_classes = ['nopal']  # Fallback
         
@@ -525,8 +545,13 @@ class CameraDetector:
                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 2)
         y_offset += 25
         
-        # FPS
-        cv2.putText(frame, f"FPS: {self.current_fps:.1f}", (20, y_offset), 
+        # FPS y latencia captura → pantalla
+        perf_text = f"FPS: {self.current_fps:.1f}  Lat: {self.current_latency_ms:.0f} ms"
+        if self.tracker is not None:
+            perf_text += f"  IDs: {self.tracker.nopal.unique_count}"
+        elif self.motion_gate.enabled:
+            perf_text += f"  Skip: {self.motion_gate.skip_ratio * 100:.0f}%"
+        cv2.putText(frame, perf_text, (20, y_offset), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
         
         # Controles
@@ -542,6 +567,84 @@ class CameraDetector:
             self.fps_counter = 0
             self.fps_start_time = time.time()
     
+    def _update_latency(self, latency_s: float):
+        """Actualiza la latencia captura → pantalla suavizada"""
+        latency_ms = latency_s * 1000.0
+        if self.current_latency_ms == 0.0:
+            self.current_latency_ms = latency_ms
+        else:
+            alpha = self.latency_smoothing
+            self.current_latency_ms = alpha * latency_ms + (1 - alpha) * self.current_latency_ms
+    
+    def _put_latest(self, q: queue.Queue, item: Any, counter: str) -> None:
+        """
+        Encola un elemento descartando el anterior si la cola está llena
+        
+        Args:
+            q: Cola de un solo elemento
+            item: Elemento a encolar
+            counter: Atributo que cuenta los descartes de esta cola
+                ('dropped_frames' o 'dropped_results')
+        """
+        while True:
+            try:
+                q.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                    with self._drop_lock:
+                        setattr(self, counter, getattr(self, counter) + 1)
+                except queue.Empty:
+                    pass
+    
+    def _capture_loop(self):
+        """Hilo de captura: lee continuamente y conserva solo el frame más reciente"""
+        error_counter = 0
+        max_errors = 5  # Máximo de errores consecutivos antes de salir
+        
+        while self.is_running:
+            if self.paused:
+                time.sleep(0.05)
+                continue
+            
+            ret, frame = self.cap.read()
+            if not ret:
+                error_counter += 1
+                print(f"⚠️ Error leyendo frame de la cámara (intento {error_counter}/{max_errors})")
+                
+                if error_counter >= max_errors:
+                    print("❌ Demasiados errores consecutivos. Cerrando...")
+                    self.is_running = False
+                    break
+                
+                # Intentar reconectar la cámara cada 3 errores
+                if error_counter % 3 == 0:
+                    camera_index = getattr(self, '_current_camera_index', 0)
+                    if not self._reconnect_camera(camera_index):
+                        print("❌ No se pudo recuperar la conexión de la cámara")
+                        self.is_running = False
+                        break
+                
+                # Pausa breve antes del siguiente intento
+                time.sleep(0.1)
+                continue
+            
+            # Reset contador de errores si el frame se lee correctamente
+            error_counter = 0
+            self._put_latest(self.frame_queue, (time.perf_counter(), frame), 'dropped_frames')
+    
+    def _inference_loop(self):
+        """Hilo de inferencia: procesa el frame más reciente disponible"""
+        while self.is_running:
+            try:
+                capture_time, frame = self.frame_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            
+            annotated_frame = self.process_frame(frame)
+            self._put_latest(self.result_queue, (capture_time, annotated_frame), 'dropped_results')
+    
     def start_detection(self, camera_index: int = 0, save_video: bool = False, 
                        output_path: str = None) -> bool:
         """
@@ -593,54 +696,55 @@ class CameraDetector:
         print(f"   📊 Configuración inicial: Confianza={conf_thresh:.2f}, IoU={iou_thresh:.2f}")
         
         self.is_running = True
-        paused = False
+        self.paused = False
+        self.dropped_frames = 0
+        self.dropped_results = 0
+        self.motion_gate = MotionGate.from_config(self.config)
+        self.tracker = KeyframeTracker.from_config(self.config, self.person_class_id)
+        self.size_filter = SizeFilter.from_config(self.config, 'camera')
+        self.suppressor = PersonOverlapSuppressor.from_config(self.config)
+        self._last_results = None
         frame_counter = 0
-        error_counter = 0
-        max_errors = 5  # Máximo de errores consecutivos antes de salir
+        annotated_frame = None
+        
+        # Vaciar colas de una ejecución anterior
+        for q in (self.frame_queue, self.result_queue):
+            while not q.empty():
+                q.get_nowait()
+        
+        # Captura e inferencia en hilos propios; la ventana en el hilo principal
+        self._capture_thread = threading.Thread(target=self._capture_loop, name="capture", daemon=True)
+        self._inference_thread = threading.Thread(target=self._inference_loop, name="inference", daemon=True)
+        self._capture_thread.start()
+        self._inference_thread.start()
         
         try:
             while self.is_running:
-                if not paused:
-                    ret, frame = self.cap.read()
-                    if not ret:
-                        error_counter += 1
-                        print(f"⚠️ Error leyendo frame de la cámara (intento {error_counter}/{max_errors})")
+                if not self.paused:
+                    try:
+                        capture_time, result_frame = self.result_queue.get(timeout=0.05)
+                    except queue.Empty:
+                        result_frame = None
+                    
+                    if result_frame is not None:
+                        annotated_frame = result_frame
+                        self._update_latency(time.perf_counter() - capture_time)
                         
-                        if error_counter >= max_errors:
-                            print("❌ Demasiados errores consecutivos. Cerrando...")
-                            break
+                        # Actualizar FPS
+                        self._update_fps()
                         
-                        # Intentar reconectar la cámara cada 3 errores
-                        if error_counter % 3 == 0:
-                            camera_index = getattr(self, '_current_camera_index', 0)
-                            if not self._reconnect_camera(camera_index):
-                                print("❌ No se pudo recuperar la conexión de la cámara")
-                                break
+                        # Guardar frame si se está grabando
+                        if video_writer:
+                            video_writer.write(annotated_frame)
                         
-                        # Pausa breve antes del siguiente intento
-                        time.sleep(0.1)
-                        continue
-                    
-                    # Reset contador de errores si el frame se lee correctamente
-                    error_counter = 0
-                    
-                    # Procesar frame
-                    annotated_frame = self.process_frame(frame)
-                    
-                    # Actualizar FPS
-                    self._update_fps()
-                    
-                    # Guardar frame si se está grabando
-                    if video_writer:
-                        video_writer.write(annotated_frame)
-                    
-                    frame_counter += 1
+                        frame_counter += 1
                 else:
                     # Si está pausado, seguir mostrando el último frame
                     pass
                 
                 # Mostrar frame
-                cv2.imshow(self.window_name, annotated_frame)
+                if annotated_frame is not None:
+                    cv2.imshow(self.window_name, annotated_frame)
                 
                 # Manejar teclas
                 key = cv2.waitKey(1) & 0xFF
@@ -648,13 +752,16 @@ class CameraDetector:
                 if key == ord('q'):  # Salir
                     break
                 elif key == ord('s'):  # Guardar frame
-                    timestamp = int(time.time())
-                    save_path = f"outputs/predictions/camera_frame_{timestamp}.jpg"
-                    cv2.imwrite(save_path, annotated_frame)
-                    print(f"📸 Frame guardado: {save_path}")
+                    if annotated_frame is not None:
+                        timestamp = int(time.time())
+                        save_path = f"outputs/predictions/camera_frame_{timestamp}.jpg"
+                        cv2.imwrite(save_path, annotated_frame)
+                        print(f"📸 Frame guardado: {save_path}")
+                    else:
+                        print("⚠️ Aún no hay frame procesado para guardar")
                 elif key == ord(' '):  # Pausar/reanudar
-                    paused = not paused
-                    status = "pausado" if paused else "reanudado"
+                    self.paused = not self.paused
+                    status = "pausado" if self.paused else "reanudado"
                     print(f"⏸️ Video {status}")
                 elif key == ord('c'):  # Aumentar umbral de confianza
                     current_conf = self.config['prediction']['confidence_threshold']
@@ -677,8 +784,8 @@ class CameraDetector:
                     self.config['prediction']['iou_threshold'] = new_iou
                     print(f"🔧 Umbral IoU: {new_iou:.2f}")
                 elif key == ord('f'):  # Activar/desactivar filtros de tamaño
-                    self.use_size_filters = not self.use_size_filters
-                    status = "activados" if self.use_size_filters else "desactivados"
+                    self.size_filter.enabled = not self.size_filter.enabled
+                    status = "activados" if self.size_filter.enabled else "desactivados"
                     print(f"🔍 Filtros de tamaño: {status}")
         
         except KeyboardInterrupt:
@@ -687,6 +794,9 @@ class CameraDetector:
         finally:
             # Limpiar recursos
             self.is_running = False
+            for thread in (self._capture_thread, self._inference_thread):
+                if thread:
+                    thread.join(timeout=2.0)
             
             if self.cap:
                 self.cap.release()
@@ -697,6 +807,18 @@ class CameraDetector:
             
             cv2.destroyAllWindows()
             print(f"✅ Detección completada. Frames procesados: {frame_counter}")
+            print(f"   Frames descartados por antigüedad: {self.dropped_frames}")
+            print(f"   Resultados descartados sin mostrar: {self.dropped_results}")
+            if self.tracker is not None:
+                track_stats = self.tracker.stats
+                print(f"   Nopales únicos: {track_stats['unique_nopales']} | "
+                      f"Personas únicas: {track_stats['unique_personas']} | "
+                      f"Fotogramas clave: {track_stats['keyframes']}/{track_stats['frames']}")
+            elif self.motion_gate.enabled:
+                gate = self.motion_gate.stats
+                print(f"   Frames sin cambios (detecciones reutilizadas): "
+                      f"{gate['skipped']}/{gate['frames']} ({gate['skip_ratio'] * 100:.0f}%)")
+            print(f"   Latencia media captura → pantalla: {self.current_latency_ms:.0f} ms")
         
         return True
     
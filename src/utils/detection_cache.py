@@ -0,0 +1,291 @@
+"""
+Caché de detecciones candidatas - Nopal Detector
+Inferencia única a confianza mínima y sin NMS efectivo; los barridos de
+confianza, IoU y filtros de tamaño se evalúan después sobre la caché
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import cv2
+import numpy as np
+
+from utils.box_ops import dense_nms, result_to_detections
+from utils.filters import SizeFilter
+from utils.metrics import ap_per_class, load_yolo_labels, match_predictions
+from utils.video_processor import skip_frames
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+
+# Especificación de filtro del barrido: False (sin filtro), True (sección 'filters') o dict con cambios
+FilterSpec = Union[bool, Dict[str, Any]]
+
+
+class DetectionCache:
+    """
+    Cajas candidatas de un conjunto de imágenes o frames.
+
+    Todas las cajas están en un único array (N, 6) [x1, y1, x2, y2, conf, cls]
+    y ``offsets`` marca dónde empieza cada imagen, así que la caché ocupa
+    poco más que las propias cajas y se carga de una vez.
+    """
+
+    def __init__(self, sources: Sequence[str], shapes: np.ndarray, offsets: np.ndarray,
+                 boxes: np.ndarray, names: Dict[int, str], meta: Optional[Dict[str, Any]] = None):
+        """
+        Inicializa la caché
+
+        Args:
+            sources: Imagen (o ``video#frame``) de cada entrada
+            shapes: Array (K, 2) con (alto, ancho) de cada entrada
+            offsets: Array (K + 1,) con el inicio de las cajas de cada entrada
+            boxes: Array (N, 6) con todas las cajas candidatas
+            names: Nombres de clase del modelo
+            meta: Parámetros con los que se generó (modelo, confianza mínima...)
+        """
+        self.sources = list(sources)
+        self.shapes = np.asarray(shapes, dtype=np.int32).reshape(-1, 2)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 6)
+        self.names = {int(k): v for k, v in names.items()}
+        self.meta = dict(meta or {})
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+    def candidates(self, index: int) -> np.ndarray:
+        """Cajas candidatas de la entrada ``index``"""
+        return self.boxes[self.offsets[index]:self.offsets[index + 1]]
+
+    def save(self, path: str) -> str:
+        """
+        Guarda la caché en un .npz sin comprimir
+
+        Returns:
+            str: Ruta escrita
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        header = json.dumps({'version': CACHE_VERSION, 'sources': self.sources,
+                             'names': self.names, 'meta': self.meta}, ensure_ascii=False)
+        with open(path, 'wb') as f:
+            np.savez(f, header=np.frombuffer(header.encode('utf-8'), dtype=np.uint8),
+                     shapes=self.shapes, offsets=self.offsets, boxes=self.boxes)
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> 'DetectionCache':
+        """
+        Carga una caché de ``save``
+
+        Raises:
+            ValueError: Si la versión no es compatible
+        """
+        with np.load(path) as data:
+            header = json.loads(data['header'].tobytes().decode('utf-8'))
+            if header.get('version') != CACHE_VERSION:
+                raise ValueError(f"Versión de caché no soportada: {header.get('version')} ({path})")
+            return cls(header['sources'], data['shapes'], data['offsets'], data['boxes'],
+                       header['names'], header.get('meta'))
+
+
+def build_detection_cache(model: Any, sources: Union[str, Sequence[str]], conf: float = 0.001,
+                          iou: float = 1.0, max_det: int = 1000, frame_stride: int = 1,
+                          meta: Optional[Dict[str, Any]] = None) -> DetectionCache:
+    """
+    Ejecuta el modelo una sola vez y guarda todas las cajas candidatas
+
+    Con ``iou=1.0`` el NMS del modelo no suprime nada: se aplica después,
+    en el barrido, con cada umbral de IoU.
+
+    Args:
+        model: YOLO u OnnxYOLO
+        sources: Lista de imágenes o ruta de un video
+        conf: Confianza mínima de las candidatas
+        iou: IoU del NMS del modelo (1.0 = diferido)
+        max_det: Máximo de candidatas por imagen
+        frame_stride: En video, procesar uno de cada N frames
+        meta: Datos a guardar junto a la caché
+
+    Returns:
+        DetectionCache: Caché en memoria (usar ``save`` para escribirla)
+    """
+    entries, shapes, offsets, chunks = [], [], [0], []
+    for source, image in _iter_frames(sources, frame_stride):
+        try:
+            result = model(image, conf=conf, iou=iou, max_det=max_det, verbose=False)[0]
+        except Exception as e:
+            logger.warning("⚠️ Error en %s: %s", source, e)
+            continue
+        detections = result_to_detections(result)
+        entries.append(source)
+        shapes.append(image.shape[:2])
+        chunks.append(detections)
+        offsets.append(offsets[-1] + len(detections))
+        if len(entries) % 100 == 0:
+            logger.info("🗃️ %d imágenes en caché (%d candidatas)", len(entries), offsets[-1])
+
+    meta = dict(meta or {}, conf=conf, iou=iou, max_det=max_det)
+    boxes = np.concatenate(chunks) if chunks else np.zeros((0, 6), dtype=np.float32)
+    return DetectionCache(entries, np.asarray(shapes).reshape(-1, 2), np.asarray(offsets), boxes,
+                          dict(getattr(model, 'names', {}) or {}), meta)
+
+
+def _iter_frames(sources: Union[str, Sequence[str]], frame_stride: int) -> Iterator[Tuple[str, np.ndarray]]:
+    """Imágenes decodificadas de una lista de rutas o de un video (``video#frame``)"""
+    if isinstance(sources, str):
+        cap = cv2.VideoCapture(sources)
+        try:
+            index = 0
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                yield f"{sources}#{index}", frame
+                # Los frames intermedios se avanzan sin decodificar
+                index += 1 + skip_frames(cap, frame_stride - 1)
+        finally:
+            cap.release()
+        return
+
+    for path in sources:
+        image = cv2.imread(str(path))
+        if image is None:
+            logger.warning("⚠️ No se pudo leer la imagen: %s", path)
+            continue
+        yield str(path), image
+
+
+def label_path_for(image_path: str, labels_dir: Optional[str] = None) -> Optional[str]:
+    """
+    Etiqueta YOLO de una imagen
+
+    Args:
+        image_path: Ruta de la imagen
+        labels_dir: Directorio de etiquetas (default: ``../labels`` si la imagen está en ``images/``)
+
+    Returns:
+        str: Ruta del .txt, o None si no hay directorio de etiquetas
+    """
+    path = Path(image_path)
+    if labels_dir:
+        return str(Path(labels_dir) / (path.stem + ".txt"))
+    if path.parent.name == 'images':
+        return str(path.parent.parent / 'labels' / (path.stem + ".txt"))
+    return None
+
+
+def load_ground_truths(cache: DetectionCache, labels_dir: Optional[str] = None
+                       ) -> Optional[List[Tuple[np.ndarray, np.ndarray]]]:
+    """
+    Etiquetas de cada imagen de la caché
+
+    Returns:
+        List: (clases, cajas) por imagen, o None si no se encontró ninguna etiqueta
+    """
+    paths = [label_path_for(source, labels_dir) for source in cache.sources]
+    if not any(path and os.path.exists(path) for path in paths):
+        return None
+    return [load_yolo_labels(path, tuple(shape)) if path else
+            (np.zeros(0, dtype=np.int64), np.zeros((0, 4), dtype=np.float32))
+            for path, shape in zip(paths, cache.shapes)]
+
+
+def filter_label(spec: FilterSpec) -> str:
+    """Nombre legible de una especificación de filtro"""
+    if spec is False or spec is None:
+        return 'off'
+    if spec is True:
+        return 'config'
+    return ','.join(f"{k}={v}" for k, v in sorted(spec.items()))
+
+
+def _size_filter(spec: FilterSpec, config: Dict[str, Any]) -> Optional[SizeFilter]:
+    """SizeFilter de una especificación (None = sin filtro)"""
+    if spec is False or spec is None:
+        return None
+    settings = dict((config or {}).get('filters') or {})
+    if isinstance(spec, dict):
+        settings.update(spec)
+    settings['apply_to'] = ['multi_class']
+    return SizeFilter.from_config({'filters': settings}, 'multi_class')
+
+
+def sweep(cache: DetectionCache, confidences: Sequence[float], ious: Sequence[float],
+          filters: Sequence[FilterSpec] = (False,), config: Optional[Dict[str, Any]] = None,
+          ground_truths: Optional[List[Tuple[np.ndarray, np.ndarray]]] = None) -> List[Dict[str, Any]]:
+    """
+    Evalúa una rejilla de confianza x IoU x filtro de tamaño sobre la caché
+
+    El NMS greedy solo suprime cajas con cajas de mayor confianza, así que
+    subir el umbral de confianza no cambia qué cajas sobreviven por encima
+    de él: por cada IoU y filtro se hace un único NMS (y un único
+    emparejamiento con las etiquetas) al umbral más bajo, y cada confianza
+    es una máscara sobre ese resultado.
+
+    Args:
+        cache: Caché de ``build_detection_cache``
+        confidences: Umbrales de confianza
+        ious: Umbrales de IoU del NMS
+        filters: Especificaciones de filtro de tamaño (False, True o dict)
+        config: Configuración del proyecto (sección 'filters')
+        ground_truths: Etiquetas por imagen para calcular mAP50 (opcional)
+
+    Returns:
+        List: Una fila por combinación con conteos por clase (y mAP50 si hay etiquetas)
+    """
+    confidences = sorted(float(c) for c in confidences)
+    min_conf = confidences[0]
+    num_classes = max(max(cache.names, default=-1) + 1,
+                      int(cache.boxes[:, 5].max()) + 1 if len(cache.boxes) else 0)
+    gt_counts = None
+    if ground_truths is not None:
+        num_classes = max([num_classes] + [int(gt_cls.max()) + 1 for gt_cls, _ in ground_truths if len(gt_cls)])
+        gt_counts = sum((np.bincount(gt_cls, minlength=num_classes) for gt_cls, _ in ground_truths),
+                        np.zeros(num_classes, dtype=np.int64))
+
+    rows = []
+    for iou in ious:
+        # Un NMS por imagen e IoU, al umbral de confianza más bajo de la rejilla
+        kept = []
+        for i in range(len(cache)):
+            candidates = cache.candidates(i)
+            candidates = candidates[candidates[:, 4] >= min_conf]
+            keep = dense_nms(candidates[:, :4], candidates[:, 4], iou, candidates[:, 5].astype(np.int64))
+            kept.append(candidates[keep])
+
+        for spec in filters:
+            size_filter = _size_filter(spec, config)
+            per_image = [
+                dets[size_filter.mask(dets[:, :4], tuple(shape), dets[:, 5])] if size_filter and len(dets) else dets
+                for dets, shape in zip(kept, cache.shapes)
+            ]
+            merged = np.concatenate(per_image) if per_image else np.zeros((0, 6), dtype=np.float32)
+            scores = merged[:, 4]
+            classes = merged[:, 5].astype(np.int64)
+            hits = None
+            if ground_truths is not None:
+                hits = np.concatenate([np.zeros(0, dtype=bool)] + [
+                    match_predictions(dets, gt_cls, gt_boxes)
+                    for dets, (gt_cls, gt_boxes) in zip(per_image, ground_truths)
+                ])
+
+            for conf in confidences:
+                mask = scores >= conf
+                counts = np.bincount(classes[mask], minlength=num_classes)
+                row = {
+                    'conf': conf, 'iou': float(iou), 'filter': filter_label(spec),
+                    'detections': int(mask.sum()),
+                    'per_class': {cache.names.get(c, f"clase_{c}"): int(n)
+                                  for c, n in enumerate(counts.tolist()) if n},
+                }
+                if hits is not None:
+                    aps = ap_per_class(scores[mask], classes[mask], hits[mask], gt_counts)
+                    row['map50'] = float(np.mean(list(aps.values()))) if aps else 0.0
+                    row['ap50_per_class'] = {cache.names.get(c, f"clase_{c}"): ap for c, ap in aps.items()}
+                rows.append(row)
+    return rows
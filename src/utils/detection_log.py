@@ -0,0 +1,268 @@
+"""
+Registro estructurado de detecciones - Nopal Detector
+Escribe las detecciones crudas de predict, batch y video en JSONL, CSV o
+Parquet, acumulando en memoria y volcando por bloques en segundo plano
+"""
+
+import csv
+import json
+import logging
+import os
+import shutil
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('jsonl', 'csv', 'parquet')
+COLUMNS = ('source', 'frame', 'timestamp', 'class_id', 'class', 'confidence',
+           'x1', 'y1', 'x2', 'y2', 'track_id')
+
+# (origen, frame, timestamp, detecciones (N, 6), IDs, tabla de clases)
+Chunk = Tuple[str, int, float, np.ndarray, Optional[np.ndarray], Tuple[str, ...]]
+
+
+class DetectionLog:
+    """
+    Escritor en streaming de detecciones, una fila por caja.
+
+    ``write`` solo copia los arrays del frame; la conversión
+    a filas y la escritura se hacen cada ``flush_rows`` filas o
+    ``flush_interval`` segundos en un hilo aparte, con como mucho un
+    volcado pendiente para acotar la memoria.
+    """
+
+    def __init__(self, path: str, fmt: Optional[str] = None, flush_rows: int = 5000,
+                 flush_interval: float = 5.0):
+        """
+        Inicializa el registro
+
+        Args:
+            path: Archivo de salida
+            fmt: 'jsonl', 'csv' o 'parquet' (default: según la extensión)
+            flush_rows: Filas acumuladas que disparan un volcado
+            flush_interval: Segundos máximos entre volcados
+        """
+        fmt = resolve_format(path, fmt)
+        if fmt == 'parquet':
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise ImportError("❌ Parquet requiere pyarrow. Ejecuta: pip install pyarrow")
+
+        self.path = path
+        self.format = fmt
+        self.flush_rows = max(1, flush_rows)
+        self.flush_interval = flush_interval
+        self.rows = 0
+        self._chunks: List[Chunk] = []
+        self._pending_rows = 0
+        self._last_flush = time.monotonic()
+        self._file = None
+        self._csv_writer = None
+        self._parquet_writer = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: Optional[Future] = None
+
+    @classmethod
+    def from_config(cls, path: str, config: Dict[str, Any]) -> 'DetectionLog':
+        """Crea el registro con las opciones de la sección 'detection_log'"""
+        settings = (config or {}).get('detection_log') or {}
+        return cls(path, fmt=settings.get('format'),
+                   flush_rows=settings.get('flush_rows', 5000),
+                   flush_interval=settings.get('flush_interval', 5.0))
+
+    def __enter__(self) -> 'DetectionLog':
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="detlog")
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def write(self, source: str, detections: np.ndarray, names: Any,
+              frame: Optional[int] = None, timestamp: Optional[float] = None,
+              ids: Optional[np.ndarray] = None) -> None:
+        """
+        Registra las detecciones de una imagen o frame
+
+        Args:
+            source: Archivo de origen (imagen o video)
+            detections: Array (N, 6) [x1, y1, x2, y2, conf, cls]
+            names: Nombres de clase (lista o dict id → nombre, como ``model.names``)
+            frame: Índice del frame (None para imágenes)
+            timestamp: Segundos desde el inicio del video, o hora de proceso (default: ahora)
+            ids: IDs de seguimiento (opcional)
+        """
+        if len(detections):
+            # Copia: el llamador puede reutilizar o modificar el array después
+            self._chunks.append((
+                source, -1 if frame is None else frame,
+                time.time() if timestamp is None else timestamp,
+                np.array(detections[:, :6], dtype=np.float32),
+                None if ids is None else np.array(ids, dtype=np.int64),
+                _name_table(names),
+            ))
+            self._pending_rows += len(detections)
+        if (self._pending_rows >= self.flush_rows
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self) -> None:
+        """Envía las filas acumuladas al hilo de escritura"""
+        self._last_flush = time.monotonic()
+        if not self._chunks:
+            return
+        chunks, self._chunks = self._chunks, []
+        self.rows += self._pending_rows
+        self._pending_rows = 0
+        if self._executor is None:
+            self._write_chunks(chunks)
+            return
+        if self._pending is not None:
+            self._pending.result()
+        self._pending = self._executor.submit(self._write_chunks, chunks)
+
+    def close(self) -> None:
+        """Vuelca lo pendiente y cierra el archivo"""
+        self.flush()
+        if self._pending is not None:
+            self._pending.result()
+            self._pending = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._file is None and self.format != 'parquet':
+            # Sin detecciones: dejar el archivo (con cabecera en CSV) para no romper el consumidor
+            self._open_file()
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        logger.info("🧾 %d detecciones registradas en %s", self.rows, self.path)
+
+    def _columns(self, chunks: List[Chunk]) -> Dict[str, list]:
+        """Convierte los bloques acumulados en columnas (fuera del bucle de inferencia)"""
+        counts = [len(chunk[3]) for chunk in chunks]
+        detections = np.concatenate([chunk[3] for chunk in chunks]).astype(np.float64)
+        class_ids = detections[:, 5].astype(np.int64)
+
+        names = []
+        for chunk, chunk_classes in zip(chunks, np.split(class_ids, np.cumsum(counts)[:-1])):
+            table = chunk[5]
+            names.extend(table[c] if 0 <= c < len(table) and table[c] is not None else f"clase_{c}"
+                         for c in chunk_classes.tolist())
+        track_ids = np.concatenate([
+            chunk[4] if chunk[4] is not None else np.full(len(chunk[3]), -1, dtype=np.int64)
+            for chunk in chunks
+        ])
+
+        return {
+            'source': np.repeat([chunk[0] for chunk in chunks], counts).tolist(),
+            'frame': np.repeat([chunk[1] for chunk in chunks], counts).tolist(),
+            'timestamp': np.repeat([chunk[2] for chunk in chunks], counts).round(3).tolist(),
+            'class_id': class_ids.tolist(),
+            'class': names,
+            'confidence': detections[:, 4].round(4).tolist(),
+            'x1': detections[:, 0].round(1).tolist(),
+            'y1': detections[:, 1].round(1).tolist(),
+            'x2': detections[:, 2].round(1).tolist(),
+            'y2': detections[:, 3].round(1).tolist(),
+            'track_id': track_ids.tolist(),
+        }
+
+    def _write_chunks(self, chunks: List[Chunk]) -> None:
+        """Escribe un bloque de filas en el formato elegido (hilo de escritura)"""
+        columns = self._columns(chunks)
+        if self.format == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pydict(columns)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            self._parquet_writer.write_table(table)
+            return
+
+        if self._file is None:
+            self._open_file()
+
+        rows = zip(*(columns[name] for name in COLUMNS))
+        if self.format == 'csv':
+            self._csv_writer.writerows(rows)
+        else:
+            self._file.write(''.join(json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False) + '\n'
+                                     for row in rows))
+        self._file.flush()
+
+    def _open_file(self) -> None:
+        """Abre el archivo de texto y escribe la cabecera CSV"""
+        self._file = open(self.path, 'w', encoding='utf-8', newline='')
+        if self.format == 'csv':
+            self._csv_writer = csv.writer(self._file)
+            self._csv_writer.writerow(COLUMNS)
+
+
+def resolve_format(path: str, fmt: Optional[str] = None) -> str:
+    """
+    Formato de un registro: el indicado o el de la extensión del archivo
+
+    Raises:
+        ValueError: Si el formato no está soportado
+    """
+    fmt = (fmt or os.path.splitext(path)[1].lstrip('.')).lower()
+    if fmt == 'json':
+        fmt = 'jsonl'
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato de registro no soportado: {fmt}. Opciones: {FORMATS}")
+    return fmt
+
+
+def concatenate_logs(parts: List[str], path: str, fmt: Optional[str] = None) -> str:
+    """
+    Une en orden registros parciales del mismo formato (p. ej. tramos de un video)
+
+    Args:
+        parts: Registros parciales, en orden
+        path: Registro de salida
+        fmt: Formato (default: según la extensión de ``path``)
+
+    Returns:
+        str: Ruta escrita
+    """
+    fmt = resolve_format(path, fmt)
+    parts = [part for part in parts if os.path.exists(part)]
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for part in parts:
+                table = pq.read_table(part)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+        return path
+
+    with open(path, 'wb') as out:
+        for i, part in enumerate(parts):
+            with open(part, 'rb') as f:
+                if fmt == 'csv' and i > 0:
+                    f.readline()  # cabecera repetida
+                shutil.copyfileobj(f, out)
+    return path
+
+
+def _name_table(names: Any) -> Tuple[Optional[str], ...]:
+    """Tabla de nombres indexada por clase (acepta lista o dict id → nombre)"""
+    if isinstance(names, dict):
+        return tuple(names.get(i) for i in range(max(names, default=-1) + 1))
+    return tuple(names)
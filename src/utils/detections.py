@@ -0,0 +1,148 @@
+"""
+Contenedor columnar de detecciones - Nopal Detector
+Guarda cajas, confianzas y clases en arrays NumPy con una tabla de clases
+compartida; los diccionarios por detección solo se crean al consumirlos
+"""
+
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from utils.box_ops import result_to_detections
+
+Color = Tuple[int, int, int]
+DEFAULT_COLOR: Color = (0, 255, 0)
+
+
+class Detections:
+    """
+    Detecciones de una imagen en formato columnar.
+
+    - ``xyxy``: array (N, 4) float32
+    - ``conf``: array (N,) float32
+    - ``cls``: array (N,) int64
+    - ``names`` / ``colors``: tabla de clases compartida, indexada por id
+
+    Se comporta como la lista de diccionarios que devolvía
+    ``process_results`` (``len``, iteración, índices, ``bool``), pero el
+    filtrado y el conteo por clase son operaciones vectorizadas.
+    """
+
+    __slots__ = ('xyxy', 'conf', 'cls', 'names', 'colors')
+
+    def __init__(self, xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray,
+                 names: Sequence[str] = (), colors: Optional[Sequence[Color]] = None):
+        """
+        Inicializa el contenedor
+
+        Args:
+            xyxy: Cajas (N, 4)
+            conf: Confianzas (N,)
+            cls: Índices de clase (N,)
+            names: Nombre de cada clase por índice
+            colors: Color de cada clase por índice (default: verde)
+        """
+        self.xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        self.conf = np.asarray(conf, dtype=np.float32).reshape(-1)
+        self.cls = np.asarray(cls, dtype=np.int64).reshape(-1)
+        self.names = tuple(names)
+        self.colors = tuple(colors) if colors is not None else ()
+
+    @classmethod
+    def from_array(cls, data: np.ndarray, names: Sequence[str] = (),
+                   colors: Optional[Sequence[Color]] = None) -> 'Detections':
+        """
+        Crea el contenedor desde un array (N, 6) [x1, y1, x2, y2, conf, cls]
+
+        Args:
+            data: Detecciones en formato array
+            names: Tabla de nombres de clase
+            colors: Tabla de colores de clase
+        """
+        data = np.asarray(data, dtype=np.float32).reshape(-1, 6)
+        return cls(data[:, :4], data[:, 4], data[:, 5], names, colors)
+
+    @classmethod
+    def from_result(cls, result: Any, names: Sequence[str] = (),
+                    colors: Optional[Sequence[Color]] = None) -> 'Detections':
+        """
+        Crea el contenedor desde un resultado de YOLO (sin recorrer las cajas)
+
+        Args:
+            result: Resultado de YOLO (o None)
+            names: Tabla de nombres de clase
+            colors: Tabla de colores de clase
+        """
+        return cls.from_array(result_to_detections(result), names, colors)
+
+    def __len__(self) -> int:
+        return len(self.conf)
+
+    def __bool__(self) -> bool:
+        return len(self.conf) > 0
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self.conf)):
+            yield self._to_dict(i)
+
+    def __getitem__(self, index: Union[int, slice, np.ndarray]) -> Union[Dict[str, Any], 'Detections']:
+        """Un índice entero devuelve un dict; un slice o máscara, otro contenedor"""
+        if isinstance(index, (int, np.integer)):
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError("Índice de detección fuera de rango")
+            return self._to_dict(int(index))
+        return self.filter(index)
+
+    def __repr__(self) -> str:
+        return f"Detections(n={len(self)}, clases={self.class_counts()})"
+
+    def filter(self, mask: Union[np.ndarray, slice]) -> 'Detections':
+        """
+        Subconjunto de detecciones (máscara booleana, índices o slice)
+
+        Returns:
+            Detections: Nuevo contenedor con la misma tabla de clases
+        """
+        return Detections(self.xyxy[mask], self.conf[mask], self.cls[mask], self.names, self.colors)
+
+    def name_of(self, class_id: int) -> str:
+        """Nombre de una clase (``clase_<id>`` si no está en la tabla)"""
+        return self.names[class_id] if 0 <= class_id < len(self.names) else f"clase_{class_id}"
+
+    def class_counts(self) -> Dict[str, int]:
+        """
+        Conteo por clase con ``bincount``
+
+        Returns:
+            Dict: {nombre de clase: número de detecciones}, por índice de clase
+        """
+        if len(self.cls) == 0:
+            return {}
+        counts = np.bincount(self.cls, minlength=len(self.names))
+        return {self.name_of(int(class_id)): int(counts[class_id]) for class_id in np.flatnonzero(counts)}
+
+    def classes_detected(self) -> List[str]:
+        """Nombres de las clases presentes"""
+        return [self.name_of(int(class_id)) for class_id in np.unique(self.cls)]
+
+    def to_array(self) -> np.ndarray:
+        """Detecciones como array (N, 6) [x1, y1, x2, y2, conf, cls]"""
+        return np.concatenate([self.xyxy, self.conf[:, None], self.cls[:, None].astype(np.float32)], axis=1)
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Conversión a la lista de diccionarios de la API pública"""
+        return list(self)
+
+    def _to_dict(self, i: int) -> Dict[str, Any]:
+        """Diccionario de una detección (formato histórico de process_results)"""
+        class_id = int(self.cls[i])
+        x1, y1, x2, y2 = self.xyxy[i]
+        return {
+            'bbox': [int(x1), int(y1), int(x2), int(y2)],
+            'confidence': float(self.conf[i]),
+            'class': self.name_of(class_id),
+            'class_id': class_id,
+            'color': self.colors[class_id] if 0 <= class_id < len(self.colors) else DEFAULT_COLOR,
+        }
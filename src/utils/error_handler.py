@@ -6,26 +6,34 @@ Proporciona decoradores, context managers y retry logic
 import logging
 import time
 from functools import wraps
-from typing import Callable, Any, Optional, Type
+from typing import Callable, Any, Dict, Optional, Type
 from contextlib import contextmanager
 import cv2
 
+from utils.ffmpeg_io import open_video_reader
+
 logger = logging.getLogger(__name__)
 
 
 class ResourceManager:
     """Context manager para OpenCV VideoCapture y VideoWriter"""
     
-    def __init__(self, video_path: str, mode: str = 'read'):
+    def __init__(self, video_path: str, mode: str = 'read',
+                 config: Optional[Dict[str, Any]] = None, pool_size: int = 2):
         """
         Inicializa el gestor de recursos de video.
         
         Args:
             video_path: Ruta del video
             mode: 'read' para captura, 'write' para escritura
+            config: Configuración del proyecto; ``video.io_backend: ffmpeg``
+                lee con ``utils.ffmpeg_io.FFmpegReader`` (default: OpenCV)
+            pool_size: Con ffmpeg, búferes de frame preasignados
         """
         self.video_path = video_path
         self.mode = mode
+        self.config = config
+        self.pool_size = pool_size
         self.cap = None
         self.out = None
         self.frame_width = None
@@ -35,7 +43,7 @@ class ResourceManager:
     def __enter__(self):
         """Configura el contexto"""
         if self.mode == 'read':
-            self.cap = cv2.VideoCapture(self.video_path)
+            self.cap = open_video_reader(self.video_path, self.config, self.pool_size)
             if not self.cap.isOpened():
                 raise RuntimeError(f"❌ No se pudo abrir video: {self.video_path}")
             
@@ -0,0 +1,352 @@
+"""
+E/S de video con ffmpeg - Nopal Detector
+Lee y escribe frames BGR crudos por tuberías con un proceso ``ffmpeg``,
+con búferes preasignados, decodificación multihilo y códecs como libx264
+"""
+
+import json
+import logging
+import os
+import shutil
+import subprocess
+import threading
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+IO_BACKENDS = ('opencv', 'ffmpeg')
+
+# Códecs que aceptan -preset y -crf
+_CRF_CODECS = ('libx264', 'libx265')
+_FASTSTART_EXTENSIONS = ('.mp4', '.mov', '.m4v')
+
+# Líneas de stderr de ffmpeg que se conservan para los mensajes de error
+_STDERR_LINES = 20
+
+
+def ffmpeg_binary(name: str = 'ffmpeg') -> str:
+    """
+    Ruta de ``ffmpeg`` (o ``ffprobe``) en el PATH
+
+    Raises:
+        RuntimeError: Si no está instalado
+    """
+    path = shutil.which(name)
+    if not path:
+        raise RuntimeError(f"❌ {name} no encontrado en el PATH. Instálalo o usa video.io_backend: opencv")
+    return path
+
+
+def resolve_io_backend(config: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Backend de E/S de video de ``video.io_backend``
+
+    Returns:
+        str: 'opencv' o 'ffmpeg'
+
+    Raises:
+        ValueError: Si el backend no está soportado
+    """
+    backend = ((config or {}).get('video') or {}).get('io_backend') or 'opencv'
+    if backend not in IO_BACKENDS:
+        raise ValueError(f"❌ Backend de video no soportado: {backend}. Opciones: {', '.join(IO_BACKENDS)}")
+    return backend
+
+
+def probe_video(path: str) -> Dict[str, Any]:
+    """
+    Propiedades del primer stream de video con ``ffprobe``
+
+    Returns:
+        Dict: width, height, fps y frames (estimados por duración si el
+        contenedor no los declara)
+
+    Raises:
+        RuntimeError: Si ffprobe no puede leer el archivo
+    """
+    command = [ffmpeg_binary('ffprobe'), '-v', 'error', '-select_streams', 'v:0',
+               '-show_entries', 'stream=width,height,avg_frame_rate,r_frame_rate,nb_frames,duration',
+               '-of', 'json', path]
+    result = subprocess.run(command, capture_output=True, text=True)
+    streams = json.loads(result.stdout or '{}').get('streams') if result.returncode == 0 else None
+    if not streams:
+        raise RuntimeError(f"❌ ffprobe no pudo leer {path}: {result.stderr.strip()}")
+
+    stream = streams[0]
+    fps = _parse_rate(stream.get('avg_frame_rate')) or _parse_rate(stream.get('r_frame_rate'))
+    frames = stream.get('nb_frames')
+    if frames in (None, 'N/A'):
+        duration = stream.get('duration')
+        frames = round(float(duration) * fps) if duration not in (None, 'N/A') and fps else 0
+    return {'width': int(stream['width']), 'height': int(stream['height']), 'fps': fps, 'frames': int(frames)}
+
+
+class _StderrTail:
+    """
+    Vacía el stderr de ffmpeg en un hilo y guarda las últimas líneas.
+
+    Sin esto, un video dañado (una línea de error por frame) llena la
+    tubería, ffmpeg se bloquea al escribir en stderr y deja de producir
+    frames, y la lectura se queda esperando para siempre.
+    """
+
+    def __init__(self, stream):
+        self.lines = deque(maxlen=_STDERR_LINES)
+        self._stream = stream
+        self._thread = threading.Thread(target=self._drain, name="ffmpeg-stderr", daemon=True)
+        self._thread.start()
+
+    def _drain(self) -> None:
+        with self._stream:
+            for line in iter(self._stream.readline, b''):
+                self.lines.append(line.decode('utf-8', 'replace').rstrip())
+
+    def text(self) -> str:
+        """Últimas líneas (tras terminar el proceso)"""
+        self._thread.join(timeout=1.0)
+        return '\n'.join(self.lines)
+
+
+def _parse_rate(rate: Optional[str]) -> float:
+    """'30000/1001' → 29.97 (0.0 si no está definido)"""
+    if not rate or rate in ('0/0', 'N/A'):
+        return 0.0
+    num, _, den = rate.partition('/')
+    return float(num) / float(den or 1) if float(den or 1) else 0.0
+
+
+class FFmpegReader:
+    """
+    Lector de frames BGR desde un proceso ``ffmpeg``.
+
+    Expone el subconjunto de ``cv2.VideoCapture`` que usa el proyecto
+    (``read``, ``grab``, ``get``, ``set(CAP_PROP_POS_FRAMES)``,
+    ``isOpened``, ``release``). Cada frame se lee con ``readinto`` en uno
+    de ``pool_size`` búferes preasignados que se reutilizan en rotación:
+    el frame devuelto por ``read`` es válido hasta ``pool_size`` lecturas
+    después, así que quien retenga frames más tiempo debe copiarlos.
+    """
+
+    def __init__(self, path: str, pool_size: int = 2, threads: int = 0):
+        """
+        Inicializa el lector
+
+        Args:
+            path: Video de entrada
+            pool_size: Búferes de frame preasignados (frames vivos a la vez)
+            threads: Hilos de decodificación de ffmpeg (0 = automático)
+        """
+        self.path = path
+        self.threads = threads
+        self.position = 0
+        self._process: Optional[subprocess.Popen] = None
+        try:
+            self.info = probe_video(path)
+        except RuntimeError as e:
+            logger.error(str(e))
+            self.info = None
+            return
+
+        shape = (self.info['height'], self.info['width'], 3)
+        self.frame_bytes = int(np.prod(shape))
+        self._pool = np.empty((max(1, pool_size),) + shape, dtype=np.uint8)
+        self._next = 0
+        self._scratch = np.empty(shape, dtype=np.uint8)
+        self._start(0)
+
+    def _start(self, frame: int) -> None:
+        """(Re)lanza ffmpeg a partir de ``frame`` (búsqueda por tiempo; asume fps constantes)"""
+        self._stop()
+        command = [ffmpeg_binary(), '-nostdin', '-loglevel', 'error', '-threads', str(self.threads)]
+        if frame > 0 and self.info['fps']:
+            # Medio frame antes: el primer frame con pts >= inicio es exactamente ``frame``
+            command += ['-ss', f"{(frame - 0.5) / self.info['fps']:.6f}"]
+        command += ['-i', self.path, '-map', '0:v:0', '-vsync', '0',
+                    '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-']
+        self._process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0)
+        self._stderr = _StderrTail(self._process.stderr)
+        self.position = frame
+
+    def _stop(self) -> None:
+        """Termina el proceso actual si sigue vivo"""
+        if self._process is None:
+            return
+        self._process.stdout.close()
+        if self._process.poll() is None:
+            self._process.kill()
+        self._process.wait()
+        self._stderr.text()
+        self._process = None
+
+    def isOpened(self) -> bool:
+        return self._process is not None
+
+    def _read_into(self, buffer: np.ndarray) -> bool:
+        """Llena ``buffer`` con el siguiente frame (False al final del video)"""
+        if self._process is None:
+            return False
+        view = memoryview(buffer).cast('B')
+        filled = 0
+        while filled < self.frame_bytes:
+            count = self._process.stdout.readinto(view[filled:])
+            if not count:
+                if filled:
+                    logger.warning("⚠️ Frame incompleto al final de %s", self.path)
+                if self._process.wait() != 0:
+                    logger.warning("⚠️ ffmpeg terminó con error leyendo %s: %s", self.path, self._stderr.text())
+                return False
+            filled += count
+        self.position += 1
+        return True
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        """Siguiente frame en el siguiente búfer del pool (como ``VideoCapture.read``)"""
+        buffer = self._pool[self._next]
+        if not self._read_into(buffer):
+            return False, None
+        self._next = (self._next + 1) % len(self._pool)
+        return True, buffer
+
+    def grab(self) -> bool:
+        """Avanza un frame sin ocupar el pool (ffmpeg lo decodifica igualmente)"""
+        return self._read_into(self._scratch)
+
+    def get(self, prop: int) -> float:
+        if self.info is None:
+            return 0.0
+        return float({
+            cv2.CAP_PROP_FRAME_WIDTH: self.info['width'],
+            cv2.CAP_PROP_FRAME_HEIGHT: self.info['height'],
+            cv2.CAP_PROP_FPS: self.info['fps'],
+            cv2.CAP_PROP_FRAME_COUNT: self.info['frames'],
+            cv2.CAP_PROP_POS_FRAMES: self.position,
+        }.get(prop, 0.0))
+
+    def set(self, prop: int, value: float) -> bool:
+        if prop != cv2.CAP_PROP_POS_FRAMES or self.info is None:
+            return False
+        self._start(max(0, int(value)))
+        return True
+
+    def release(self) -> None:
+        self._stop()
+
+
+class FFmpegWriter:
+    """
+    Escritor de frames BGR hacia un proceso ``ffmpeg``.
+
+    Expone el subconjunto de ``cv2.VideoWriter`` que usa el proyecto
+    (``write``, ``isOpened``, ``release``). Los frames se envían por la
+    tubería sin copiarlos (salvo que no sean contiguos) y ffmpeg los
+    codifica en sus propios hilos.
+    """
+
+    def __init__(self, path: str, fps: float, size: Tuple[int, int], codec: str = 'libx264',
+                 preset: str = 'veryfast', crf: int = 23, threads: int = 0):
+        """
+        Inicializa el escritor
+
+        Args:
+            path: Video de salida
+            fps: FPS de salida
+            size: (ancho, alto) de los frames
+            codec: Códec de ffmpeg (libx264, libx265, mpeg4...)
+            preset: Preset de libx264/libx265
+            crf: Calidad constante de libx264/libx265 (menor = mejor y más grande)
+            threads: Hilos de codificación (0 = automático)
+        """
+        self.path = path
+        self.size = (int(size[0]), int(size[1]))
+        self._shape = (self.size[1], self.size[0], 3)
+        command = [ffmpeg_binary(), '-nostdin', '-loglevel', 'error', '-y',
+                   '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f"{self.size[0]}x{self.size[1]}",
+                   '-r', f"{fps:.6f}", '-i', '-', '-an', '-c:v', codec]
+        if codec in _CRF_CODECS:
+            command += ['-preset', preset, '-crf', str(crf)]
+        command += ['-pix_fmt', 'yuv420p', '-threads', str(threads)]
+        if os.path.splitext(path)[1].lower() in _FASTSTART_EXTENSIONS:
+            command += ['-movflags', '+faststart']
+        command.append(path)
+        self._process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0)
+        self._stderr = _StderrTail(self._process.stderr)
+
+    def isOpened(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def write(self, frame: np.ndarray) -> None:
+        """
+        Envía un frame a ffmpeg
+
+        Raises:
+            ValueError: Si el frame no tiene el tamaño del video
+            RuntimeError: Si ffmpeg terminó antes de tiempo
+        """
+        if frame.shape != self._shape or frame.dtype != np.uint8:
+            raise ValueError(f"Frame {frame.shape} {frame.dtype}; se esperaba {self._shape} uint8")
+        try:
+            self._process.stdin.write(memoryview(np.ascontiguousarray(frame)).cast('B'))
+        except BrokenPipeError:
+            self._process.wait()
+            raise RuntimeError(f"❌ ffmpeg terminó al escribir {self.path}: {self._stderr.text()}")
+
+    def release(self) -> None:
+        """
+        Cierra la tubería y espera a que ffmpeg termine de codificar
+
+        Raises:
+            RuntimeError: Si ffmpeg terminó con error
+        """
+        if self._process is None:
+            return
+        process, self._process = self._process, None
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        if process.wait() != 0:
+            raise RuntimeError(f"❌ ffmpeg no pudo escribir {self.path}: {self._stderr.text()}")
+
+
+def open_video_reader(path: str, config: Optional[Dict[str, Any]] = None, pool_size: int = 2) -> Any:
+    """
+    Abre un video para lectura con el backend de ``video.io_backend``
+
+    Args:
+        path: Video de entrada
+        config: Configuración del proyecto (secciones 'video' y 'ffmpeg')
+        pool_size: Con ffmpeg, frames que pueden estar vivos a la vez
+
+    Returns:
+        cv2.VideoCapture o FFmpegReader
+    """
+    if resolve_io_backend(config) == 'opencv':
+        return cv2.VideoCapture(path)
+    settings = (config or {}).get('ffmpeg') or {}
+    return FFmpegReader(path, pool_size=pool_size, threads=settings.get('decode_threads', 0))
+
+
+def open_video_writer(path: str, fps: float, size: Tuple[int, int],
+                      config: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    Abre un video para escritura con el backend de ``video.io_backend``
+
+    Args:
+        path: Video de salida
+        fps: FPS de salida
+        size: (ancho, alto)
+        config: Configuración del proyecto (secciones 'video' y 'ffmpeg')
+
+    Returns:
+        cv2.VideoWriter (mp4v) o FFmpegWriter
+    """
+    if resolve_io_backend(config) == 'opencv':
+        return cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    settings = (config or {}).get('ffmpeg') or {}
+    return FFmpegWriter(path, fps, size, codec=settings.get('codec', 'libx264'),
+                        preset=settings.get('preset', 'veryfast'), crf=settings.get('crf', 23),
+                        threads=settings.get('encode_threads', 0))
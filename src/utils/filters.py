@@ -0,0 +1,130 @@
+"""
+Filtros de detecciones - Nopal Detector
+Descarta falsos positivos por tamaño y proporción con una sola pasada de
+NumPy sobre todas las cajas del frame
+"""
+
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from ultralytics.engine.results import Results
+
+from utils.box_ops import _to_numpy
+
+# camera: CameraDetector; video: NopalPersonDetector (video e imágenes); multi_class: MultiClassDetector
+PIPELINES = ('camera', 'video', 'multi_class')
+
+
+class SizeFilter:
+    """
+    Filtro vectorizado de tamaño y relación de aspecto.
+
+    Una caja se conserva si ocupa como máximo ``max_area_ratio`` del frame,
+    mide al menos ``min_width`` x ``min_height`` píxeles y su relación
+    ancho/alto está en [``min_aspect``, ``max_aspect``].
+    """
+
+    def __init__(self, max_area_ratio: float = 1.0, min_width: int = 30, min_height: int = 30,
+                 min_aspect: float = 0.25, max_aspect: float = 4.0,
+                 classes: Optional[Sequence[int]] = None, enabled: bool = True):
+        """
+        Inicializa el filtro
+
+        Args:
+            max_area_ratio: Fracción máxima del frame (1.0 = sin límite; los nopales sobre
+                personas los resuelve ``PersonOverlapSuppressor``)
+            min_width: Ancho mínimo en píxeles (ruido)
+            min_height: Alto mínimo en píxeles
+            min_aspect: Relación ancho/alto mínima
+            max_aspect: Relación ancho/alto máxima (nopales no son muy alargados)
+            classes: Clases a las que se aplica (None = todas)
+            enabled: Activar el filtro
+        """
+        self.max_area_ratio = max_area_ratio
+        self.min_width = min_width
+        self.min_height = min_height
+        self.min_aspect = min_aspect
+        self.max_aspect = max_aspect
+        self.classes = np.asarray(classes, dtype=np.int64) if classes is not None else None
+        self.enabled = enabled
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], pipeline: str) -> 'SizeFilter':
+        """
+        Crea el filtro a partir de la sección 'filters' de la configuración
+
+        Args:
+            config: Configuración completa del proyecto
+            pipeline: 'camera', 'video' o 'multi_class'; el filtro se activa si
+                aparece en ``filters.apply_to``
+        """
+        if pipeline not in PIPELINES:
+            raise ValueError(f"Pipeline no soportado: {pipeline}. Opciones: {PIPELINES}")
+        settings = (config or {}).get('filters') or {}
+        return cls(
+            max_area_ratio=settings.get('max_area_ratio', 1.0),
+            min_width=settings.get('min_width', 30),
+            min_height=settings.get('min_height', 30),
+            min_aspect=settings.get('min_aspect', 0.25),
+            max_aspect=settings.get('max_aspect', 4.0),
+            classes=settings.get('classes'),
+            enabled=pipeline in settings.get('apply_to', ['camera']),
+        )
+
+    def mask(self, boxes: np.ndarray, frame_shape: Tuple[int, ...],
+             classes: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Máscara de cajas conservadas
+
+        Args:
+            boxes: Array (N, 4) xyxy
+            frame_shape: Forma del frame (alto, ancho, ...)
+            classes: Clase de cada caja (para limitar el filtro con ``classes``)
+
+        Returns:
+            np.ndarray: Máscara booleana (N,)
+        """
+        boxes = np.asarray(boxes).astype(np.int32)
+        width = boxes[:, 2] - boxes[:, 0]
+        height = boxes[:, 3] - boxes[:, 1]
+        area_ratio = width * height / float(frame_shape[0] * frame_shape[1])
+        aspect = width / np.maximum(height, 1)
+
+        keep = ((area_ratio <= self.max_area_ratio)
+                & (width >= self.min_width) & (height >= self.min_height)
+                & (aspect >= self.min_aspect) & (aspect <= self.max_aspect))
+        if self.classes is not None and classes is not None:
+            keep |= ~np.isin(np.asarray(classes).astype(np.int64), self.classes)
+        return keep
+
+    def apply(self, detections: np.ndarray, frame_shape: Tuple[int, ...],
+              ids: Optional[np.ndarray] = None) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Filtra un array (N, 6) [x1, y1, x2, y2, conf, cls] y sus IDs
+
+        Returns:
+            Tuple: (detecciones conservadas, IDs conservados o None)
+        """
+        if not self.enabled or len(detections) == 0:
+            return detections, ids
+        keep = self.mask(detections[:, :4], frame_shape, detections[:, 5])
+        return detections[keep], (ids[keep] if ids is not None else None)
+
+    def filter_result(self, result: Any) -> Any:
+        """
+        Filtra un resultado de YOLO conservando todas sus columnas (IDs incluidos)
+
+        Args:
+            result: Resultado de YOLO
+
+        Returns:
+            Results: El mismo resultado si no hay nada que filtrar, o uno nuevo
+        """
+        if not self.enabled or result is None or result.boxes is None or len(result.boxes) == 0:
+            return result
+        data = np.asarray(_to_numpy(result.boxes.data))
+        frame_shape = getattr(result, 'orig_shape', None) or result.orig_img.shape[:2]
+        keep = self.mask(data[:, :4], frame_shape, data[:, -1])
+        if keep.all():
+            return result
+        return Results(result.orig_img, path=result.path, names=result.names, boxes=data[keep])
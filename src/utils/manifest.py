@@ -0,0 +1,217 @@
+"""
+Manifiesto de trabajos batch - Nopal Detector
+Registro JSONL de solo-anexado con las imágenes ya procesadas, para que una
+ejecución interrumpida continúe donde se quedó
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = "manifest.jsonl"
+
+
+def weights_fingerprint(weights_path: Optional[str], chunk_size: int = 1 << 20) -> str:
+    """
+    Hash del contenido de unos pesos (o de su nombre si no existen en disco)
+
+    Args:
+        weights_path: Ruta de los pesos
+        chunk_size: Tamaño de lectura
+
+    Returns:
+        str: Hash SHA-1 en hexadecimal
+    """
+    digest = hashlib.sha1()
+    if weights_path and os.path.isfile(weights_path):
+        with open(weights_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+    else:
+        digest.update(str(weights_path).encode())
+    return digest.hexdigest()
+
+
+class BatchManifest:
+    """
+    Checkpoint de un trabajo batch en formato JSONL.
+
+    Cada línea registra una imagen procesada con su tamaño, fecha de
+    modificación, hash del modelo y parámetros de inferencia. Una imagen se
+    omite en la siguiente ejecución solo si todos coinciden, de modo que
+    cambiar los pesos, el umbral o la imagen invalida únicamente esas entradas.
+    """
+
+    def __init__(self, path: str, model_hash: str, params: Dict[str, Any],
+                 root: Optional[str] = None):
+        """
+        Inicializa el manifiesto y carga las entradas existentes
+
+        Args:
+            path: Ruta del archivo JSONL
+            model_hash: Hash de los pesos usados (ver ``weights_fingerprint``)
+            params: Parámetros que afectan a los resultados (umbral, tiles...)
+            root: Directorio de entrada; se guarda la ruta relativa a él para
+                combinar manifiestos de máquinas con distintos puntos de montaje
+        """
+        self.path = path
+        self.model_hash = model_hash
+        self.params = params
+        self.root = root
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._file = None
+        self._lock = threading.Lock()
+        self._load()
+
+    def __enter__(self) -> 'BatchManifest':
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        needs_newline = False
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            with open(self.path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b'\n'
+        self._file = open(self.path, 'a', encoding='utf-8')
+        if needs_newline:
+            # Cerrar la línea truncada para que la siguiente entrada sea válida
+            self._file.write('\n')
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Cierra el archivo del manifiesto"""
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def is_done(self, image_path: str) -> bool:
+        """
+        Indica si la imagen ya se procesó con el mismo modelo y parámetros
+
+        Args:
+            image_path: Ruta de la imagen
+
+        Returns:
+            bool: True si puede omitirse
+        """
+        entry = self.entries.get(os.path.abspath(image_path))
+        if not entry or entry.get('status') != 'ok':
+            return False
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return False
+        return (entry.get('size') == stat.st_size
+                and entry.get('mtime') == stat.st_mtime
+                and entry.get('model_hash') == self.model_hash
+                and entry.get('params') == self.params)
+
+    def pending(self, image_paths: Iterable[str]) -> List[str]:
+        """Filtra las imágenes que aún deben procesarse"""
+        return [p for p in image_paths if not self.is_done(p)]
+
+    def record(self, image_path: str, result: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Añade una entrada al manifiesto (se escribe y vacía de inmediato)
+
+        Es seguro llamarlo desde los hilos de escritura de salidas.
+
+        Args:
+            image_path: Ruta de la imagen
+            result: Resultado de la predicción ({} o None si falló)
+        """
+        try:
+            stat = os.stat(image_path)
+            size, mtime = stat.st_size, stat.st_mtime
+        except OSError:
+            size, mtime = None, None
+
+        detections = (result or {}).get('detections', [])
+        if hasattr(detections, 'class_counts'):
+            counts = detections.class_counts()
+        else:
+            counts: Dict[str, int] = {}
+            for det in detections:
+                counts[det['class']] = counts.get(det['class'], 0) + 1
+        # Detecciones compactas: permiten combinar los resultados de varios shards
+        compact = [{'class': det['class'], 'confidence': round(det['confidence'], 4), 'bbox': det['bbox']}
+                   for det in detections]
+
+        entry = {
+            'path': os.path.abspath(image_path),
+            'rel': Path(os.path.relpath(image_path, self.root)).as_posix() if self.root else None,
+            'size': size,
+            'mtime': mtime,
+            'model_hash': self.model_hash,
+            'params': self.params,
+            'status': 'ok' if result else 'error',
+            'counts': counts,
+            'detections': compact,
+            'time': time.time(),
+        }
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock:
+            if self._file is None:
+                raise RuntimeError("El manifiesto no está abierto (usar 'with BatchManifest(...)')")
+            self.entries[entry['path']] = entry
+            self._file.write(line)
+            self._file.flush()
+
+    def class_counts(self, image_paths: Iterable[str]) -> Dict[str, int]:
+        """
+        Suma los conteos por clase registrados para las imágenes indicadas
+
+        Args:
+            image_paths: Rutas de las imágenes
+
+        Returns:
+            Dict: Conteo total por clase
+        """
+        totals: Dict[str, int] = {}
+        for image_path in image_paths:
+            entry = self.entries.get(os.path.abspath(image_path))
+            for class_name, count in (entry or {}).get('counts', {}).items():
+                totals[class_name] = totals.get(class_name, 0) + count
+        return totals
+
+    def _load(self) -> None:
+        """Lee el manifiesto existente"""
+        self.entries = read_manifest(self.path)
+
+
+def read_manifest(path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Lee un manifiesto JSONL; la última entrada de cada imagen prevalece
+
+    Args:
+        path: Ruta del archivo JSONL
+
+    Returns:
+        Dict: Entradas por ruta absoluta de imagen ({} si no existe)
+    """
+    entries: Dict[str, Dict[str, Any]] = {}
+    if not os.path.exists(path):
+        return entries
+    skipped = 0
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # Línea truncada por una interrupción a mitad de escritura
+                skipped += 1
+                continue
+            entries[entry['path']] = entry
+    if skipped:
+        logger.warning("⚠️ %d líneas corruptas ignoradas en %s", skipped, path)
+    return entries
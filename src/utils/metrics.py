@@ -0,0 +1,160 @@
+"""
+Métricas de detección - Nopal Detector
+Carga de etiquetas YOLO y cálculo de mAP@0.5 en NumPy
+"""
+
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from utils.box_ops import box_iou
+
+# np.trapz fue renombrado a np.trapezoid en NumPy 2.0
+_trapezoid = getattr(np, 'trapezoid', None) or np.trapz
+
+
+def load_yolo_labels(label_path: str, image_shape: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Lee un archivo de etiquetas YOLO (cls cx cy w h normalizados)
+
+    Args:
+        label_path: Ruta del archivo .txt
+        image_shape: (alto, ancho) de la imagen
+
+    Returns:
+        Tuple: (clases (M,), cajas xyxy en píxeles (M, 4))
+    """
+    if not os.path.exists(label_path):
+        return np.zeros(0, dtype=np.int64), np.zeros((0, 4), dtype=np.float32)
+
+    rows = np.loadtxt(label_path, ndmin=2, dtype=np.float32)
+    if rows.size == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, 4), dtype=np.float32)
+
+    # Ignorar columnas extra (p. ej. polígonos de segmentación)
+    rows = rows[:, :5]
+    height, width = image_shape
+    cx, cy = rows[:, 1] * width, rows[:, 2] * height
+    w, h = rows[:, 3] * width, rows[:, 4] * height
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+    return rows[:, 0].astype(np.int64), boxes
+
+
+def average_precision(recall: np.ndarray, precision: np.ndarray) -> float:
+    """
+    AP como área bajo la curva precisión-recall interpolada (101 puntos, estilo COCO)
+
+    Args:
+        recall: Recall acumulado
+        precision: Precisión acumulada
+
+    Returns:
+        float: Average precision
+    """
+    recall = np.concatenate(([0.0], recall, [1.0]))
+    precision = np.concatenate(([1.0], precision, [0.0]))
+    precision = np.flip(np.maximum.accumulate(np.flip(precision)))
+    points = np.linspace(0, 1, 101)
+    return float(_trapezoid(np.interp(points, recall, precision), points))
+
+
+def match_predictions(preds: np.ndarray, gt_cls: np.ndarray, gt_boxes: np.ndarray,
+                      iou_threshold: float = 0.5) -> np.ndarray:
+    """
+    Marca los verdaderos positivos de una imagen (asignación greedy por confianza)
+
+    Como la asignación recorre las predicciones de mayor a menor confianza,
+    el resultado para un umbral de confianza más alto es el mismo filtrado
+    por ese umbral: basta con emparejar una vez al umbral más bajo.
+
+    Args:
+        preds: Array (N, 6) [x1, y1, x2, y2, conf, cls]
+        gt_cls: Clases de las etiquetas (M,)
+        gt_boxes: Cajas xyxy de las etiquetas (M, 4)
+        iou_threshold: IoU mínimo para contar un verdadero positivo
+
+    Returns:
+        np.ndarray: Máscara (N,) de verdaderos positivos, en el orden de ``preds``
+    """
+    hits = np.zeros(len(preds), dtype=bool)
+    if len(preds) == 0 or len(gt_cls) == 0:
+        return hits
+
+    order = np.argsort(-preds[:, 4], kind='stable')
+    pred_cls = preds[order, 5].astype(np.int64)
+    ious = box_iou(preds[order, :4], gt_boxes)
+    ious[pred_cls[:, None] != gt_cls[None, :]] = 0.0
+    matched = np.zeros(len(gt_cls), dtype=bool)
+    # Asignación greedy por confianza descendente
+    for i in range(len(order)):
+        candidates = np.where(~matched & (ious[i] >= iou_threshold))[0]
+        if candidates.size:
+            j = candidates[ious[i, candidates].argmax()]
+            matched[j] = True
+            hits[order[i]] = True
+    return hits
+
+
+def ap_per_class(scores: np.ndarray, classes: np.ndarray, true_positive: np.ndarray,
+                 gt_counts: np.ndarray) -> Dict[int, float]:
+    """
+    AP de cada clase con etiquetas a partir de predicciones ya emparejadas
+
+    Args:
+        scores: Confianza de cada predicción
+        classes: Clase de cada predicción
+        true_positive: Máscara de verdaderos positivos
+        gt_counts: Etiquetas por clase
+
+    Returns:
+        Dict: {clase: ap} (solo clases con etiquetas)
+    """
+    result = {}
+    for class_id in range(len(gt_counts)):
+        if gt_counts[class_id] == 0:
+            continue
+        mask = classes == class_id
+        if not mask.any():
+            result[class_id] = 0.0
+            continue
+        order = np.argsort(-scores[mask], kind='stable')
+        tp = true_positive[mask][order]
+        tp_cum = np.cumsum(tp)
+        fp_cum = np.cumsum(~tp)
+        recall = tp_cum / gt_counts[class_id]
+        precision = tp_cum / np.maximum(tp_cum + fp_cum, 1)
+        result[class_id] = average_precision(recall, precision)
+    return result
+
+
+def map50(predictions: List[np.ndarray], ground_truths: List[Tuple[np.ndarray, np.ndarray]],
+          num_classes: int, iou_threshold: float = 0.5) -> Dict[str, object]:
+    """
+    Calcula mAP@0.5 sobre un conjunto de imágenes
+
+    Args:
+        predictions: Por imagen, array (N, 6) [x1, y1, x2, y2, conf, cls]
+        ground_truths: Por imagen, tupla (clases (M,), cajas xyxy (M, 4))
+        num_classes: Número de clases
+        iou_threshold: IoU mínimo para contar un verdadero positivo
+
+    Returns:
+        Dict: {'map50': float, 'ap50_per_class': {clase: ap}}
+    """
+    scores, classes, true_positive = [np.zeros(0, dtype=np.float32)], [np.zeros(0, dtype=np.int64)], \
+        [np.zeros(0, dtype=bool)]
+    gt_counts = np.zeros(num_classes, dtype=np.int64)
+
+    for preds, (gt_cls, gt_boxes) in zip(predictions, ground_truths):
+        gt_counts += np.bincount(gt_cls, minlength=num_classes)[:num_classes]
+        if len(preds) == 0:
+            continue
+        scores.append(preds[:, 4])
+        classes.append(preds[:, 5].astype(np.int64))
+        true_positive.append(match_predictions(preds, gt_cls, gt_boxes, iou_threshold))
+
+    aps = ap_per_class(np.concatenate(scores), np.concatenate(classes),
+                       np.concatenate(true_positive), gt_counts)
+    mean_ap = float(np.mean(list(aps.values()))) if aps else 0.0
+    return {'map50': mean_ap, 'ap50_per_class': aps}
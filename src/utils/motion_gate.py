@@ -0,0 +1,151 @@
+"""
+Compuerta de movimiento - Nopal Detector
+Decide si un frame cambió lo suficiente como para volver a ejecutar los
+modelos o si pueden reutilizarse las últimas detecciones
+"""
+
+from typing import Any, Dict, Optional
+
+import cv2
+import numpy as np
+
+MOTION_METHODS = ('diff', 'mog2')
+
+
+class MotionGate:
+    """
+    Detecta cambios de escena sobre una versión reducida del frame.
+
+    Con ``method='diff'`` se compara contra el último frame en el que se
+    ejecutó inferencia (no contra el anterior), de modo que los cambios
+    lentos se acumulan hasta superar el umbral. Con ``method='mog2'`` se usa
+    un sustractor de fondo, más robusto a ruido del sensor pero más costoso.
+    """
+
+    def __init__(self, threshold: float = 0.01, pixel_threshold: int = 25,
+                 downscale_width: int = 160, refresh_interval: int = 30,
+                 method: str = 'diff', enabled: bool = True):
+        """
+        Inicializa la compuerta
+
+        Args:
+            threshold: Fracción de píxeles cambiados a partir de la cual se infiere
+            pixel_threshold: Diferencia de intensidad (0-255) para contar un píxel como cambiado
+            downscale_width: Ancho de la imagen reducida usada para comparar
+            refresh_interval: Forzar inferencia cada N frames (0 = nunca)
+            method: 'diff' (diferencia de frames) o 'mog2' (sustractor de fondo)
+            enabled: Si False, siempre se infiere
+        """
+        if method not in MOTION_METHODS:
+            raise ValueError(f"Método de movimiento no soportado: {method}. Opciones: {MOTION_METHODS}")
+
+        self.threshold = threshold
+        self.pixel_threshold = pixel_threshold
+        self.downscale_width = downscale_width
+        self.refresh_interval = refresh_interval
+        self.method = method
+        self.enabled = enabled
+
+        self._reference: Optional[np.ndarray] = None
+        self._subtractor = None
+        self._since_inference = 0
+        self.last_change = 0.0
+        self.frames = 0
+        self.skipped = 0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> 'MotionGate':
+        """
+        Crea la compuerta a partir de la sección 'motion' de la configuración
+
+        Args:
+            config: Configuración completa del proyecto
+
+        Returns:
+            MotionGate: Compuerta configurada (desactivada si no hay sección)
+        """
+        motion_config = config.get('motion') or {}
+        return cls(
+            threshold=motion_config.get('threshold', 0.01),
+            pixel_threshold=motion_config.get('pixel_threshold', 25),
+            downscale_width=motion_config.get('downscale_width', 160),
+            refresh_interval=motion_config.get('refresh_interval', 30),
+            method=motion_config.get('method', 'diff'),
+            enabled=motion_config.get('enabled', False),
+        )
+
+    def should_infer(self, frame: np.ndarray) -> bool:
+        """
+        Indica si hay que ejecutar los modelos sobre el frame
+
+        Args:
+            frame: Frame BGR
+
+        Returns:
+            bool: True si el frame cambió, toca refresco forzado o no hay referencia
+        """
+        self.frames += 1
+        if not self.enabled:
+            return True
+
+        small = self._preprocess(frame)
+        self.last_change = self._change_ratio(small)
+
+        refresh_due = self.refresh_interval and self._since_inference + 1 >= self.refresh_interval
+        if self._reference is None or self.last_change >= self.threshold or refresh_due:
+            self._reference = small
+            self._since_inference = 0
+            return True
+
+        self._since_inference += 1
+        self.skipped += 1
+        return False
+
+    def reset(self) -> None:
+        """Olvida la referencia y los contadores (p. ej. al empezar otro video)"""
+        self._reference = None
+        self._subtractor = None
+        self._since_inference = 0
+        self.last_change = 0.0
+        self.frames = 0
+        self.skipped = 0
+
+    @property
+    def skip_ratio(self) -> float:
+        """Fracción de frames en los que se reutilizaron detecciones"""
+        return self.skipped / self.frames if self.frames else 0.0
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de la compuerta"""
+        return {
+            'frames': self.frames,
+            'inferred': self.frames - self.skipped,
+            'skipped': self.skipped,
+            'skip_ratio': self.skip_ratio,
+        }
+
+    def _preprocess(self, frame: np.ndarray) -> np.ndarray:
+        """Reduce, pasa a escala de grises y suaviza el frame"""
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.downscale_width / width)
+        small = cv2.resize(frame, (max(1, int(width * scale)), max(1, int(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def _change_ratio(self, small: np.ndarray) -> float:
+        """Fracción de píxeles que cambiaron respecto a la referencia o el fondo"""
+        if self.method == 'mog2':
+            if self._subtractor is None:
+                self._subtractor = cv2.createBackgroundSubtractorMOG2(
+                    history=max(self.refresh_interval, 50), detectShadows=False
+                )
+            mask = self._subtractor.apply(small)
+            return float(np.count_nonzero(mask)) / mask.size
+
+        if self._reference is None or self._reference.shape != small.shape:
+            return 1.0
+        diff = cv2.absdiff(small, self._reference)
+        return float(np.count_nonzero(diff > self.pixel_threshold)) / diff.size
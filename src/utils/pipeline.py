@@ -0,0 +1,231 @@
+"""
+Pipeline por etapas - Nopal Detector
+Ejecuta etapas (fuente → transformaciones → destino) en hilos separados
+conectados por colas acotadas, midiendo profundidad de cola y tiempos de espera
+"""
+
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+# Marca de fin de flujo que recorre todas las etapas
+_END = object()
+
+# Intervalo para revisar la señal de parada mientras se espera en una cola
+_POLL_INTERVAL = 0.1
+
+
+@dataclass
+class StageStats:
+    """Estadísticas de una etapa del pipeline"""
+    name: str
+    items: int = 0
+    busy_time: float = 0.0      # Tiempo procesando elementos
+    starved_time: float = 0.0   # Tiempo esperando entrada (etapa anterior lenta)
+    blocked_time: float = 0.0   # Tiempo esperando espacio en la salida (etapa siguiente lenta)
+    depth_sum: int = 0
+    depth_samples: int = 0
+    max_depth: int = 0
+
+    @property
+    def avg_depth(self) -> float:
+        """Profundidad media de la cola de entrada"""
+        return self.depth_sum / self.depth_samples if self.depth_samples else 0.0
+
+    def sample_depth(self, depth: int) -> None:
+        """Registra una muestra de profundidad de la cola de entrada"""
+        self.depth_sum += depth
+        self.depth_samples += 1
+        self.max_depth = max(self.max_depth, depth)
+
+
+class StagedPipeline:
+    """
+    Pipeline de etapas con un hilo por etapa y colas acotadas entre ellas.
+
+    Cada etapa tiene un único worker y las colas son FIFO, por lo que los
+    elementos llegan al destino en el mismo orden en que los produjo la fuente.
+
+    Example:
+        >>> pipeline = StagedPipeline(queue_size=4)
+        >>> pipeline.set_source("decode", frames_generator())
+        >>> pipeline.add_stage("infer", run_model)
+        >>> pipeline.set_sink("encode", writer.write)
+        >>> stats = pipeline.run()
+    """
+
+    def __init__(self, queue_size: int = 4):
+        """
+        Inicializa el pipeline
+
+        Args:
+            queue_size: Capacidad de cada cola entre etapas
+        """
+        self.queue_size = max(1, queue_size)
+        self._source_name = None
+        self._source = None
+        self._stages: List[tuple] = []
+        self._sink_name = None
+        self._sink = None
+        self._stop = threading.Event()
+        self._errors: List[BaseException] = []
+        self.stats: Dict[str, StageStats] = {}
+
+    def set_source(self, name: str, iterable: Iterable[Any]) -> 'StagedPipeline':
+        """Define la etapa fuente (se itera en su propio hilo)"""
+        self._source_name = name
+        self._source = iterable
+        return self
+
+    def add_stage(self, name: str, func: Callable[[Any], Any]) -> 'StagedPipeline':
+        """Agrega una etapa de transformación elemento → elemento"""
+        self._stages.append((name, func))
+        return self
+
+    def set_sink(self, name: str, func: Callable[[Any], None]) -> 'StagedPipeline':
+        """Define la etapa destino que consume cada elemento"""
+        self._sink_name = name
+        self._sink = func
+        return self
+
+    def run(self) -> Dict[str, StageStats]:
+        """
+        Ejecuta el pipeline hasta agotar la fuente
+
+        Returns:
+            Dict: Estadísticas por etapa, en orden de ejecución
+
+        Raises:
+            ValueError: Si falta la fuente o el destino
+            Exception: La primera excepción lanzada por cualquier etapa
+        """
+        if self._source is None or self._sink is None:
+            raise ValueError("El pipeline requiere fuente y destino")
+
+        names = [self._source_name] + [name for name, _ in self._stages] + [self._sink_name]
+        self.stats = {name: StageStats(name) for name in names}
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(names) - 1)]
+
+        threads = [threading.Thread(
+            target=self._guard, args=(self._run_source, queues[0]),
+            name=self._source_name, daemon=True
+        )]
+        for i, (name, func) in enumerate(self._stages):
+            threads.append(threading.Thread(
+                target=self._guard, args=(self._run_stage, name, func, queues[i], queues[i + 1]),
+                name=name, daemon=True
+            ))
+        threads.append(threading.Thread(
+            target=self._guard, args=(self._run_sink, queues[-1]),
+            name=self._sink_name, daemon=True
+        ))
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if self._errors:
+            raise self._errors[0]
+        return self.stats
+
+    def log_stats(self) -> None:
+        """Registra el reporte de etapas e indica el posible cuello de botella"""
+        if not self.stats:
+            return
+
+        logger.info("📊 Etapas del pipeline:")
+        logger.info("   %-10s %8s %9s %9s %9s %7s %5s",
+                    "etapa", "items", "ocupado", "sin_ent.", "bloq.", "cola", "max")
+        for stage in self.stats.values():
+            logger.info("   %-10s %8d %8.2fs %8.2fs %8.2fs %7.2f %5d",
+                        stage.name, stage.items, stage.busy_time, stage.starved_time,
+                        stage.blocked_time, stage.avg_depth, stage.max_depth)
+
+        bottleneck = max(self.stats.values(), key=lambda s: s.busy_time)
+        logger.info("🐢 Cuello de botella probable: %s", bottleneck.name)
+
+    def _guard(self, target: Callable, *args) -> None:
+        """Ejecuta una etapa y detiene todo el pipeline si falla"""
+        try:
+            target(*args)
+        except BaseException as e:
+            self._errors.append(e)
+            self._stop.set()
+
+    def _put(self, q: queue.Queue, item: Any, stats: StageStats) -> bool:
+        """Encola respetando la señal de parada; registra el tiempo bloqueado"""
+        start = time.perf_counter()
+        try:
+            while not self._stop.is_set():
+                try:
+                    q.put(item, timeout=_POLL_INTERVAL)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            stats.blocked_time += time.perf_counter() - start
+
+    def _get(self, q: queue.Queue, stats: StageStats) -> Any:
+        """Desencola respetando la señal de parada; registra el tiempo sin entrada"""
+        stats.sample_depth(q.qsize())
+        start = time.perf_counter()
+        try:
+            while not self._stop.is_set():
+                try:
+                    return q.get(timeout=_POLL_INTERVAL)
+                except queue.Empty:
+                    continue
+            return _END
+        finally:
+            stats.starved_time += time.perf_counter() - start
+
+    def _run_source(self, q_out: queue.Queue) -> None:
+        """Itera la fuente y envía cada elemento a la primera cola"""
+        stats = self.stats[self._source_name]
+        iterator = iter(self._source)
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                stats.busy_time += time.perf_counter() - start
+            stats.items += 1
+            if not self._put(q_out, item, stats):
+                return
+        self._put(q_out, _END, stats)
+
+    def _run_stage(self, name: str, func: Callable, q_in: queue.Queue, q_out: queue.Queue) -> None:
+        """Aplica la transformación a cada elemento de la cola de entrada"""
+        stats = self.stats[name]
+        while True:
+            item = self._get(q_in, stats)
+            if item is _END:
+                break
+            start = time.perf_counter()
+            result = func(item)
+            stats.busy_time += time.perf_counter() - start
+            stats.items += 1
+            if not self._put(q_out, result, stats):
+                return
+        self._put(q_out, _END, stats)
+
+    def _run_sink(self, q_in: queue.Queue) -> None:
+        """Consume los elementos de la última cola"""
+        stats = self.stats[self._sink_name]
+        while True:
+            item = self._get(q_in, stats)
+            if item is _END:
+                break
+            start = time.perf_counter()
+            self._sink(item)
+            stats.busy_time += time.perf_counter() - start
+            stats.items += 1
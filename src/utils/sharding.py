@@ -0,0 +1,136 @@
+"""
+Reparto de trabajos batch entre máquinas - Nopal Detector
+Asigna cada imagen a un shard con un hash estable de su ruta relativa, sin
+coordinador, y combina los manifiestos de todos los shards en un informe
+"""
+
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+
+from utils.manifest import MANIFEST_FILENAME, read_manifest
+
+logger = logging.getLogger(__name__)
+
+_SHARD_PATTERN = re.compile(r'manifest\.shard-(\d+)-of-(\d+)\.jsonl$')
+
+
+def shard_of(relative_path: str, shard_count: int) -> int:
+    """
+    Shard al que pertenece una ruta
+
+    El hash (SHA-1 de la ruta en formato POSIX) no depende del proceso, del
+    sistema operativo ni del orden del listado del directorio.
+
+    Args:
+        relative_path: Ruta relativa al directorio de entrada
+        shard_count: Número total de shards
+
+    Returns:
+        int: Índice de shard en [0, shard_count)
+    """
+    key = Path(relative_path).as_posix().encode('utf-8')
+    return int.from_bytes(hashlib.sha1(key).digest()[:8], 'big') % shard_count
+
+
+def select_shard(paths: Iterable[Any], root: str, shard_index: int, shard_count: int) -> List[Any]:
+    """
+    Filtra las rutas que corresponden a un shard
+
+    Args:
+        paths: Rutas de las imágenes (str o Path)
+        root: Directorio de entrada (base de las rutas relativas)
+        shard_index: Índice de este shard
+        shard_count: Número total de shards
+
+    Returns:
+        List: Rutas asignadas a este shard, en el orden original
+    """
+    if shard_count < 1 or not 0 <= shard_index < shard_count:
+        raise ValueError(f"Shard inválido: {shard_index}/{shard_count} (se requiere 0 <= índice < total)")
+    return [p for p in paths if shard_of(os.path.relpath(p, root), shard_count) == shard_index]
+
+
+def manifest_filename(shard_index: int = 0, shard_count: int = 1) -> str:
+    """
+    Nombre del manifiesto de un shard (cada máquina escribe el suyo)
+
+    Returns:
+        str: 'manifest.jsonl' sin sharding, 'manifest.shard-I-of-N.jsonl' con él
+    """
+    if shard_count <= 1:
+        return MANIFEST_FILENAME
+    return f"manifest.shard-{shard_index}-of-{shard_count}.jsonl"
+
+
+def merge_shards(directory: str) -> Dict[str, Any]:
+    """
+    Combina los manifiestos de un directorio de salida en un único informe
+
+    Las imágenes se identifican por su ruta relativa, de modo que los shards
+    pueden haberse ejecutado con distintos puntos de montaje. Si una imagen
+    aparece en varios manifiestos prevalece la entrada más reciente.
+
+    Args:
+        directory: Directorio con los manifest*.jsonl
+
+    Returns:
+        Dict: Informe con totales por clase, detecciones por imagen y avisos
+    """
+    manifest_paths = sorted(glob.glob(os.path.join(directory, 'manifest*.jsonl')))
+    if not manifest_paths:
+        raise FileNotFoundError(f"No se encontraron manifiestos en {directory}")
+
+    warnings = []
+    found_shards: Dict[int, set] = {}
+    images: Dict[str, Dict[str, Any]] = {}
+    for manifest_path in manifest_paths:
+        match = _SHARD_PATTERN.search(os.path.basename(manifest_path))
+        if match:
+            found_shards.setdefault(int(match.group(2)), set()).add(int(match.group(1)))
+        for entry in read_manifest(manifest_path).values():
+            key = entry.get('rel') or entry['path']
+            if key not in images or entry.get('time', 0) >= images[key].get('time', 0):
+                images[key] = entry
+
+    for count, indices in found_shards.items():
+        missing = sorted(set(range(count)) - indices)
+        if missing:
+            warnings.append(f"Faltan los shards {missing} de {count}")
+
+    models = {e.get('model_hash') for e in images.values()}
+    params = {json.dumps(e.get('params'), sort_keys=True) for e in images.values()}
+    if len(models) > 1:
+        warnings.append(f"Los shards usaron {len(models)} modelos distintos")
+    if len(params) > 1:
+        warnings.append(f"Los shards usaron {len(params)} configuraciones de inferencia distintas")
+
+    total_detections_by_class: Dict[str, int] = {}
+    errors = []
+    detections = {}
+    for key in sorted(images):
+        entry = images[key]
+        if entry.get('status') != 'ok':
+            errors.append(key)
+            continue
+        detections[key] = entry.get('detections', [])
+        for class_name, count in entry.get('counts', {}).items():
+            total_detections_by_class[class_name] = total_detections_by_class.get(class_name, 0) + count
+
+    for warning in warnings:
+        logger.warning("⚠️ %s", warning)
+
+    return {
+        'manifests': [os.path.basename(p) for p in manifest_paths],
+        'images': len(images),
+        'successful': len(detections),
+        'errors': errors,
+        'total_detections_by_class': total_detections_by_class,
+        'detections': detections,
+        'warnings': warnings,
+    }
@@ -0,0 +1,211 @@
+"""
+Sidecar binario de detecciones - Nopal Detector
+Guarda las detecciones de un video en registros de ancho fijo con un índice
+por frame, para anotar después cualquier tramo sin volver a inferir
+"""
+
+import json
+import os
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b'NOPALDET'
+VERSION = 1
+SIDECAR_EXTENSION = '.dets'
+
+# magic, versión, tamaño de registro, frames, fps, ancho, alto,
+# offset del índice, offset de los metadatos, longitud de los metadatos
+HEADER = struct.Struct('<8sHHQdIIQQI')
+HEADER_SIZE = 64
+
+KIND_NOPAL = 0
+KIND_PERSON = 1
+
+# Un registro por caja (28 bytes); ``kind`` distingue nopales de personas
+RECORD = np.dtype([
+    ('x1', '<f4'), ('y1', '<f4'), ('x2', '<f4'), ('y2', '<f4'),
+    ('conf', '<f4'), ('cls', '<i2'), ('kind', 'u1'), ('flags', 'u1'),
+    ('track_id', '<i4'),
+])
+
+Resolved = Tuple[np.ndarray, Optional[np.ndarray], np.ndarray, Optional[np.ndarray]]
+
+
+def sidecar_path_for(video_path: str) -> str:
+    """Ruta por defecto del sidecar de un video (misma ruta, extensión .dets)"""
+    return os.path.splitext(video_path)[0] + SIDECAR_EXTENSION
+
+
+class SidecarWriter:
+    """
+    Escribe el sidecar frame a frame.
+
+    Los registros se añaden en orden al archivo y solo se guarda en memoria
+    el offset de cada frame; al cerrar se escriben el índice
+    (``frames + 1`` enteros de 64 bits) y los metadatos, y se completa la
+    cabecera. Un archivo sin cerrar se detecta al leerlo.
+    """
+
+    def __init__(self, path: str, fps: float, width: int, height: int,
+                 metadata: Optional[Dict[str, Any]] = None):
+        """
+        Inicializa el escritor
+
+        Args:
+            path: Archivo de salida (.dets)
+            fps: FPS del video de origen
+            width: Ancho del video
+            height: Alto del video
+            metadata: Datos extra en JSON (video de origen, nombres de clase...)
+        """
+        self.path = path
+        self.fps = float(fps)
+        self.width = int(width)
+        self.height = int(height)
+        self.metadata = dict(metadata or {})
+        self.frames = 0
+        self.records = 0
+        self._offsets: List[int] = [0]
+        self._file = None
+
+    def __enter__(self) -> 'SidecarWriter':
+        return self.open()
+
+    def open(self) -> 'SidecarWriter':
+        """Crea el archivo y reserva la cabecera (se completa en ``close``)"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._file = open(self.path, 'wb')
+        self._file.write(b'\0' * HEADER_SIZE)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def write_frame(self, nopales: np.ndarray, persons: np.ndarray,
+                    nopal_ids: Optional[np.ndarray] = None,
+                    person_ids: Optional[np.ndarray] = None) -> None:
+        """
+        Añade las detecciones del siguiente frame
+
+        Args:
+            nopales: Array (N, 6) [x1, y1, x2, y2, conf, cls]
+            persons: Array (M, 6) de personas
+            nopal_ids: IDs de seguimiento de los nopales (opcional)
+            person_ids: IDs de seguimiento de las personas (opcional)
+        """
+        count = len(nopales) + len(persons)
+        if count:
+            records = np.empty(count, dtype=RECORD)
+            for start, dets, ids, kind in ((0, nopales, nopal_ids, KIND_NOPAL),
+                                           (len(nopales), persons, person_ids, KIND_PERSON)):
+                if not len(dets):
+                    continue
+                rows = slice(start, start + len(dets))
+                for column, name in enumerate(('x1', 'y1', 'x2', 'y2', 'conf')):
+                    records[name][rows] = dets[:, column]
+                records['cls'][rows] = dets[:, 5]
+                records['kind'][rows] = kind
+                records['track_id'][rows] = ids if ids is not None else -1
+            records['flags'] = 0
+            self._file.write(records.tobytes())
+            self.records += count
+        self._offsets.append(self.records)
+        self.frames += 1
+
+    def close(self) -> None:
+        """Escribe índice, metadatos y cabecera"""
+        if self._file is None:
+            return
+        index_offset = HEADER_SIZE + self.records * RECORD.itemsize
+        self._file.write(np.asarray(self._offsets, dtype='<i8').tobytes())
+        meta = json.dumps(self.metadata, ensure_ascii=False).encode('utf-8')
+        meta_offset = self._file.tell()
+        self._file.write(meta)
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, VERSION, RECORD.itemsize, self.frames, self.fps,
+                                     self.width, self.height, index_offset, meta_offset, len(meta)))
+        self._file.close()
+        self._file = None
+
+
+class SidecarReader:
+    """
+    Acceso aleatorio a un sidecar mapeado en memoria.
+
+    Solo se leen la cabecera y los metadatos; los registros de un frame se
+    localizan con dos lecturas del índice, sin cargar el archivo entero.
+    """
+
+    def __init__(self, path: str):
+        """
+        Abre el sidecar
+
+        Args:
+            path: Archivo .dets
+
+        Raises:
+            ValueError: Si el archivo no es un sidecar válido o no se cerró
+        """
+        self.path = path
+        self._data = np.memmap(path, dtype=np.uint8, mode='r')
+        if len(self._data) < HEADER_SIZE:
+            raise ValueError(f"Sidecar inválido: {path}")
+        (magic, version, record_size, frames, fps, width, height,
+         index_offset, meta_offset, meta_len) = HEADER.unpack_from(self._data[:HEADER.size].tobytes())
+        if magic != MAGIC:
+            if magic == b'\0' * len(MAGIC):
+                raise ValueError(f"Sidecar incompleto (el proceso no terminó): {path}")
+            raise ValueError(f"Sidecar inválido: {path}")
+        if version != VERSION or record_size != RECORD.itemsize:
+            raise ValueError(f"Versión de sidecar no soportada ({version}): {path}")
+
+        self.frames = frames
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self.index = np.frombuffer(self._data, dtype='<i8', count=frames + 1, offset=index_offset)
+        self.records = np.frombuffer(self._data, dtype=RECORD, count=int(self.index[-1]),
+                                     offset=HEADER_SIZE)
+        self.metadata = json.loads(self._data[meta_offset:meta_offset + meta_len].tobytes() or b'{}')
+
+    def __len__(self) -> int:
+        return self.frames
+
+    def frame_at(self, seconds: float) -> int:
+        """Índice del frame en el segundo ``seconds`` (acotado al video)"""
+        frame = int(round(seconds * self.fps)) if self.fps else 0
+        return min(max(frame, 0), self.frames)
+
+    def frame(self, index: int) -> np.ndarray:
+        """Registros del frame ``index`` (vista de solo lectura sobre el archivo)"""
+        if not 0 <= index < self.frames:
+            raise IndexError(f"Frame fuera de rango: {index} (frames: {self.frames})")
+        return self.records[self.index[index]:self.index[index + 1]]
+
+    def detections(self, index: int, min_confidence: float = 0.0) -> Resolved:
+        """
+        Detecciones del frame en el formato de ``NopalPersonDetector._resolve_detections``
+
+        Args:
+            index: Índice del frame
+            min_confidence: Descartar registros por debajo de esta confianza
+
+        Returns:
+            Tuple: (nopales, IDs de nopales, personas, IDs de personas)
+        """
+        records = self.frame(index)
+        if min_confidence > 0:
+            records = records[records['conf'] >= min_confidence]
+        return self._split(records, KIND_NOPAL) + self._split(records, KIND_PERSON)
+
+    @staticmethod
+    def _split(records: np.ndarray, kind: int) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Registros de un tipo → (array (N, 6), IDs o None)"""
+        records = records[records['kind'] == kind]
+        dets = np.empty((len(records), 6), dtype=np.float32)
+        for column, name in enumerate(('x1', 'y1', 'x2', 'y2', 'conf', 'cls')):
+            dets[:, column] = records[name]
+        ids = records['track_id'].astype(np.int64)
+        return dets, (ids if len(ids) and (ids >= 0).all() else None)
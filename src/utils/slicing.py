@@ -0,0 +1,239 @@
+"""
+Inferencia por tiles - Nopal Detector
+Divide imágenes de alta resolución (dron, campo) en tiles solapados, los
+procesa por lotes y fusiona las cajas en coordenadas de la imagen completa
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import cv2
+import numpy as np
+from ultralytics.engine.results import Results
+
+from utils.box_ops import box_ios, box_iou, result_to_detections
+
+MERGE_METHODS = ('nms', 'wbf')
+MATCH_METRICS = ('ios', 'iou')
+
+
+def tile_windows(height: int, width: int, tile_size: int, overlap: float) -> np.ndarray:
+    """
+    Ventanas de tiles que cubren la imagen con el solape indicado
+
+    El último tile de cada fila/columna se alinea con el borde, de modo que
+    todos tienen el mismo tamaño (salvo si la imagen es menor que un tile).
+
+    Args:
+        height: Alto de la imagen
+        width: Ancho de la imagen
+        tile_size: Lado del tile en píxeles
+        overlap: Fracción de solape entre tiles vecinos (0-1)
+
+    Returns:
+        np.ndarray: Array (T, 4) [x1, y1, x2, y2]
+    """
+    stride = max(1, int(tile_size * (1 - overlap)))
+
+    def starts(length: int) -> np.ndarray:
+        if length <= tile_size:
+            return np.zeros(1, dtype=np.int64)
+        positions = np.arange(0, length - tile_size, stride)
+        return np.append(positions, length - tile_size)
+
+    ys, xs = np.meshgrid(starts(height), starts(width), indexing='ij')
+    x1, y1 = xs.ravel(), ys.ravel()
+    return np.stack([x1, y1, np.minimum(x1 + tile_size, width), np.minimum(y1 + tile_size, height)], axis=1)
+
+
+def _cluster(detections: np.ndarray, threshold: float, metric: str) -> List[np.ndarray]:
+    """
+    Agrupa detecciones solapadas de la misma clase (greedy por confianza)
+
+    Returns:
+        List: Índices de cada grupo; el primero es la detección de mayor confianza
+    """
+    order = np.argsort(-detections[:, 4], kind='stable')
+    sorted_dets = detections[order]
+    overlap_fn = box_ios if metric == 'ios' else box_iou
+
+    # Una fila de solapes por grupo: memoria O(N) aunque haya miles de cajas
+    remaining = np.arange(len(order))
+    clusters = []
+    while remaining.size:
+        leader, rest = remaining[0], remaining[1:]
+        overlap = overlap_fn(sorted_dets[leader:leader + 1, :4], sorted_dets[rest, :4])[0]
+        members = (overlap >= threshold) & (sorted_dets[rest, 5] == sorted_dets[leader, 5])
+        clusters.append(order[np.concatenate([[leader], rest[members]])])
+        remaining = rest[~members]
+    return clusters
+
+
+def merge_detections(detections: np.ndarray, method: str = 'nms', threshold: float = 0.5,
+                     metric: str = 'ios') -> np.ndarray:
+    """
+    Fusiona las detecciones de tiles solapados
+
+    Args:
+        detections: Array (N, 6) [x1, y1, x2, y2, conf, cls] en coordenadas globales
+        method: 'nms' (conserva la caja de mayor confianza) o 'wbf' (promedio ponderado)
+        threshold: Solape mínimo para considerar dos cajas el mismo objeto
+        metric: 'ios' (intersección sobre la menor) o 'iou'
+
+    Returns:
+        np.ndarray: Detecciones fusionadas (M, 6), por confianza descendente
+    """
+    if method not in MERGE_METHODS:
+        raise ValueError(f"Método de fusión no soportado: {method}. Opciones: {MERGE_METHODS}")
+    if metric not in MATCH_METRICS:
+        raise ValueError(f"Métrica no soportada: {metric}. Opciones: {MATCH_METRICS}")
+    if len(detections) == 0:
+        return detections.reshape(0, 6)
+
+    clusters = _cluster(detections, threshold, metric)
+    if method == 'nms':
+        return detections[[c[0] for c in clusters]]
+
+    merged = np.empty((len(clusters), 6), dtype=detections.dtype)
+    for k, members in enumerate(clusters):
+        group = detections[members]
+        weights = group[:, 4:5]
+        merged[k, :4] = (group[:, :4] * weights).sum(axis=0) / weights.sum()
+        merged[k, 4] = group[:, 4].max()
+        merged[k, 5] = group[0, 5]
+    return merged
+
+
+class SlicedPredictor:
+    """
+    Ejecuta un modelo YOLO sobre tiles solapados de imágenes grandes.
+
+    Los tiles de una imagen se envían al modelo en lotes de ``batch_size``;
+    con ``predict_many`` las imágenes siguientes se decodifican en
+    ``workers`` hilos mientras el modelo procesa la actual.
+    """
+
+    def __init__(self, model: Any, tile_size: int = 640, overlap: float = 0.2,
+                 batch_size: int = 8, workers: int = 2, merge: str = 'nms',
+                 merge_threshold: float = 0.5, match_metric: str = 'ios',
+                 full_image: bool = True):
+        """
+        Inicializa el predictor
+
+        Args:
+            model: Modelo YOLO u OnnxYOLO
+            tile_size: Lado del tile en píxeles
+            overlap: Fracción de solape entre tiles
+            batch_size: Tiles por llamada al modelo
+            workers: Hilos de decodificación de imágenes
+            merge: 'nms' o 'wbf'
+            merge_threshold: Solape mínimo para fusionar cajas entre tiles
+            match_metric: 'ios' o 'iou'
+            full_image: Añadir una pasada sobre la imagen completa (objetos grandes)
+        """
+        self.model = model
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+        self.merge = merge
+        self.merge_threshold = merge_threshold
+        self.match_metric = match_metric
+        self.full_image = full_image
+
+    @classmethod
+    def from_config(cls, model: Any, config: Dict[str, Any], **overrides) -> 'SlicedPredictor':
+        """
+        Crea el predictor a partir de la sección 'slicing' de la configuración
+
+        Args:
+            model: Modelo YOLO u OnnxYOLO
+            config: Configuración completa del proyecto
+            **overrides: Valores que reemplazan a la configuración (None se ignora)
+        """
+        settings = dict(config.get('slicing') or {})
+        settings.update({k: v for k, v in overrides.items() if v is not None})
+        return cls(
+            model,
+            tile_size=settings.get('tile_size', 640),
+            overlap=settings.get('overlap', 0.2),
+            batch_size=settings.get('batch_size', 8),
+            workers=settings.get('workers', 2),
+            merge=settings.get('merge', 'nms'),
+            merge_threshold=settings.get('merge_threshold', 0.5),
+            match_metric=settings.get('match_metric', 'ios'),
+            full_image=settings.get('full_image', True),
+        )
+
+    def __call__(self, image: Any, conf: float = 0.25, iou: float = 0.7,
+                 path: Optional[str] = None) -> Results:
+        """
+        Inferencia por tiles de una imagen
+
+        Args:
+            image: Ruta o array BGR
+            conf: Umbral de confianza
+            iou: Umbral de IoU del NMS dentro de cada tile
+            path: Ruta asociada al resultado (si image es un array)
+
+        Returns:
+            Results: Detecciones en coordenadas de la imagen completa
+        """
+        if isinstance(image, str):
+            path, image = image, self._read(image)
+        return self._predict(image, conf, iou, path or '')
+
+    def predict_many(self, paths: Iterable[str], conf: float = 0.25,
+                     iou: float = 0.7) -> Iterator[Results]:
+        """
+        Inferencia por tiles de varias imágenes con decodificación anticipada
+
+        Args:
+            paths: Rutas de imágenes
+            conf: Umbral de confianza
+            iou: Umbral de IoU del NMS dentro de cada tile
+
+        Yields:
+            Results: Un resultado por imagen, en orden (None si no se pudo leer)
+        """
+        paths = list(paths)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pending = [pool.submit(cv2.imread, p) for p in paths[:self.workers]]
+            for i, path in enumerate(paths):
+                image = pending[i].result()
+                if i + self.workers < len(paths):
+                    pending.append(pool.submit(cv2.imread, paths[i + self.workers]))
+                yield None if image is None else self._predict(image, conf, iou, path)
+
+    def _predict(self, image: np.ndarray, conf: float, iou: float, path: str) -> Results:
+        """Infiere todos los tiles de una imagen y fusiona las cajas"""
+        height, width = image.shape[:2]
+        windows = tile_windows(height, width, self.tile_size, self.overlap)
+
+        detections = []
+        for start in range(0, len(windows), self.batch_size):
+            batch = windows[start:start + self.batch_size]
+            tiles = [image[y1:y2, x1:x2] for x1, y1, x2, y2 in batch]
+            results = self.model(tiles, conf=conf, iou=iou, verbose=False)
+            for (x1, y1, _, _), result in zip(batch, results):
+                tile_dets = result_to_detections(result)
+                tile_dets[:, [0, 2]] += x1
+                tile_dets[:, [1, 3]] += y1
+                detections.append(tile_dets)
+
+        if self.full_image and len(windows) > 1:
+            detections.append(result_to_detections(self.model(image, conf=conf, iou=iou, verbose=False)[0]))
+
+        merged = merge_detections(
+            np.concatenate(detections) if detections else np.zeros((0, 6), dtype=np.float32),
+            method=self.merge, threshold=self.merge_threshold, metric=self.match_metric,
+        )
+        return Results(image, path=path, names=self.model.names, boxes=merged)
+
+    @staticmethod
+    def _read(path: str) -> np.ndarray:
+        """Lee una imagen BGR"""
+        image = cv2.imread(path)
+        if image is None:
+            raise ValueError(f"No se pudo leer la imagen: {path}")
+        return image
@@ -0,0 +1,137 @@
+"""
+Supresión entre modelos - Nopal Detector
+Elimina (o reetiqueta) las cajas de nopal que se solapan con personas
+detectadas y aplica NMS por clase sobre el conjunto combinado
+"""
+
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from utils.box_ops import box_ios, box_iou, dense_nms
+
+Ids = Optional[np.ndarray]
+
+MODES = ('suppress', 'relabel')
+METRICS = ('iou', 'ios')
+
+
+class PersonOverlapSuppressor:
+    """
+    Post-proceso vectorizado entre las detecciones de nopales y personas.
+
+    Calcula la matriz de solape (N nopales x M personas) en NumPy. Los
+    nopales cuyo solape máximo con una persona supera ``threshold`` se
+    descartan (``suppress``) o pasan al conjunto de personas (``relabel``).
+    Con ``class_nms`` se aplica además NMS por clase sobre el conjunto
+    combinado, lo que elimina duplicados entre ambos modelos.
+    """
+
+    def __init__(self, threshold: float = 0.45, metric: str = 'iou', mode: str = 'suppress',
+                 class_nms: bool = True, nms_iou: float = 0.5, enabled: bool = True):
+        """
+        Inicializa el post-proceso
+
+        Args:
+            threshold: Solape mínimo con una persona para actuar sobre un nopal
+            metric: 'iou' o 'ios' (intersección sobre la caja menor: nopal dentro de la persona)
+            mode: 'suppress' (descartar) o 'relabel' (convertir en persona)
+            class_nms: Aplicar NMS por clase sobre nopales + personas
+            nms_iou: Umbral de IoU del NMS por clase
+            enabled: Activar el post-proceso
+        """
+        if mode not in MODES:
+            raise ValueError(f"Modo no soportado: {mode}. Opciones: {MODES}")
+        if metric not in METRICS:
+            raise ValueError(f"Métrica no soportada: {metric}. Opciones: {METRICS}")
+        self.threshold = threshold
+        self.metric = metric
+        self.mode = mode
+        self.class_nms = class_nms
+        self.nms_iou = nms_iou
+        self.enabled = enabled
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> 'PersonOverlapSuppressor':
+        """Crea el post-proceso a partir de la sección 'suppression' de la configuración"""
+        settings = (config or {}).get('suppression') or {}
+        return cls(
+            threshold=settings.get('threshold', 0.45),
+            metric=settings.get('metric', 'iou'),
+            mode=settings.get('mode', 'suppress'),
+            class_nms=settings.get('class_nms', True),
+            nms_iou=settings.get('nms_iou', 0.5),
+            enabled=settings.get('enabled', True),
+        )
+
+    def apply(self, nopales: np.ndarray, persons: np.ndarray,
+              nopal_ids: Optional[np.ndarray] = None,
+              person_ids: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, Ids, Ids]:
+        """
+        Resuelve los solapes entre nopales y personas
+
+        Args:
+            nopales: Array (N, 6) [x1, y1, x2, y2, conf, cls] del modelo de nopales
+            persons: Array (M, 6) de personas (ya filtradas a la clase persona)
+            nopal_ids: IDs de seguimiento de los nopales (opcional)
+            person_ids: IDs de seguimiento de las personas (opcional)
+
+        Returns:
+            Tuple: (nopales, personas, IDs de nopales, IDs de personas)
+        """
+        if not self.enabled:
+            return nopales, persons, nopal_ids, person_ids
+
+        if len(nopales) and len(persons):
+            overlap_fn = box_ios if self.metric == 'ios' else box_iou
+            overlap = overlap_fn(nopales[:, :4], persons[:, :4])
+            hit = overlap.max(axis=1) >= self.threshold
+            if hit.any():
+                if self.mode == 'relabel':
+                    # El nopal pasa a ser la persona con la que se solapa (misma clase e ID)
+                    partner = overlap[hit].argmax(axis=1)
+                    moved = nopales[hit].copy()
+                    moved[:, 5] = persons[partner, 5]
+                    persons = np.concatenate([persons, moved])
+                    if person_ids is not None:
+                        person_ids = np.concatenate([person_ids, person_ids[partner]])
+                nopales = nopales[~hit]
+                nopal_ids = nopal_ids[~hit] if nopal_ids is not None else None
+
+        if self.class_nms and len(nopales) + len(persons) > 1:
+            keep_nopal, keep_person = self._class_nms(nopales, persons)
+            nopales, persons = nopales[keep_nopal], persons[keep_person]
+            nopal_ids = nopal_ids[keep_nopal] if nopal_ids is not None else None
+            person_ids = person_ids[keep_person] if person_ids is not None else None
+        return nopales, persons, nopal_ids, person_ids
+
+    def _class_nms(self, nopales: np.ndarray, persons: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        NMS por clase sobre el conjunto combinado
+
+        Returns:
+            Tuple: (índices de nopales conservados, índices de personas conservadas), en orden
+        """
+        merged = np.concatenate([nopales, persons])
+        # Clases de nopal tal cual; personas en una clase nueva para no mezclarlas
+        classes = merged[:, 5].astype(np.int64)
+        classes[len(nopales):] = classes[:len(nopales)].max(initial=-1) + 1
+        keep = np.sort(dense_nms(merged[:, :4], merged[:, 4], self.nms_iou, classes))
+        return keep[keep < len(nopales)], keep[keep >= len(nopales)] - len(nopales)
+
+
+def split_person_detections(person_dets: np.ndarray, person_class_id: int,
+                            person_ids: Optional[np.ndarray] = None) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Conserva solo la clase persona de un resultado del modelo de personas
+
+    Args:
+        person_dets: Array (M, 6) del modelo de personas (COCO detecta otras clases)
+        person_class_id: Clase 'person'
+        person_ids: IDs de seguimiento (opcional)
+
+    Returns:
+        Tuple: (personas, IDs de personas o None)
+    """
+    is_person = person_dets[:, 5] == person_class_id
+    return person_dets[is_person], (person_ids[is_person] if person_ids is not None else None)
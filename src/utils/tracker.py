@@ -0,0 +1,439 @@
+"""
+Seguimiento multi-objeto - Nopal Detector
+Tracker estilo ByteTrack (filtro de Kalman + asociación por IoU) que propaga
+las detecciones entre fotogramas clave y asigna IDs estables
+"""
+
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from ultralytics.engine.results import Results
+
+from utils.box_ops import box_iou, result_to_detections
+
+# Modelo de movimiento de velocidad constante sobre (cx, cy, aspecto, alto)
+_F = np.eye(8, dtype=np.float64)
+_F[:4, 4:] = np.eye(4)
+_STD_POSITION = 1.0 / 20
+_STD_VELOCITY = 1.0 / 160
+
+
+def _xyxy_to_xyah(boxes: np.ndarray) -> np.ndarray:
+    """Convierte cajas (N, 4) xyxy a (cx, cy, ancho/alto, alto)"""
+    w = boxes[:, 2] - boxes[:, 0]
+    h = np.maximum(boxes[:, 3] - boxes[:, 1], 1e-6)
+    return np.stack([boxes[:, 0] + w / 2, boxes[:, 1] + h / 2, w / h, h], axis=1)
+
+
+def _xyah_to_xyxy(states: np.ndarray) -> np.ndarray:
+    """Convierte estados (N, >=4) en (cx, cy, aspecto, alto) a cajas xyxy"""
+    h = states[:, 3]
+    w = states[:, 2] * h
+    return np.stack([states[:, 0] - w / 2, states[:, 1] - h / 2,
+                     states[:, 0] + w / 2, states[:, 1] + h / 2], axis=1)
+
+
+def _diag_cov(std: np.ndarray) -> np.ndarray:
+    """Matrices de covarianza diagonales (N, D, D) a partir de desviaciones (N, D)"""
+    cov = np.zeros(std.shape + (std.shape[1],), dtype=np.float64)
+    idx = np.arange(std.shape[1])
+    cov[:, idx, idx] = std ** 2
+    return cov
+
+
+def greedy_match(iou: np.ndarray, threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Asignación greedy por IoU descendente
+
+    Se resuelve por rondas vectorizadas: en cada ronda se aceptan a la vez
+    todos los pares que son mutuamente el mejor (máximo de su fila y de su
+    columna) y se descartan sus filas y columnas. Un par mutuamente mejor
+    es el que el greedy por IoU descendente elegiría, así que el resultado
+    es el mismo (empates incluidos: gana el menor índice), con tantas
+    rondas como niveles de conflicto y no un paso por par candidato.
+
+    Args:
+        iou: Matriz (N, M) de IoU entre tracks y detecciones
+        threshold: IoU mínimo para aceptar un par
+
+    Returns:
+        Tuple: (índices de tracks, índices de detecciones) emparejados
+    """
+    empty = np.zeros(0, dtype=np.int64)
+    if iou.size == 0:
+        return empty, empty
+
+    scores = np.where(iou >= threshold, iou, -1.0)
+    all_rows = np.arange(scores.shape[0])
+    matched_rows, matched_cols = [empty], [empty]
+    while True:
+        best_col = scores.argmax(axis=1)
+        best_row = scores.argmax(axis=0)
+        mutual = (scores[all_rows, best_col] >= threshold) & (best_row[best_col] == all_rows)
+        if not mutual.any():
+            break
+        rows, cols = all_rows[mutual], best_col[mutual]
+        matched_rows.append(rows)
+        matched_cols.append(cols)
+        scores[rows, :] = -1.0
+        scores[:, cols] = -1.0
+
+    rows, cols = np.concatenate(matched_rows), np.concatenate(matched_cols)
+    # Mismo orden que el greedy: por IoU descendente y, en empate, por track
+    order = np.lexsort((rows, -iou[rows, cols]))
+    return rows[order].astype(np.int64), cols[order].astype(np.int64)
+
+
+class ByteTracker:
+    """
+    Tracker de cajas con asociación en dos etapas (ByteTrack).
+
+    Las detecciones de alta confianza se asocian primero con todos los tracks;
+    las de baja confianza solo recuperan tracks que quedaron sin pareja. El
+    estado de todos los tracks se guarda en arrays y el filtro de Kalman se
+    aplica de forma vectorizada.
+    """
+
+    def __init__(self, high_threshold: float = 0.5, low_threshold: float = 0.1,
+                 match_iou: float = 0.3, max_age: int = 30, min_hits: int = 2,
+                 confidence_decay: float = 0.95):
+        """
+        Inicializa el tracker
+
+        Args:
+            high_threshold: Confianza mínima para la primera asociación y para crear tracks
+            low_threshold: Confianza mínima para la segunda asociación
+            match_iou: IoU mínimo entre predicción y detección
+            max_age: Frames sin detección antes de eliminar un track
+            min_hits: Detecciones necesarias para confirmar un track (y contarlo)
+            confidence_decay: Factor aplicado a la confianza en cada frame sin detección
+        """
+        self.high_threshold = high_threshold
+        self.low_threshold = low_threshold
+        self.match_iou = match_iou
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.confidence_decay = confidence_decay
+        self.reset()
+
+    def reset(self) -> None:
+        """Elimina todos los tracks y reinicia los IDs"""
+        self.mean = np.zeros((0, 8), dtype=np.float64)
+        self.cov = np.zeros((0, 8, 8), dtype=np.float64)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.cls = np.zeros(0, dtype=np.int64)
+        self.conf = np.zeros(0, dtype=np.float64)
+        self.hits = np.zeros(0, dtype=np.int64)
+        self.since_update = np.zeros(0, dtype=np.int64)
+        self.active = np.zeros(0, dtype=bool)
+        self.confirmed_ids: Set[int] = set()
+        self._next_id = 1
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def unique_count(self) -> int:
+        """Número de objetos distintos confirmados desde el último reset"""
+        return len(self.confirmed_ids)
+
+    @property
+    def min_active_confidence(self) -> Optional[float]:
+        """Confianza (con decaimiento) más baja entre los tracks visibles"""
+        return float(self.conf[self.active].min()) if self.active.any() else None
+
+    def predict(self) -> np.ndarray:
+        """
+        Avanza todos los tracks un frame sin detecciones
+
+        Returns:
+            np.ndarray: Tracks visibles (N, 7) [x1, y1, x2, y2, id, conf, cls]
+        """
+        self._kalman_predict()
+        self.conf *= self.confidence_decay
+        self.since_update += 1
+        self._drop_stale()
+        return self.tracks()
+
+    def update(self, detections: np.ndarray) -> np.ndarray:
+        """
+        Avanza un frame y asocia detecciones a los tracks
+
+        Args:
+            detections: Array (M, 6) [x1, y1, x2, y2, conf, cls]
+
+        Returns:
+            np.ndarray: Tracks visibles (N, 7) [x1, y1, x2, y2, id, conf, cls]
+        """
+        self._kalman_predict()
+        detections = detections[detections[:, 4] >= self.low_threshold]
+        high = detections[:, 4] >= self.high_threshold
+
+        matched = np.zeros(len(self), dtype=bool)
+        unmatched_high = high.copy()
+        predicted = _xyah_to_xyxy(self.mean)
+        det_cls = detections[:, 5].astype(np.int64)
+        pairs_trk, pairs_det = [], []
+
+        # Etapa 1: detecciones de alta confianza contra todos los tracks
+        # Etapa 2: detecciones de baja confianza contra los tracks restantes
+        for det_mask in (high, ~high):
+            det_idx = np.nonzero(det_mask)[0]
+            trk_idx = np.nonzero(~matched)[0]
+            if det_idx.size == 0 or trk_idx.size == 0:
+                continue
+            iou = box_iou(predicted[trk_idx], detections[det_idx, :4])
+            iou[self.cls[trk_idx][:, None] != det_cls[det_idx][None, :]] = 0.0
+            rows, cols = greedy_match(iou, self.match_iou)
+            if rows.size:
+                pairs_trk.append(trk_idx[rows])
+                pairs_det.append(det_idx[cols])
+                matched[trk_idx[rows]] = True
+                unmatched_high[det_idx[cols]] = False
+
+        # La etapa 2 solo usa tracks sin pareja en la 1: una sola corrección para ambas
+        if pairs_trk:
+            self._kalman_update(np.concatenate(pairs_trk), detections[np.concatenate(pairs_det)])
+
+        self.active = matched.copy()
+        self.since_update[~matched] += 1
+        self.conf[~matched] *= self.confidence_decay
+
+        self._create_tracks(detections[unmatched_high])
+        self._drop_stale()
+        return self.tracks()
+
+    def tracks(self) -> np.ndarray:
+        """
+        Tracks visibles: asociados en la última actualización
+
+        Returns:
+            np.ndarray: Array (N, 7) [x1, y1, x2, y2, id, conf, cls]
+        """
+        visible = self.active
+        out = np.zeros((int(visible.sum()), 7), dtype=np.float32)
+        if len(out):
+            out[:, :4] = _xyah_to_xyxy(self.mean[visible])
+            out[:, 4] = self.ids[visible]
+            out[:, 5] = self.conf[visible]
+            out[:, 6] = self.cls[visible]
+        return out
+
+    def _kalman_predict(self) -> None:
+        """Paso de predicción del filtro de Kalman para todos los tracks"""
+        if not len(self):
+            return
+        h = self.mean[:, 3:4]
+        std = np.concatenate([
+            _STD_POSITION * h, _STD_POSITION * h, np.full_like(h, 1e-2), _STD_POSITION * h,
+            _STD_VELOCITY * h, _STD_VELOCITY * h, np.full_like(h, 1e-5), _STD_VELOCITY * h,
+        ], axis=1)
+        self.mean = self.mean @ _F.T
+        self.cov = _F @ self.cov @ _F.T + _diag_cov(std)
+
+    def _kalman_update(self, idx: np.ndarray, detections: np.ndarray) -> None:
+        """Paso de corrección del filtro de Kalman para los tracks emparejados"""
+        mean, cov = self.mean[idx], self.cov[idx]
+        measurement = _xyxy_to_xyah(detections[:, :4])
+        h = mean[:, 3:4]
+        std = np.concatenate([_STD_POSITION * h, _STD_POSITION * h,
+                              np.full_like(h, 1e-1), _STD_POSITION * h], axis=1)
+
+        # H solo selecciona (cx, cy, a, h): las proyecciones son recortes
+        projected_cov = cov[:, :4, :4] + _diag_cov(std)
+        cross_cov = cov[:, :, :4]
+        # Ganancia K = P Hᵀ S⁻¹ (S es simétrica)
+        gain = np.linalg.solve(projected_cov, cross_cov.transpose(0, 2, 1)).transpose(0, 2, 1)
+        innovation = measurement - mean[:, :4]
+
+        self.mean[idx] = mean + np.einsum('nij,nj->ni', gain, innovation)
+        self.cov[idx] = cov - gain @ cross_cov.transpose(0, 2, 1)
+        self.conf[idx] = detections[:, 4]
+        self.hits[idx] += 1
+        self.since_update[idx] = 0
+        for track_id in self.ids[idx][self.hits[idx] >= self.min_hits]:
+            self.confirmed_ids.add(int(track_id))
+
+    def _create_tracks(self, detections: np.ndarray) -> None:
+        """Crea tracks nuevos para detecciones de alta confianza sin pareja"""
+        n = len(detections)
+        if n == 0:
+            return
+        measurement = _xyxy_to_xyah(detections[:, :4])
+        h = measurement[:, 3:4]
+        std = np.concatenate([
+            2 * _STD_POSITION * h, 2 * _STD_POSITION * h, np.full_like(h, 1e-2), 2 * _STD_POSITION * h,
+            10 * _STD_VELOCITY * h, 10 * _STD_VELOCITY * h, np.full_like(h, 1e-5), 10 * _STD_VELOCITY * h,
+        ], axis=1)
+        ids = np.arange(self._next_id, self._next_id + n, dtype=np.int64)
+        self._next_id += n
+
+        self.mean = np.concatenate([self.mean, np.concatenate([measurement, np.zeros((n, 4))], axis=1)])
+        self.cov = np.concatenate([self.cov, _diag_cov(std)])
+        self.ids = np.concatenate([self.ids, ids])
+        self.cls = np.concatenate([self.cls, detections[:, 5].astype(np.int64)])
+        self.conf = np.concatenate([self.conf, detections[:, 4]])
+        self.hits = np.concatenate([self.hits, np.ones(n, dtype=np.int64)])
+        self.since_update = np.concatenate([self.since_update, np.zeros(n, dtype=np.int64)])
+        self.active = np.concatenate([self.active, np.ones(n, dtype=bool)])
+        if self.min_hits <= 1:
+            self.confirmed_ids.update(int(i) for i in ids)
+
+    def _drop_stale(self) -> None:
+        """Elimina los tracks que llevan más de max_age frames sin detección"""
+        keep = self.since_update <= self.max_age
+        if keep.all():
+            return
+        for name in ('mean', 'cov', 'ids', 'cls', 'conf', 'hits', 'since_update', 'active'):
+            setattr(self, name, getattr(self, name)[keep])
+
+
+class KeyframeTracker:
+    """
+    Propaga detecciones de nopales y personas entre fotogramas clave.
+
+    Los modelos solo se ejecutan cada ``detect_interval`` frames o cuando la
+    confianza de algún track visible cae por debajo de ``min_confidence``;
+    en el resto de frames se usan las cajas predichas por el filtro de Kalman.
+    """
+
+    def __init__(self, detect_interval: int = 5, min_confidence: float = 0.3,
+                 person_class_id: int = 0, **tracker_kwargs):
+        """
+        Inicializa el tracker de fotogramas clave
+
+        Args:
+            detect_interval: Ejecutar los modelos cada N frames
+            min_confidence: Confianza con decaimiento que fuerza un fotograma clave
+            person_class_id: Clase 'person' en los resultados de personas
+            **tracker_kwargs: Parámetros de ``ByteTracker``
+        """
+        self.detect_interval = max(1, detect_interval)
+        self.min_confidence = min_confidence
+        self.person_class_id = person_class_id
+        self.nopal = ByteTracker(**tracker_kwargs)
+        self.person = ByteTracker(**tracker_kwargs)
+        self._templates: Optional[Tuple[Any, Any]] = None
+        self._since_detection = 0
+        self.keyframes = 0
+        self.frames = 0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], person_class_id: int = 0) -> Optional['KeyframeTracker']:
+        """
+        Crea el tracker a partir de la sección 'tracking' de la configuración
+
+        Returns:
+            KeyframeTracker o None si el seguimiento está desactivado
+        """
+        tracking = config.get('tracking') or {}
+        if not tracking.get('enabled', False):
+            return None
+        return cls(
+            detect_interval=tracking.get('detect_interval', 5),
+            min_confidence=tracking.get('min_confidence', 0.3),
+            person_class_id=person_class_id,
+            high_threshold=tracking.get('high_threshold', 0.5),
+            low_threshold=tracking.get('low_threshold', 0.1),
+            match_iou=tracking.get('match_iou', 0.3),
+            max_age=tracking.get('max_age', 30),
+            min_hits=tracking.get('min_hits', 2),
+            confidence_decay=tracking.get('confidence_decay', 0.95),
+        )
+
+    @property
+    def detection_conf(self) -> float:
+        """Umbral con el que deben ejecutarse los modelos (incluye detecciones bajas)"""
+        return self.nopal.low_threshold
+
+    def set_high_threshold(self, threshold: float) -> None:
+        """Actualiza el umbral de alta confianza de ambos trackers"""
+        self.nopal.high_threshold = threshold
+        self.person.high_threshold = threshold
+
+    def needs_detection(self) -> bool:
+        """Indica si el siguiente frame debe ser un fotograma clave"""
+        if self._templates is None or self._since_detection + 1 >= self.detect_interval:
+            return True
+        lowest = [c for c in (self.nopal.min_active_confidence, self.person.min_active_confidence)
+                  if c is not None]
+        return bool(lowest) and min(lowest) < self.min_confidence
+
+    def plan_keyframes(self, num_frames: int) -> List[int]:
+        """
+        Índices de los próximos frames que serán clave por intervalo
+
+        Permite agrupar en un lote la inferencia de los fotogramas clave;
+        ``needs_detection`` puede añadir otros si cae la confianza.
+
+        Args:
+            num_frames: Número de frames siguientes
+
+        Returns:
+            List: Índices (relativos) de los fotogramas clave previstos
+        """
+        planned = []
+        since = self._since_detection
+        for i in range(num_frames):
+            if (i == 0 and self._templates is None) or since + 1 >= self.detect_interval:
+                planned.append(i)
+                since = 0
+            else:
+                since += 1
+        return planned
+
+    def update(self, frame: np.ndarray, nopal_result: Any, person_result: Any) -> Tuple[Any, Any]:
+        """
+        Fotograma clave: asocia las detecciones nuevas
+
+        Returns:
+            Tuple: (resultado_nopales, resultado_personas) con IDs de track
+        """
+        self.frames += 1
+        self.keyframes += 1
+        self._since_detection = 0
+        self._templates = (nopal_result, person_result)
+        nopal_tracks = self.nopal.update(result_to_detections(nopal_result))
+        person_tracks = self.person.update(
+            result_to_detections(person_result, classes=(self.person_class_id,))
+        )
+        return self._to_results(frame, nopal_tracks, person_tracks)
+
+    def predict(self, frame: np.ndarray) -> Tuple[Any, Any]:
+        """
+        Frame intermedio: propaga los tracks sin ejecutar los modelos
+
+        Returns:
+            Tuple: (resultado_nopales, resultado_personas) con cajas predichas
+        """
+        self.frames += 1
+        self._since_detection += 1
+        return self._to_results(frame, self.nopal.predict(), self.person.predict())
+
+    def reset(self) -> None:
+        """Reinicia tracks, IDs y contadores"""
+        self.nopal.reset()
+        self.person.reset()
+        self._templates = None
+        self._since_detection = 0
+        self.keyframes = 0
+        self.frames = 0
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Objetos únicos contados y fracción de fotogramas clave"""
+        return {
+            'unique_nopales': self.nopal.unique_count,
+            'unique_personas': self.person.unique_count,
+            'frames': self.frames,
+            'keyframes': self.keyframes,
+            'keyframe_ratio': self.keyframes / self.frames if self.frames else 0.0,
+        }
+
+    def _to_results(self, frame: np.ndarray, nopal_tracks: np.ndarray,
+                    person_tracks: np.ndarray) -> Tuple[Any, Any]:
+        """Envuelve los tracks en resultados de YOLO (cajas con columna de ID)"""
+        return tuple(
+            Results(frame, path=getattr(template, 'path', ''), names=template.names, boxes=tracks)
+            for template, tracks in zip(self._templates, (nopal_tracks, person_tracks))
+        )
@@ -104,7 +104,7 @@ class InputValidator:
         Valida que el archivo de pesos sea accesible y válido.
         
         Args:
-            path: Ruta del archivo de pesos (.pt)
+            path: Ruta del archivo de pesos (.pt u .onnx)
             
         Returns:
             tuple: (es_válido, mensaje_error)
@@ -118,8 +118,8 @@ class InputValidator:
             if p.is_dir():
                 return False, f"❌ Se esperaba un archivo .pt, se recibió un directorio: {path}"
             
-            if p.suffix != '.pt':
-                return False, f"❌ Formato incorrecto. Se esperaba .pt, se recibió: {p.suffix}"
+            if p.suffix not in ('.pt', '.onnx'):
+                return False, f"❌ Formato incorrecto. Se esperaba .pt u .onnx, se recibió: {p.suffix}"
             
             # Verificar tamaño (modelos suelen ser > 10MB)
             file_size = p.stat().st_size
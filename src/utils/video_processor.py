@@ -2,30 +2,72 @@
 Utilidades para procesamiento de video
 """
 
+import time
+
 import cv2
 import numpy as np
-from typing import Callable, Optional, Tuple
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from utils.ffmpeg_io import open_video_reader, open_video_writer
+
+# Salida con submuestreo temporal: solo los frames muestreados, o todos arrastrando el último resultado
+STRIDE_OUTPUTS = ('sampled', 'carry')
+
+
+def resolve_frame_stride(fps: float, frame_stride: Optional[int] = None,
+                         target_fps: Optional[float] = None) -> int:
+    """
+    Paso de submuestreo temporal: procesar uno de cada N frames
+    
+    Args:
+        fps: FPS del video de origen
+        frame_stride: Paso explícito (si es mayor que 1 tiene prioridad)
+        target_fps: FPS deseados; el paso es ``round(fps / target_fps)``
+        
+    Returns:
+        int: Paso (mínimo 1)
+    """
+    if frame_stride and frame_stride > 1:
+        return int(frame_stride)
+    if target_fps and fps:
+        return max(1, int(round(fps / target_fps)))
+    return 1
+
+
+def skip_frames(cap, count: int) -> int:
+    """
+    Avanza ``count`` frames con ``grab`` (sin decodificar a BGR)
+    
+    Returns:
+        int: Frames saltados (menos si el video termina antes)
+    """
+    skipped = 0
+    while skipped < count and cap.grab():
+        skipped += 1
+    return skipped
 
 
 class VideoProcessor:
     """Clase para procesamiento avanzado de video"""
     
-    def __init__(self, input_path: str, output_path: str):
+    def __init__(self, input_path: str, output_path: str, config: Optional[Dict[str, Any]] = None):
         """
         Inicializa el procesador de video
         
         Args:
             input_path: Ruta del video de entrada
             output_path: Ruta del video de salida
+            config: Configuración del proyecto (``video.io_backend`` y sección 'ffmpeg')
         """
         self.input_path = input_path
         self.output_path = output_path
+        self.config = config
         self.cap = None
         self.writer = None
         
     def __enter__(self):
         """Context manager entry"""
-        self.cap = cv2.VideoCapture(self.input_path)
+        self.cap = open_video_reader(self.input_path, self.config)
         
         # Obtener propiedades del video
         self.fps = int(self.cap.get(cv2.CAP_PROP_FPS))
@@ -34,12 +76,15 @@ class VideoProcessor:
         self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
         
         # Configurar escritor
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        self.writer = cv2.VideoWriter(
-            self.output_path, fourcc, self.fps, (self.width, self.height)
-        )
+        self._open_writer(self.fps)
         
         return self
+    
+    def _open_writer(self, fps: float) -> None:
+        """(Re)crea el escritor de salida con los FPS indicados"""
+        if self.writer:
+            self.writer.release()
+        self.writer = open_video_writer(self.output_path, fps, (self.width, self.height), self.config)
         
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Context manager exit"""
@@ -50,14 +95,29 @@ class VideoProcessor:
     
     def process_frames(self, 
                       frame_processor: Callable[[np.ndarray], np.ndarray],
-                      progress_callback: Optional[Callable[[int, int], None]] = None) -> None:
+                      progress_callback: Optional[Callable[[int, int], None]] = None,
+                      frame_stride: int = 1, target_fps: Optional[float] = None,
+                      carry: bool = False) -> None:
         """
         Procesa todos los frames del video
         
+        Con un paso mayor que 1 solo se decodifica y procesa uno de cada N
+        frames; el resto se salta con ``grab``. La salida contiene solo los
+        frames procesados (a ``fps / paso``) o, con ``carry``, repite el
+        último frame procesado en los saltados para conservar duración y
+        número de frames.
+        
         Args:
             frame_processor: Función que procesa cada frame
             progress_callback: Callback para mostrar progreso
+            frame_stride: Procesar uno de cada N frames
+            target_fps: FPS a procesar (alternativa a ``frame_stride``)
+            carry: Repetir el último frame procesado en los frames saltados
         """
+        stride = resolve_frame_stride(self.cap.get(cv2.CAP_PROP_FPS), frame_stride, target_fps)
+        if stride > 1 and not carry:
+            self._open_writer(self.cap.get(cv2.CAP_PROP_FPS) / stride)
+        
         frame_count = 0
         
         while True:
@@ -65,6 +125,8 @@ class VideoProcessor:
             if not ret:
                 break
                 
+            previous_count = frame_count
+            
             # Procesar frame
             processed_frame = frame_processor(frame)
             
@@ -73,8 +135,16 @@ class VideoProcessor:
             
             frame_count += 1
             
+            # Saltar frames sin decodificarlos
+            if stride > 1:
+                skipped = skip_frames(self.cap, stride - 1)
+                if carry:
+                    for _ in range(skipped):
+                        self.writer.write(processed_frame)
+                frame_count += skipped
+            
             # Callback de progreso
-            if progress_callback and frame_count % 30 == 0:  # Cada segundo aprox
+            if progress_callback and frame_count // 30 > previous_count // 30:  # Cada segundo aprox
                 progress_callback(frame_count, self.total_frames)
     
     @staticmethod
@@ -146,48 +216,134 @@ class VideoProcessor:
 
 
 class FrameBuffer:
-    """Buffer para almacenar frames temporalmente"""
+    """
+    Buffer circular de frames sobre un único array preasignado.
+    
+    Los frames se copian con ``np.copyto`` en ranuras de un array
+    contiguo (N, H, W, 3) uint8 que se reserva con el primer frame, así
+    que la memoria es constante y ``add_frame`` no asigna nada. Las
+    lecturas devuelven vistas de solo lectura que siguen siendo válidas
+    hasta que su ranura se sobrescribe (``max_size`` frames después);
+    ``snapshot`` hace una copia estable de los últimos frames.
+    """
     
-    def __init__(self, max_size: int = 30):
+    def __init__(self, max_size: int = 30, frame_shape: Optional[Tuple[int, ...]] = None):
         """
         Inicializa el buffer
         
         Args:
             max_size: Número máximo de frames en buffer
+            frame_shape: Forma (H, W, 3) para reservar ya la memoria (default: la del primer frame)
         """
-        self.max_size = max_size
-        self.frames = []
-        self.current_index = 0
+        self.max_size = max(1, max_size)
+        self.frames: Optional[np.ndarray] = None
+        self.timestamps = np.zeros(self.max_size, dtype=np.float64)
+        self.current_index = 0  # Ranura del próximo frame
+        self.count = 0
+        if frame_shape is not None:
+            self._allocate(tuple(frame_shape))
     
-    def add_frame(self, frame: np.ndarray) -> None:
-        """Agrega un frame al buffer"""
-        if len(self.frames) >= self.max_size:
-            # Reemplazar frame más antiguo
-            self.frames[self.current_index] = frame.copy()
-            self.current_index = (self.current_index + 1) % self.max_size
-        else:
-            self.frames.append(frame.copy())
+    def _allocate(self, frame_shape: Tuple[int, ...]) -> None:
+        """Reserva el array (N, H, W, 3)"""
+        self.frames = np.empty((self.max_size,) + frame_shape, dtype=np.uint8)
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    @property
+    def nbytes(self) -> int:
+        """Memoria reservada para los frames"""
+        return 0 if self.frames is None else self.frames.nbytes
+    
+    def add_frame(self, frame: np.ndarray, timestamp: Optional[float] = None) -> None:
+        """
+        Agrega un frame al buffer (reemplaza el más antiguo si está lleno)
+        
+        Args:
+            frame: Frame BGR
+            timestamp: Segundos del frame (default: ``time.monotonic()``)
+            
+        Raises:
+            ValueError: Si el frame no tiene la forma de los anteriores
+        """
+        if self.frames is None:
+            self._allocate(frame.shape)
+        elif frame.shape != self.frames.shape[1:]:
+            raise ValueError(f"Frame {frame.shape}; el buffer es de {self.frames.shape[1:]}")
+        np.copyto(self.frames[self.current_index], frame)
+        self.timestamps[self.current_index] = time.monotonic() if timestamp is None else timestamp
+        self.current_index = (self.current_index + 1) % self.max_size
+        self.count = min(self.count + 1, self.max_size)
+    
+    def _slot(self, back: int) -> int:
+        """Ranura del frame ``back`` posiciones antes del más reciente"""
+        return (self.current_index - 1 - back) % self.max_size
+    
+    def _order(self, last: Optional[int] = None) -> np.ndarray:
+        """Ranuras de los últimos ``last`` frames, del más antiguo al más reciente"""
+        last = self.count if last is None else max(0, min(last, self.count))
+        return (self.current_index - last + np.arange(last)) % self.max_size
+    
+    @staticmethod
+    def _read_only(frame: np.ndarray) -> np.ndarray:
+        """Vista de solo lectura (sin copiar)"""
+        view = frame.view()
+        view.flags.writeable = False
+        return view
     
     def get_frame(self, offset: int = 0) -> Optional[np.ndarray]:
         """
         Obtiene un frame del buffer
         
         Args:
-            offset: Offset desde el frame actual (negativo para frames anteriores)
+            offset: Offset desde el frame actual (0 = más reciente, -1 = el anterior...)
             
         Returns:
-            Frame o None si no está disponible
+            Vista de solo lectura del frame o None si no está disponible
         """
-        if not self.frames:
+        back = abs(offset)
+        if back >= self.count:
             return None
+        return self._read_only(self.frames[self._slot(back)])
+    
+    def get_frame_at(self, timestamp: float) -> Optional[Tuple[np.ndarray, float]]:
+        """
+        Frame más reciente con timestamp menor o igual que ``timestamp``
+        
+        Args:
+            timestamp: Segundos buscados
             
-        index = (self.current_index - 1 - offset) % len(self.frames)
-        if 0 <= index < len(self.frames):
-            return self.frames[index]
+        Returns:
+            Tuple: (vista de solo lectura, timestamp del frame) o None si es anterior al buffer
+        """
+        order = self._order()
+        position = int(np.searchsorted(self.timestamps[order], timestamp, side='right')) - 1
+        if position < 0:
+            return None
+        slot = order[position]
+        return self._read_only(self.frames[slot]), float(self.timestamps[slot])
+    
+    def snapshot(self, last: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Copia de solo lectura de los últimos frames (p. ej. pre-roll al empezar a grabar)
         
-        return None
+        Args:
+            last: Frames a copiar (default: todos los del buffer)
+            
+        Returns:
+            Tuple: (frames (K, H, W, 3), timestamps (K,)) del más antiguo al más reciente
+        """
+        order = self._order(last)
+        if self.frames is None:
+            frames = np.empty((0, 0, 0, 3), dtype=np.uint8)
+        else:
+            frames = self.frames.take(order, axis=0)
+        timestamps = self.timestamps[order]
+        frames.flags.writeable = False
+        timestamps.flags.writeable = False
+        return frames, timestamps
     
     def clear(self) -> None:
-        """Limpia el buffer"""
-        self.frames.clear()
-        self.current_index = 0
\ No newline at end of file
+        """Limpia el buffer (conserva la memoria reservada)"""
+        self.current_index = 0
+        self.count = 0